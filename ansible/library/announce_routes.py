@@ -12,6 +12,7 @@ import sys
 import socket
 import random
 import logging
+import threading
 import time
 from multiprocessing.pool import ThreadPool
 from ansible.module_utils.basic import AnsibleModule
@@ -45,6 +46,14 @@ Options:
     - option-name: path
       description: to figure out the path of topo_{}.yml
       required: False
+
+    - option-name: max_workers
+      description: maximum number of exabgp processes that routes are sent to concurrently
+      required: False
+
+    - option-name: route_chunk_size
+      description: maximum number of routes sent to exabgp in one HTTP request
+      required: False
 '''
 
 EXAMPLES = '''
@@ -114,6 +123,18 @@ M0_SUBNET_PREFIX_LEN_V6 = 64
 M1_ASN_START = 65200
 # Describe default leaf number
 LEAF_NUMBER = 256
+# Default maximum number of exabgp processes that routes are sent to concurrently
+DEFAULT_MAX_WORKERS = 16
+# Default maximum number of routes sent to exabgp in one HTTP request
+DEFAULT_ROUTE_CHUNK_SIZE = 2000
+
+# Route injection settings, updated by module arguments
+route_injection_config = {
+    "max_workers": DEFAULT_MAX_WORKERS,
+    "route_chunk_size": DEFAULT_ROUTE_CHUNK_SIZE
+}
+# HTTP sessions of current thread keyed by exabgp URL, to reuse connections across requests
+http_sessions = threading.local()
 
 
 def wait_for_http(host_ip, http_port, timeout=10):
@@ -160,31 +181,52 @@ def read_topo(topo_name, path):
         return {}
 
 
-def change_routes(action, ptf_ip, port, routes):
-    logging.debug("action = {}, ptf_ip = {}, port = {}, routes = {}".format(action, ptf_ip, port, routes))
-    messages = []
+def get_http_session(url):
+    """
+    Get HTTP session of current thread for the exabgp URL, connection of the session is kept alive and reused.
+    """
+    sessions = getattr(http_sessions, "sessions", None)
+    if sessions is None:
+        sessions = http_sessions.sessions = {}
+    if url not in sessions:
+        session = requests.Session()
+        session.trust_env = False
+        sessions[url] = session
+    return sessions[url]
+
+
+def reset_http_session(url):
+    """
+    Close HTTP session of current thread for the exabgp URL, a new connection is created by next request.
+    """
+    session = getattr(http_sessions, "sessions", {}).pop(url, None)
+    if session:
+        session.close()
+
+
+def generate_route_messages(action, routes):
     for prefix, nexthop, aspath in routes:
         if aspath:
-            messages.append(
-                "{} route {} next-hop {} as-path [ {} ]".format(action, prefix, nexthop, aspath))
+            yield "{} route {} next-hop {} as-path [ {} ]".format(action, prefix, nexthop, aspath)
         else:
-            messages.append(
-                "{} route {} next-hop {}".format(action, prefix, nexthop))
-    wait_for_http(ptf_ip, port, timeout=60)
-    url = "http://%s:%d" % (ptf_ip, port)
+            yield "{} route {} next-hop {}".format(action, prefix, nexthop)
+
+
+def post_route_messages(url, messages):
     data = {"commands": ";".join(messages)}
 
     # nosemgrep-next-line
     # Flaky error `ConnectionResetError(104, 'Connection reset by peer')` may happen while using `requests.post`
     # To avoid this error, we add sleep time before sending request.
     # We use a "backoff" algorithm here, the maximum retry times is five.
-    # If one retry fails, we increase the waiting time.
+    # If one retry fails, we increase the waiting time and use a new connection.
     for i in range(0, 5):
         try:
-            r = requests.post(url, data=data, timeout=360, proxies={"http": None, "https": None})
+            r = get_http_session(url).post(url, data=data, timeout=360, proxies={"http": None, "https": None})
             break
         except Exception as e:
             logging.debug("Got exception {}, will try to connect again".format(e))
+            reset_http_session(url)
             time.sleep(0.01 * (i+1))
             if i == 4:
                 raise e
@@ -202,6 +244,32 @@ def change_routes(action, ptf_ip, port, routes):
         )
 
 
+def change_routes(action, ptf_ip, port, routes):
+    """
+    Send route commands to exabgp process listening on the port.
+
+    Routes are sent in chunks of at most route_chunk_size routes over a kept alive connection. Next chunk is sent
+    after exabgp accepted the previous one, so exabgp is not flooded by a huge request.
+    """
+    logging.debug("action = {}, ptf_ip = {}, port = {}, routes = {}".format(action, ptf_ip, port, routes))
+    wait_for_http(ptf_ip, port, timeout=60)
+    url = "http://%s:%d" % (ptf_ip, port)
+
+    start_time = time.time()
+    route_count = 0
+    messages = generate_route_messages(action, routes)
+    while True:
+        chunk = list(itertools.islice(messages, route_injection_config["route_chunk_size"]))
+        if not chunk:
+            break
+        post_route_messages(url, chunk)
+        route_count += len(chunk)
+
+    elapsed = time.time() - start_time
+    logging.info("{} {} routes to {} in {:.2f}s, {:.0f} routes/sec".format(
+        action, route_count, url, elapsed, route_count / elapsed if elapsed > 0 else route_count))
+
+
 def send_routes_for_each_set(args):
     routes, port, action, ptf_ip = args
     change_routes(action, ptf_ip, port, routes)
@@ -217,20 +285,24 @@ def send_routes_in_parallel(route_set):
     Returns:
         None
     """
-    # Create a pool of worker processes
-    pool = ThreadPool(processes=len(route_set))
-
-    # Use the ThreadPool.map function to apply the function to each set of routes
-    results = pool.map(send_routes_for_each_set, route_set)
+    if not route_set:
+        return
 
-    # Optionally, process the results
-    for result in results:
-        # Process individual results here
-        pass
+    start_time = time.time()
+    # Create a pool of at most max_workers threads, each thread sends one set of routes at a time
+    pool = ThreadPool(processes=min(len(route_set), max(1, route_injection_config["max_workers"])))
+    try:
+        # Use the ThreadPool.map function to apply the function to each set of routes
+        pool.map(send_routes_for_each_set, route_set)
+    finally:
+        # Close the pool and wait for all threads to complete
+        pool.close()
+        pool.join()
 
-    # Close the pool and wait for all processes to complete
-    pool.close()
-    pool.join()
+    route_count = sum(len(routes) for routes, _, _, _ in route_set)
+    elapsed = time.time() - start_time
+    logging.info("Sent {} routes to {} exabgp processes in {:.2f}s, {:.0f} routes/sec".format(
+        route_count, len(route_set), elapsed, route_count / elapsed if elapsed > 0 else route_count))
 
 
 # AS path from Leaf router for T0 topology
@@ -730,10 +802,8 @@ def fib_t1_lag(topo, ptf_ip, topo_name, no_default_route=False, action="announce
             routes_to_change[port] += routes_vips
 
     if action != GENERATE_WITHOUT_APPLY:
-        for port, routes in routes_to_change.items():
-            if len(routes) <= 0:
-                continue
-            change_routes(action, ptf_ip, port, routes)
+        send_routes_in_parallel([(routes, port, action, ptf_ip)
+                                 for port, routes in routes_to_change.items() if len(routes) > 0])
 
 
 def get_new_ip(curr_ip, skip_count):
@@ -1638,7 +1708,9 @@ def main():
             peers_routes_to_change=dict(required=False, type='dict', default={}),
             log_path=dict(required=False, type='str', default='/tmp'),
             upstream_neighbor_groups=dict(required=False, type='int', default=0),
-            downstream_neighbor_groups=dict(required=False, type='int', default=0)
+            downstream_neighbor_groups=dict(required=False, type='int', default=0),
+            max_workers=dict(required=False, type='int', default=DEFAULT_MAX_WORKERS),
+            route_chunk_size=dict(required=False, type='int', default=DEFAULT_ROUTE_CHUNK_SIZE)
         ),
         supports_check_mode=False)
 
@@ -1654,6 +1726,8 @@ def main():
     peers_routes_to_change = module.params['peers_routes_to_change']
     upstream_neighbor_groups = module.params['upstream_neighbor_groups']
     downstream_neighbor_groups = module.params['downstream_neighbor_groups']
+    route_injection_config["max_workers"] = module.params['max_workers']
+    route_injection_config["route_chunk_size"] = max(1, module.params['route_chunk_size'])
 
     topo = read_topo(topo_name, path)
     if not topo:
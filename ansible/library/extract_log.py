@@ -10,6 +10,7 @@ import hashlib
 import sys
 import re
 import gzip
+import json
 import os
 import locale
 DOCUMENTATION = '''
@@ -42,6 +43,14 @@ Options:
       required: True
       Default: None
 
+    - option-name: offset_file
+      description: a JSON file with log file offsets recorded by 'loganalyzer.py --action init --offset_file'
+                   before the 'start_string' marker was placed. When the offset of the log file is found
+                   there and the log file wasn't rotated since, only the bytes after the offset are scanned
+                   and copied. Otherwise all the rotated files are unrotated as usual.
+      required: False
+      Default: None
+
 '''
 
 EXAMPLES = '''
@@ -58,6 +67,14 @@ EXAMPLES = '''
     dest: '/tmp/'
     flat: yes
 
+- name: Extract syslog entries since the loganalyzer start marker, using offsets recorded by loganalyzer init
+  extract_log:
+    directory: '/var/log'
+    file_prefix: 'syslog'
+    start_string: 'start-LogAnalyzer-test_bgp_fact.2024-01-01-00:00:00'
+    target_filename: '/tmp/syslog'
+    offset_file: '/tmp/loganalyzer_offsets.json'
+
 - name: Extract all sairedis.rec entries since the last reboot
   extract_log:
     directory: '/var/log/swss'
@@ -282,9 +299,104 @@ def combine_logs_and_save(directory, filenames, start_string, target_string, tar
                 path, line_processed, line_copied))
 
 
-def extract_log(directory, prefixname, target_string, target_filename):
+def load_log_offset(offset_file, path, target_string):
+    """Returns (device, inode, offset) recorded for log file @path when @target_string
+    marker was placed, None if it wasn't recorded"""
+
+    if not offset_file or not os.path.exists(offset_file):
+        return None
+    try:
+        with open(offset_file) as fp:
+            offsets = json.load(fp)
+    except ValueError:
+        logger.debug("extract_log offset file {} is corrupted".format(offset_file))
+        return None
+
+    offset = offsets.get(target_string, {}).get(path)
+    return tuple(offset) if offset else None
+
+
+def find_file_by_inode(directory, filenames, device, inode):
+    """Returns name of the not compressed file from @filenames which is stored at @device, @inode"""
+
+    for filename in filenames:
+        if 'gz' in filename:
+            continue
+        stat = os.stat(os.path.join(directory, filename))
+        if stat.st_dev == device and stat.st_ino == inode:
+            return filename
+    return None
+
+
+def copy_logs_from_offset(directory, filenames, offset, target_string, target_filename):
+    """Copies lines starting from the latest line with @target_string found after @offset in the
+    first file of @filenames. @filenames are sorted from older to newer, the rest of them are copied
+    entirely. Returns False if @target_string wasn't found after @offset"""
+
+    target_bytes = target_string.encode('utf-8')
+    line_processed = 0
+    line_copied = 0
+    found = False
+    with open(target_filename, 'wb') as fp:
+        for index, filename in enumerate(filenames):
+            path = os.path.join(directory, filename)
+            with open(path, 'rb') as file:
+                if index == 0:
+                    file.seek(offset)
+                for line in file:
+                    line_processed += 1
+                    if target_bytes in line and b'extract_log' not in line:
+                        # Keep only the lines after the latest start line
+                        found = True
+                        fp.seek(0)
+                        fp.truncate()
+                        line_copied = 0
+                    if found:
+                        fp.write(line)
+                        line_copied += 1
+
+            logger.debug("extract_log copy from file {} offset {}, {} lines processed, {} lines copied".format(
+                path, offset if index == 0 else 0, line_processed, line_copied))
+
+    return found
+
+
+def extract_log_incremental(directory, prefixname, target_string, target_filename, offset_file):
+    """Extracts log using offset recorded when @target_string marker was placed.
+    Returns False if the offset isn't available or log was rotated in a way the offset can't be used"""
+
+    path = os.path.join(directory, prefixname)
+    recorded = load_log_offset(offset_file, path, target_string)
+    if recorded is None:
+        logger.debug("extract_log no offset recorded for {}".format(path))
+        return False
+
+    device, inode, offset = recorded
+    filenames = list_files(directory, prefixname)
+    file_with_offset = find_file_by_inode(directory, filenames, device, inode)
+    if file_with_offset is None:
+        logger.debug("extract_log file {} with inode {} was rotated away".format(path, inode))
+        return False
+
+    if os.path.getsize(os.path.join(directory, file_with_offset)) < offset:
+        logger.debug("extract_log file {} was truncated below offset {}".format(file_with_offset, offset))
+        return False
+
+    files_to_copy = list(reversed(calculate_files_to_copy(filenames, file_with_offset)))
+    logger.debug("extract_log from offset {} in files {}".format(offset, files_to_copy))
+    if not copy_logs_from_offset(directory, files_to_copy, offset, target_string, target_filename):
+        logger.debug("extract_log {} was not found after offset {}".format(target_string, offset))
+        return False
+
+    return True
+
+
+def extract_log(directory, prefixname, target_string, target_filename, offset_file=None):
     logger.debug("extract_log for start string {}".format(
         target_string.replace("start-", "")))
+    if extract_log_incremental(directory, prefixname, target_string, target_filename, offset_file):
+        return
+
     filenames = list_files(directory, prefixname)
     logger.debug("extract_log from files {}".format(filenames))
     file_with_latest_line, file_create_time, latest_line, file_size = extract_latest_line_with_string(
@@ -308,6 +420,7 @@ def main():
             file_prefix=dict(required=True, type='str'),
             start_string=dict(required=True, type='str'),
             target_filename=dict(required=True, type='str'),
+            offset_file=dict(required=False, type='str', default=None),
         ),
         supports_check_mode=False)
 
@@ -319,7 +432,7 @@ def main():
 
     try:
         extract_log(p['directory'], p['file_prefix'],
-                    p['start_string'], p['target_filename'])
+                    p['start_string'], p['target_filename'], p['offset_file'])
     except Exception:
         tb = traceback.format_exc()
         module.fail_json(msg=tb)
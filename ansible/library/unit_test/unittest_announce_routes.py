@@ -0,0 +1,147 @@
+import collections
+import importlib.machinery
+import importlib.util
+import os
+import threading
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import ansible.module_utils
+
+LIBRARY_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# module_utils of the repo, like debug_utils, are found by ansible when running the module
+ansible.module_utils.__path__.append(os.path.join(os.path.dirname(LIBRARY_PATH), "module_utils"))
+
+
+def load_source(modname, filename):
+    loader = importlib.machinery.SourceFileLoader(modname, filename)
+    spec = importlib.util.spec_from_file_location(modname, filename, loader=loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+announce_routes = load_source("announce_routes", os.path.join(LIBRARY_PATH, "announce_routes.py"))
+
+
+class ExabgpStub(object):
+    """Stub of the HTTP API of exabgp processes, records the route commands posted to each port."""
+
+    def __init__(self, count, delay=0.05, fail_ports=()):
+        self.delay = delay
+        self.fail_ports = fail_ports
+        self.commands = collections.defaultdict(list)
+        self.requests = collections.Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.servers = [ThreadingHTTPServer(("127.0.0.1", 0), self._handler()) for _ in range(count)]
+        for server in self.servers:
+            server.daemon_threads = True
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+
+    @property
+    def ports(self):
+        return [server.server_address[1] for server in self.servers]
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep the connection alive between requests, like exabgp http api
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                port = self.server.server_address[1]
+                body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+                with stub.lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                    stub.requests[port] += 1
+                    stub.commands[port].extend(parse_qs(body)["commands"][0].split(";"))
+                status, text = (500, b"error") if port in stub.fail_ports else (200, b"OK")
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(text)))
+                self.end_headers()
+                self.wfile.write(text)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+
+def make_routes(index, count):
+    return [("192.{}.{}.0/24".format(index, i), "10.0.0.{}".format(index), "6666 6667") for i in range(count)]
+
+
+class TestPostRoutes(unittest.TestCase):
+    """Test cases for sending routes to exabgp in chunks with bounded workers."""
+
+    def setUp(self):
+        self.config = dict(announce_routes.route_injection_config)
+        self.stub = None
+
+    def tearDown(self):
+        announce_routes.route_injection_config.update(self.config)
+        if self.stub:
+            self.stub.close()
+
+    # Test case: Every route is posted exactly once, in chunks of at most route_chunk_size routes
+    def test_route_chunks(self):
+        announce_routes.route_injection_config.update(route_chunk_size=3)
+        self.stub = ExabgpStub(1, delay=0)
+        port = self.stub.ports[0]
+        routes = make_routes(1, 10)
+
+        announce_routes.change_routes("announce", "127.0.0.1", port, routes)
+
+        self.assertEqual(self.stub.requests[port], 4)
+        self.assertEqual(self.stub.commands[port], list(announce_routes.generate_route_messages("announce", routes)))
+
+    # Test case: Routes of each exabgp process arrive once, with at most max_workers processes served concurrently
+    def test_concurrency_bound(self):
+        announce_routes.route_injection_config.update(route_chunk_size=4, max_workers=2)
+        self.stub = ExabgpStub(6)
+        route_set = [(make_routes(index, 10), port, "withdraw", "127.0.0.1")
+                     for index, port in enumerate(self.stub.ports)]
+
+        announce_routes.send_routes_in_parallel(route_set)
+
+        for routes, port, action, _ in route_set:
+            self.assertEqual(self.stub.requests[port], 3)
+            self.assertEqual(collections.Counter(self.stub.commands[port]),
+                             collections.Counter(announce_routes.generate_route_messages(action, routes)))
+        self.assertEqual(self.stub.max_in_flight, 2)
+
+    # Test case: A failed POST is reported to the caller
+    def test_failed_post(self):
+        self.stub = ExabgpStub(3, delay=0)
+        fail_port = self.stub.ports[1]
+        self.stub.fail_ports = (fail_port, )
+        route_set = [(make_routes(index, 5), port, "announce", "127.0.0.1")
+                     for index, port in enumerate(self.stub.ports)]
+
+        with self.assertRaises(Exception) as context:
+            announce_routes.send_routes_in_parallel(route_set)
+
+        self.assertIn("Change routes failed", str(context.exception))
+        self.assertIn(":{}".format(fail_port), str(context.exception))
+        self.assertIn("r.status_code=500", str(context.exception))
+
+
+if __name__ == "__main__":
+    unittest.main()
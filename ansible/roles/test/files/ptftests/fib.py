@@ -2,7 +2,7 @@ import re
 import six
 
 from ipaddress import ip_address, ip_network
-from lpm import LpmDict
+from lpm import LpmDict, IntLpmDict
 
 # These subnets are excluded from FIB test
 # reference: RFC 5735 Special Use IPv4 Addresses
@@ -45,29 +45,45 @@ class Fib():
             return port_list
 
     # Initialize FIB with FIB file
-    def __init__(self, file_path):
-        self._ipv4_lpm_dict = LpmDict()
+    # int_lpm: use IntLpmDict, which is much faster to load 100k+ prefixes and build ranges. Set it to False to
+    # use the SubnetTree based LpmDict
+    def __init__(self, file_path, int_lpm=True):
+        lpm_dict_class = IntLpmDict if int_lpm else LpmDict
+        self._ipv4_lpm_dict = lpm_dict_class()
         for ip in EXCLUDE_IPV4_PREFIXES:
             self._ipv4_lpm_dict[ip] = self.NextHop()
 
-        self._ipv6_lpm_dict = LpmDict(ipv4=False)
+        self._ipv6_lpm_dict = lpm_dict_class(ipv4=False)
         for ip in EXCLUDE_IPV6_PREFIXES:
             self._ipv6_lpm_dict[ip] = self.NextHop()
 
         # filter out empty lines and lines starting with '#'
         pattern = re.compile("^#.*$|^[ \t]*$")
 
+        # Many prefixes share the same next hops, parse each of them only once
+        next_hops = {}
+        ipv4_entries = []
+        ipv6_entries = []
         with open(file_path, 'r') as f:
-            for line in f.readlines():
+            for line in f:
                 if pattern.match(line):
                     continue
                 entry = line.split(' ', 1)
+                next_hop = next_hops.get(entry[1])
+                if next_hop is None:
+                    next_hop = next_hops[entry[1]] = self.NextHop(entry[1])
+                if int_lpm:
+                    # IntLpmDict parses the prefix itself, no need to normalize it by ip_network
+                    (ipv6_entries if ':' in entry[0] else ipv4_entries).append((entry[0], next_hop))
+                    continue
                 prefix = ip_network(six.text_type(entry[0]))
-                next_hop = self.NextHop(entry[1])
                 if prefix.version == 4:
                     self._ipv4_lpm_dict[str(prefix)] = next_hop
                 elif prefix.version == 6:
                     self._ipv6_lpm_dict[str(prefix)] = next_hop
+        if int_lpm:
+            self._ipv4_lpm_dict.load(ipv4_entries)
+            self._ipv6_lpm_dict.load(ipv6_entries)
 
     def __getitem__(self, ip):
         ip = ip_address(six.text_type(ip))
@@ -115,6 +115,7 @@ class FibTest(BaseTest):
          - dst_vid                vlan tag id of dst pkts. Default: None(untag)
          - ignore_ttl:            mask the ttl field in the expected packet
          - single_fib_for_duts:   have a single fib file for all DUTs in multi-dut case. Default: False
+         - int_lpm:               use integer based LPM and ranges to load the fib files. Default: True
         '''
         self.dataplane = ptf.dataplane_instance
         self.asic_type = self.test_params.get('asic_type')
@@ -126,7 +127,7 @@ class FibTest(BaseTest):
 
         self.fibs = []
         for fib_info_file in self.test_params.get('fib_info_files'):
-            self.fibs.append(fib.Fib(fib_info_file))
+            self.fibs.append(fib.Fib(fib_info_file, int_lpm=self.test_params.get('int_lpm', True)))
 
         ptf_test_port_map = self.test_params.get('ptf_test_port_map')
         with open(ptf_test_port_map) as f:
@@ -1,8 +1,16 @@
+import binascii
 import random
+import socket
+import struct
 import six
 
-from ipaddress import ip_address, ip_network
-from SubnetTree import SubnetTree
+from bisect import bisect_right
+from ipaddress import ip_address, ip_network, IPv6Address
+try:
+    from SubnetTree import SubnetTree
+except ImportError:
+    # IntLpmDict doesn't depend on SubnetTree
+    SubnetTree = None
 
 '''
 LpmDict is a class used in FIB test for LPM and IP segmentation.
@@ -112,3 +120,160 @@ class LpmDict():
 
     def contains(self, key):
         return key in self._subnet_tree
+
+
+'''
+IntLpmDict is an alternative of LpmDict with the same interface, but without
+SubnetTree and ipaddress objects in the hot path.
+
+IP addresses are kept as integers (128-bit for IPv6). Prefixes are stored in a
+dict per prefix length for the LPM search, and range boundaries are integers,
+so building the ranges of 100k+ prefixes only needs to sort integers. The
+ranges() function returns a list of IntIntervals, which have the same methods
+as IpInterval and convert integers to IP strings only when asked.
+
+Use load() to bulk load prefixes, and random_ips() to get a random IP of each
+range in one call.
+'''
+
+
+def _ipv4_int_to_str(ip):
+    return socket.inet_ntoa(struct.pack('!I', ip))
+
+
+def _ipv6_int_to_str(ip):
+    return str(IPv6Address(ip))
+
+
+class IntLpmDict():
+    class IntInterval:
+        __slots__ = ('_start', '_end', '_to_str')
+
+        def __init__(self, s, e, to_str):
+            assert s <= e
+            self._start = s
+            self._end = e
+            self._to_str = to_str
+
+        def length(self):
+            return self._end - self._start
+
+        def contains(self, ip):
+            if not isinstance(ip, six.integer_types):
+                ip = int(ip_address(six.text_type(ip)))
+            return ip >= self._start and ip <= self._end
+
+        def get_first_ip(self):
+            return self._to_str(self._start)
+
+        def get_last_ip(self):
+            return self._to_str(self._end)
+
+        def get_random_ip(self):
+            return self._to_str(self._start + random.randint(0, self._end - self._start))
+
+        def __str__(self):
+            return self.get_first_ip() + ' - ' + self.get_last_ip()
+
+    def __init__(self, ipv4=True):
+        self._ipv4 = ipv4
+        self._family = socket.AF_INET if ipv4 else socket.AF_INET6
+        self._to_str = _ipv4_int_to_str if ipv4 else _ipv6_int_to_str
+        self._bits = 32 if ipv4 else 128
+        self._max_ip = (1 << self._bits) - 1
+        # Map of prefix length to dict of {network >> (bits - prefix length): value}
+        self._prefixes = {}
+        # Prefix lengths in the dict, longest first
+        self._prefix_lens = []
+        self._prefix_set = set()
+        # 0.0.0.0 is a non-routable meta-address that needs to be skipped
+        self._boundaries = {0: 1}
+
+    def _ip_to_int(self, ip):
+        return int(binascii.hexlify(socket.inet_pton(self._family, ip)), 16)
+
+    def _parse_prefix(self, key):
+        addr, _, prefix_len = key.partition('/')
+        prefix_len = int(prefix_len) if prefix_len else self._bits
+        network = self._ip_to_int(addr)
+        host_bits = self._bits - prefix_len
+        if network & ((1 << host_bits) - 1):
+            raise ValueError('{} has host bits set'.format(key))
+        return network, prefix_len, host_bits
+
+    def __setitem__(self, key, value):
+        network, prefix_len, host_bits = self._parse_prefix(key)
+        # add the current key to self._prefix_set only when it is not the default route and it is not a duplicate key
+        if prefix_len and key not in self._prefix_set:
+            self._boundaries[network] = self._boundaries.get(network, 0) + 1
+            last = network | ((1 << host_bits) - 1)
+            if last != self._max_ip:
+                self._boundaries[last + 1] = self._boundaries.get(last + 1, 0) + 1
+            self._prefix_set.add(key)
+        if prefix_len not in self._prefixes:
+            self._prefixes[prefix_len] = {}
+            self._prefix_lens = sorted(self._prefixes, reverse=True)
+        self._prefixes[prefix_len][network >> host_bits] = value
+
+    def load(self, items):
+        """Bulk load an iterable of (prefix, value)."""
+        for key, value in items:
+            self[key] = value
+
+    def _lookup(self, key):
+        # Same as SubnetTree, prefix length of the key is ignored
+        ip = self._ip_to_int(key.split('/')[0])
+        for prefix_len in self._prefix_lens:
+            value = self._prefixes[prefix_len].get(ip >> (self._bits - prefix_len), self)
+            if value is not self:
+                return value
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        return self._lookup(key)
+
+    def __delitem__(self, key):
+        network, prefix_len, host_bits = self._parse_prefix(key)
+        if prefix_len:
+            last = network | ((1 << host_bits) - 1)
+            for boundary in (network, last + 1):
+                if boundary > self._max_ip:
+                    continue
+                self._boundaries[boundary] -= 1
+                if not self._boundaries[boundary]:
+                    del self._boundaries[boundary]
+            self._prefix_set.remove(key)
+        del self._prefixes[prefix_len][network >> host_bits]
+
+    def boundaries(self):
+        """Get the sorted start IPs of the ranges as integers."""
+        return sorted(self._boundaries)
+
+    def ranges(self):
+        starts = self.boundaries()
+        ends = [start - 1 for start in starts[1:]] + [self._max_ip]
+        return [self.IntInterval(start, end, self._to_str) for start, end in zip(starts, ends)]
+
+    def find_range(self, ip):
+        """Get the IntInterval containing the ip."""
+        starts = self.boundaries()
+        idx = bisect_right(starts, self._ip_to_int(ip)) - 1
+        end = starts[idx + 1] - 1 if idx + 1 < len(starts) else self._max_ip
+        return self.IntInterval(starts[idx], end, self._to_str)
+
+    def random_ips(self, ranges=None):
+        """Get a random IP string of each range, default is all the ranges."""
+        to_str = self._to_str
+        randint = random.randint
+        if ranges is None:
+            starts = self.boundaries()
+            ends = [start - 1 for start in starts[1:]] + [self._max_ip]
+            return [to_str(start + randint(0, end - start)) for start, end in zip(starts, ends)]
+        return [to_str(r._start + randint(0, r._end - r._start)) for r in ranges]
+
+    def contains(self, key):
+        try:
+            self._lookup(key)
+            return True
+        except KeyError:
+            return False
@@ -73,6 +73,7 @@ import scapy.all as scapyall
 from scapy.arch.linux import attach_filter as attach_filter
 
 import sad_path as sp
+import pcap_flow
 
 from ptf import config
 from ptf.base_tests import BaseTest
@@ -216,6 +217,7 @@ class ReloadTest(BaseTest):
         self.log_fp = open(self.log_file_name, 'w')
 
         self.packets_list = []
+        self.capture_pcap = None
         self.vnet = self.test_params['vnet']
         if (self.vnet):
             self.packets_list = json.load(open(self.test_params['vnet_pkts']))
@@ -1884,7 +1886,7 @@ class ReloadTest(BaseTest):
         """
         This function listens on all ports, in both directions, for the TCP src=1234 dst=5000 packets, until timeout.
         Once found, all packets are dumped to local pcap file,
-        and all packets are saved to self.packets as scapy type(pcap format).
+        and the path of the pcap file is saved to self.capture_pcap.
         """
         if not wait:
             wait = self.time_to_listen + self.test_params['sniff_time_incr']
@@ -1914,8 +1916,8 @@ class ReloadTest(BaseTest):
             subprocess.call(["rm", "-rf", capture_pcap])  # remove old capture
             self.kill_sniffer = False
             self.start_sniffer(capture_pcap, sniff_filter, wait)
-            self.packets = scapyall.rdpcap(capture_pcap)
-            self.log("Number of all packets captured: {}".format(len(self.packets)))
+            self.capture_pcap = capture_pcap
+            self.log("Number of all packets captured: {}".format(pcap_flow.count_frames(capture_pcap)))
         except Exception:
             traceback_msg = traceback.format_exc()
             self.log("Error in tcpdump_sniff: {}".format(traceback_msg))
@@ -1998,7 +2000,7 @@ class ReloadTest(BaseTest):
             # This is a unique (no flooded) received packet.
             # for dualtor, t1->server rcvd pkt will have src MAC as vlan_mac,
             # and server->t1 rcvd pkt will have src MAC as dut_mac
-            self.unique_id.append(int(bytes(packet[scapyall.TCP].payload)))
+            self.unique_id.add(int(bytes(packet[scapyall.TCP].payload)))
             return True
         elif packet[scapyall.Ether].dst == self.dut_mac or packet[scapyall.Ether].dst == self.vlan_mac:
             # This is a sent packet.
@@ -2008,25 +2010,30 @@ class ReloadTest(BaseTest):
         else:
             return False
 
-    def examine_flow(self, filename=None):
+    def parse_flow_frame(self, frame):
         """
-        This method examines pcap file (if given), or self.packets scapy file.
-        The method compares TCP payloads of the packets one by one (assuming all payloads are consecutive integers),
-        and the losses if found - are treated as disruptions in Dataplane forwarding.
-        All disruptions are saved to self.lost_packets dictionary, in format:
-        disrupt_start_id = (missing_packets_count, disrupt_time, disrupt_start_timestamp, disrupt_stop_timestamp)
+        This method is used by examine_flow() method, for frames pcap_flow.TcpFlow can't parse from raw bytes.
+        It returns the TCP Payload ID if the frame is a valid packet of the flow, otherwise None.
         """
-        if filename:
-            all_packets = scapyall.rdpcap(filename)
-        elif self.packets:
-            all_packets = self.packets
-        else:
-            self.log("Filename and self.packets are not defined.")
-            self.fails['dut'].add("Filename and self.packets are not defined")
-            return None
+        packet = scapyall.Ether(frame)
+        if scapyall.TCP in packet and \
+                scapyall.ICMP not in packet and \
+                packet[scapyall.TCP].sport == 1234 and \
+                packet[scapyall.TCP].dport == 5000 and \
+                self.check_tcp_payload(packet):
+            return int(bytes(packet[scapyall.TCP].payload))
+        return None
+
+    def filter_flow_packets(self, filename):
+        """
+        This method is used by examine_flow() method to filter packets of the pcap file with scapy.
+        It returns the filtered scapy packets, sorted by Payload ID and Timestamp.
+        """
+        all_packets = scapyall.rdpcap(filename)
+        self.log("Number of all packets captured: {}".format(len(all_packets)))
         # Filter out packets and remove floods:
-        # This list will contain all unique Payload ID, to filter out received floods.
-        self.unique_id = list()
+        # This set will contain all unique Payload ID, to filter out received floods.
+        self.unique_id = set()
         filtered_packets = [pkt for pkt in all_packets if
                             scapyall.TCP in pkt and
                             scapyall.ICMP not in pkt and
@@ -2052,18 +2059,59 @@ class ReloadTest(BaseTest):
             filtered_packets = filtered_packets + filtered_decap_packets
 
         # Re-arrange packets, if delayed, by Payload ID and Timestamp:
-        packets = sorted(filtered_packets, key=lambda packet: (
+        return sorted(filtered_packets, key=lambda packet: (
             int(bytes(packet[scapyall.TCP].payload)), float(packet.time)))
+
+    def examine_flow(self, filename=None):
+        """
+        This method examines pcap file (if given), or the pcap file captured by tcpdump_sniff.
+        The method compares TCP payloads of the packets one by one (assuming all payloads are consecutive integers),
+        and the losses if found - are treated as disruptions in Dataplane forwarding.
+        All disruptions are saved to self.lost_packets dictionary, in format:
+        disrupt_start_id = (missing_packets_count, disrupt_time, disrupt_start_timestamp, disrupt_stop_timestamp)
+
+        The pcap file is read frame by frame with pcap_flow.TcpFlow, which parses the headers from raw bytes and
+        keeps only Payload ID, Timestamp and direction of the packets. Captures of vnet tests, and captures
+        TcpFlow doesn't support, are examined with scapy.
+        """
+        filename = filename or self.capture_pcap
+        if not filename:
+            self.log("Filename and self.capture_pcap are not defined.")
+            self.fails['dut'].add("Filename and self.capture_pcap are not defined")
+            return None
+
+        flow = None
+        if not self.vnet:
+            try:
+                flow = pcap_flow.TcpFlow(filename, 1234, 5000, [self.dut_mac, self.vlan_mac],
+                                         [self.dut_mac, self.vlan_mac], parse_frame=self.parse_flow_frame)
+                self.log("Number of all packets captured: {}, packets parsed by scapy: {}".format(
+                    flow.frame_count, flow.fallback_count))
+            except pcap_flow.UnsupportedCapture as e:
+                self.log("Examining pcap file {} with scapy: {}".format(filename, e))
+
+        if flow is not None:
+            # Re-arrange packets, if delayed, by Payload ID and Timestamp:
+            flow_order = flow.sorted_indexes()
+            packet_count = len(flow_order)
+            flow_packets = flow.packets(flow_order)
+        else:
+            packets = self.filter_flow_packets(filename)
+            packet_count = len(packets)
+            flow_packets = [(int(bytes(packet[scapyall.TCP].payload)), float(packet.time),
+                             packet[scapyall.Ether].dst == self.dut_mac or packet[scapyall.Ether].dst == self.vlan_mac)
+                            for packet in packets]
+
         self.lost_packets = dict()
         self.max_disrupt, self.total_disruption = 0, 0
         sent_packets = dict()
         # Track packet id's that were neither sent or received
         missing_sent_and_received_packet_id_sequences = []
         self.fails['dut'].add("Sniffer failed to capture any traffic")
-        self.assertTrue(packets, "Sniffer failed to capture any traffic")
+        self.assertTrue(packet_count, "Sniffer failed to capture any traffic")
         self.fails['dut'].clear()
         prev_payload = None
-        if packets:
+        if packet_count:
             prev_payload, prev_time = -1, 0
             sent_payload = 0
             received_counter = 0    # Counts packets from dut.
@@ -2075,30 +2123,29 @@ class ReloadTest(BaseTest):
             missed_t1_to_vlan = 0
             flooded_pkts = []
             self.disruption_start, self.disruption_stop = None, None
-            for packet in packets:
-                if packet[scapyall.Ether].dst == self.dut_mac or packet[scapyall.Ether].dst == self.vlan_mac:
+            for payload_id, packet_time, is_sent in flow_packets:
+                if is_sent:
                     # This is a sent packet - keep track of it as payload_id:timestamp.
                     # for dualtor both MACs are needed:
                     #   t1->server sent pkt will have dst MAC as dut_mac,
                     #   and server->t1 sent pkt will have dst MAC as vlan_mac
-                    sent_payload = int(bytes(packet[scapyall.TCP].payload))
+                    sent_payload = payload_id
                     if sent_payload in sent_packets:
                         flooded_pkts.append(sent_payload)
-                    sent_packets[sent_payload] = float(packet.time)
+                    sent_packets[sent_payload] = packet_time
                     sent_counter += 1
                     continue
-                if packet[scapyall.Ether].src == self.dut_mac or packet[scapyall.Ether].src == self.vlan_mac:
-                    # This is a received packet.
-                    # for dualtor both MACs are needed:
-                    #   t1->server rcvd pkt will have src MAC as vlan_mac,
-                    #   and server->t1 rcvd pkt will have src MAC as dut_mac
-                    received_time = float(packet.time)
-                    received_payload = int(bytes(packet[scapyall.TCP].payload))
-                    if (received_payload % 5) == 0:   # From vlan to T1.
-                        received_vlan_to_t1 += 1
-                    else:
-                        received_t1_to_vlan += 1
-                    received_counter += 1
+                # This is a received packet, filtered packets not sent have src MAC of DUT.
+                # for dualtor both MACs are needed:
+                #   t1->server rcvd pkt will have src MAC as vlan_mac,
+                #   and server->t1 rcvd pkt will have src MAC as dut_mac
+                received_time = packet_time
+                received_payload = payload_id
+                if (received_payload % 5) == 0:   # From vlan to T1.
+                    received_vlan_to_t1 += 1
+                else:
+                    received_t1_to_vlan += 1
+                received_counter += 1
                 if not (received_payload and received_time):
                     # This is the first valid received packet.
                     prev_payload = received_payload
@@ -2230,10 +2277,13 @@ class ReloadTest(BaseTest):
             self.fails["dut"].add(message)
 
         self.log("Total incoming packets captured %d" % received_counter)
-        if packets:
+        if packet_count:
             filename = ('/tmp/capture_filtered.pcap' if self.logfile_suffix is None
                         else "/tmp/capture_filtered_%s.pcap" % self.logfile_suffix)
-            scapyall.wrpcap(filename, packets)
+            if flow is not None:
+                flow.write_pcap(filename, flow_order)
+            else:
+                scapyall.wrpcap(filename, packets)
             self.log("Filtered pcap dumped to %s" % filename)
 
     def check_forwarding_stop(self, signal):
@@ -0,0 +1,85 @@
+'''
+Benchmark of the LPM and range backends of Fib: LpmDict (SubnetTree and
+ipaddress) and IntLpmDict (integers).
+
+A fib_info file with random IPv4 and IPv6 prefixes is generated, then the time
+of loading it, building the ranges and getting a random IP of each range is
+measured for both backends. The ranges and LPM results of both backends are
+compared to make sure they are the same.
+
+Usage:
+    python3 lpm_benchmark.py [--prefixes 100000] [--lookups 10000]
+'''
+import argparse
+import ipaddress
+import random
+import tempfile
+import time
+
+import fib
+
+
+def gen_fib_info_file(prefix_count):
+    f = tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False)
+    next_hops = [' '.join('[{}]'.format(' '.join(str(p) for p in range(i, i + 2))) for i in range(n, n + 8, 2))
+                 for n in range(0, 64, 8)]
+    prefixes = set()
+    while len(prefixes) < prefix_count:
+        if random.random() < 0.7:
+            prefixes.add(str(ipaddress.ip_network((random.getrandbits(32), random.randint(8, 32)), strict=False)))
+        else:
+            prefixes.add(str(ipaddress.ip_network((random.getrandbits(128), random.randint(16, 128)), strict=False)))
+    for prefix in prefixes:
+        f.write('{} {}\n'.format(prefix, random.choice(next_hops)))
+    f.close()
+    return f.name
+
+
+def measure(file_path, int_lpm):
+    timings = {}
+    start = time.time()
+    fib_obj = fib.Fib(file_path, int_lpm=int_lpm)
+    timings['load'] = time.time() - start
+
+    start = time.time()
+    ranges = fib_obj.ipv4_ranges() + fib_obj.ipv6_ranges()
+    timings['ranges'] = time.time() - start
+
+    start = time.time()
+    for ip_range in ranges:
+        ip_range.get_random_ip()
+    timings['random ips'] = time.time() - start
+    return fib_obj, ranges, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of LpmDict and IntLpmDict')
+    parser.add_argument('--prefixes', type=int, default=100000, help='Number of prefixes in the fib_info file')
+    parser.add_argument('--lookups', type=int, default=10000, help='Number of LPM lookups to compare')
+    args = parser.parse_args()
+
+    file_path = gen_fib_info_file(args.prefixes)
+    ip_fib, ip_ranges, ip_timings = measure(file_path, int_lpm=False)
+    int_fib, int_ranges, int_timings = measure(file_path, int_lpm=True)
+
+    assert [str(r) for r in ip_ranges] == [str(r) for r in int_ranges], 'Ranges are different'
+    for ip_range in random.sample(int_ranges, min(args.lookups, len(int_ranges))):
+        ip = ip_range.get_random_ip()
+        assert (ip in ip_fib) == (ip in int_fib), 'LPM results of {} are different'.format(ip)
+        if ip in ip_fib:
+            assert str(ip_fib[ip]) == str(int_fib[ip]), 'LPM results of {} are different'.format(ip)
+
+    print('{} prefixes, {} ranges'.format(args.prefixes, len(int_ranges)))
+    print('{:<12} {:>12} {:>12} {:>8}'.format('', 'LpmDict (s)', 'IntLpmDict (s)', 'speedup'))
+    for name in ip_timings:
+        print('{:<12} {:>12.3f} {:>14.3f} {:>8.1f}'.format(
+            name, ip_timings[name], int_timings[name], ip_timings[name] / max(int_timings[name], 1e-9)))
+
+    start = time.time()
+    int_fib._ipv4_lpm_dict.random_ips()
+    int_fib._ipv6_lpm_dict.random_ips()
+    print('IntLpmDict.random_ips of all ranges: {:.3f}s'.format(time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
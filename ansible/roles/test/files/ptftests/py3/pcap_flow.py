@@ -0,0 +1,322 @@
+'''
+Streaming analysis of the data plane flow captured by advanced-reboot.
+
+The capture of a warm/fast reboot test has millions of packets. Loading it
+with scapy rdpcap builds a scapy object per packet, which takes many minutes
+and GBs of memory. TcpFlow reads pcap or pcapng captures frame by frame and
+parses the Ethernet/802.1Q/IPv4/IPv6/TCP headers of each frame from raw bytes
+at fixed offsets. Only the payload id, timestamp, direction and position in the
+capture of the packets of the flow are kept, in compact arrays.
+
+Frames the raw parser doesn't handle, like IP fragments or IP tunnels, are
+passed to a fallback parser, so that the result is the same as the one of
+examining the scapy packets.
+'''
+import struct
+
+from array import array
+
+LINKTYPE_ETHERNET = 1
+
+PCAP_MAGIC_USEC = 0xa1b2c3d4
+PCAP_MAGIC_NSEC = 0xa1b23c4d
+PCAPNG_SHB = 0x0a0d0d0a
+PCAPNG_IDB = 0x00000001
+PCAPNG_OPB = 0x00000002
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1a2b3c4d
+PCAPNG_OPT_IF_TSRESOL = 9
+
+ETH_TYPE_DOT1Q = 0x8100
+ETH_TYPE_IPV4 = 0x0800
+ETH_TYPE_IPV6 = 0x86dd
+IP_PROTO_ICMP = 1
+IP_PROTO_TCP = 6
+
+
+class UnsupportedCapture(Exception):
+    '''
+    The capture can't be examined from raw bytes, the caller should examine it
+    with scapy instead.
+    '''
+    pass
+
+
+def _parse_tsresol(options, endian):
+    '''
+    Get the timestamp resolution of a pcapng interface from the options of its
+    IDB, default is microseconds.
+    '''
+    tsresol = 1000000
+    offset = 0
+    while offset + 4 <= len(options):
+        code, length = struct.unpack(endian + 'HH', options[offset:offset + 4])
+        if code == 0:
+            break
+        if code == PCAPNG_OPT_IF_TSRESOL and length == 1:
+            value = options[offset + 4]
+            tsresol = (2 if value & 0x80 else 10) ** (value & 0x7f)
+        offset += 4 + (length + 3) // 4 * 4
+    return tsresol
+
+
+def _iter_pcap_frames(f, header):
+    magic = struct.unpack('<I', header[:4])[0]
+    endian = '<'
+    if magic not in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+        endian = '>'
+        magic = struct.unpack('>I', header[:4])[0]
+    tsresol = 1000000000 if magic == PCAP_MAGIC_NSEC else 1000000
+    header += f.read(24 - len(header))
+    linktype = struct.unpack(endian + 'I', header[20:24])[0] & 0x0fffffff
+    record_header = struct.Struct(endian + 'IIII')
+    offset = 24
+    while True:
+        data = f.read(16)
+        if len(data) < 16:
+            return
+        sec, subsec, caplen, wirelen = record_header.unpack(data)
+        frame = f.read(caplen)
+        if len(frame) < caplen:
+            return
+        yield linktype, (sec * tsresol + subsec) / tsresol, offset + 16, frame, wirelen
+        offset += 16 + caplen
+
+
+def _iter_pcapng_frames(f, header):
+    # Interfaces of the current section, list of (linktype, tsresol)
+    interfaces = []
+    endian = '<'
+    offset = 0
+    data = header + f.read(8 - len(header))
+    while len(data) == 8:
+        block_type = struct.unpack(endian + 'I', data[:4])[0]
+        if block_type == PCAPNG_SHB:
+            body_start = f.read(4)
+            if len(body_start) < 4:
+                return
+            endian = '<' if struct.unpack('<I', body_start)[0] == PCAPNG_BYTE_ORDER_MAGIC else '>'
+            block_len = struct.unpack(endian + 'I', data[4:8])[0]
+            f.read(block_len - 12)
+            interfaces = []
+        else:
+            block_len = struct.unpack(endian + 'I', data[4:8])[0]
+            body = f.read(block_len - 8)
+            if len(body) < block_len - 8:
+                return
+            if block_type == PCAPNG_IDB:
+                interfaces.append((struct.unpack(endian + 'H', body[:2])[0],
+                                   _parse_tsresol(body[8:-4], endian)))
+            elif block_type == PCAPNG_EPB:
+                intid, tshigh, tslow, caplen, wirelen = struct.unpack(endian + 'IIIII', body[:20])
+                linktype, tsresol = interfaces[intid]
+                yield linktype, ((tshigh << 32) + tslow) / tsresol, offset + 28, body[20:20 + caplen], wirelen
+            elif block_type == PCAPNG_OPB:
+                intid, _, tshigh, tslow, caplen, wirelen = struct.unpack(endian + 'HHIIII', body[:20])
+                linktype, tsresol = interfaces[intid]
+                yield linktype, ((tshigh << 32) + tslow) / tsresol, offset + 28, body[20:20 + caplen], wirelen
+            elif block_type == PCAPNG_SPB:
+                # Simple packet blocks have no timestamp
+                raise UnsupportedCapture('Simple packet blocks are not supported')
+        offset += block_len
+        data = f.read(8)
+
+
+def iter_frames(f):
+    '''
+    Read frames of a pcap or pcapng capture one by one.
+
+    Yields tuples of (linktype, timestamp, offset, frame, wirelen), offset is
+    the position of the frame in the capture file.
+    '''
+    header = f.read(4)
+    if len(header) < 4:
+        return iter(())
+    if struct.unpack('<I', header)[0] == PCAPNG_SHB:
+        return _iter_pcapng_frames(f, header)
+    if struct.unpack('<I', header)[0] in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC) or \
+            struct.unpack('>I', header)[0] in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+        return _iter_pcap_frames(f, header)
+    raise UnsupportedCapture('Unknown capture file format')
+
+
+def count_frames(filename):
+    '''
+    Count frames of a pcap or pcapng capture.
+    '''
+    with open(filename, 'rb') as f:
+        return sum(1 for _ in iter_frames(f))
+
+
+def mac_to_bytes(mac):
+    '''
+    Convert a MAC address string to bytes to compare it with MAC addresses in
+    raw frames. The string is compared with the MAC addresses of scapy packets
+    as is, so only MAC addresses in the format of scapy (lower case, separated
+    by ':') can match, otherwise None is returned.
+    '''
+    try:
+        mac_bytes = bytes(int(octet, 16) for octet in mac.split(':'))
+    except (AttributeError, ValueError):
+        return None
+    if len(mac_bytes) != 6 or mac != ':'.join('%02x' % octet for octet in mac_bytes):
+        return None
+    return mac_bytes
+
+
+def tcp_payload_offset(frame, sport, dport):
+    '''
+    Get the offset of the TCP payload of a frame of the flow from sport to
+    dport, from the raw bytes of the frame.
+
+    Returns the offset, or None if the frame is not a TCP packet of the flow,
+    or False if the frame can't be parsed from raw bytes, like IP fragments
+    and tunnels.
+    '''
+    if len(frame) < 14:
+        return False
+    offset = 12
+    eth_type = (frame[offset] << 8) | frame[offset + 1]
+    while eth_type == ETH_TYPE_DOT1Q:
+        offset += 4
+        if len(frame) < offset + 2:
+            return False
+        eth_type = (frame[offset] << 8) | frame[offset + 1]
+    offset += 2
+
+    if eth_type == ETH_TYPE_IPV4:
+        if len(frame) < offset + 20 or frame[offset] >> 4 != 4:
+            return False
+        ihl = (frame[offset] & 0x0f) * 4
+        total_len = (frame[offset + 2] << 8) | frame[offset + 3]
+        # More fragments flag or fragment offset
+        if ihl < 20 or total_len < ihl or (frame[offset + 6] & 0x3f) or frame[offset + 7]:
+            return False
+        proto = frame[offset + 9]
+        l4_len = total_len - ihl
+        offset += ihl
+    elif eth_type == ETH_TYPE_IPV6:
+        if len(frame) < offset + 40 or frame[offset] >> 4 != 6:
+            return False
+        proto = frame[offset + 6]
+        l4_len = (frame[offset + 4] << 8) | frame[offset + 5]
+        offset += 40
+    else:
+        return False
+
+    if proto == IP_PROTO_ICMP and eth_type == ETH_TYPE_IPV4:
+        return None
+    if proto != IP_PROTO_TCP or len(frame) < offset + 20:
+        return False
+    if struct.unpack('!HH', frame[offset:offset + 4]) != (sport, dport):
+        return None
+    data_offset = (frame[offset + 12] >> 4) * 4
+    if data_offset < 20 or l4_len < data_offset or len(frame) < offset + data_offset:
+        return False
+    return offset + data_offset
+
+
+class TcpFlow(object):
+    '''
+    Packets of a TCP flow in a capture, in compact arrays, filtered the same
+    way as ReloadTest.examine_flow filters scapy packets:
+        - TCP packets from sport to dport, not in ICMP, with integer payload
+        - received packets (source MAC is one of the received MACs) with
+          unique payload id, or sent packets (destination MAC is one of the
+          sent MACs)
+    '''
+
+    def __init__(self, filename, sport, dport, sent_macs, received_macs, parse_frame=None):
+        '''
+        filename: path of the pcap or pcapng capture
+        sport, dport: TCP ports of the flow
+        sent_macs: destination MACs of sent packets
+        received_macs: source MACs of received packets
+        parse_frame: fallback parser of frames which can't be parsed from raw
+            bytes, returns the payload id of the frame, or None if it isn't a
+            packet of the flow
+        '''
+        self.filename = filename
+        self.frame_count = 0
+        self.fallback_count = 0
+        self.payload_ids = array('q')
+        self.times = array('d')
+        self.sent = array('b')
+        self.offsets = array('q')
+        self.caplens = array('l')
+        self.wirelens = array('l')
+        self._read(sport, dport, [mac_to_bytes(mac) for mac in sent_macs],
+                   [mac_to_bytes(mac) for mac in received_macs], parse_frame)
+
+    def _read(self, sport, dport, sent_macs, received_macs, parse_frame):
+        unique_ids = set()
+        with open(self.filename, 'rb') as f:
+            for linktype, timestamp, offset, frame, wirelen in iter_frames(f):
+                self.frame_count += 1
+                if linktype != LINKTYPE_ETHERNET:
+                    raise UnsupportedCapture('Unsupported link type {}'.format(linktype))
+                payload_offset = tcp_payload_offset(frame, sport, dport)
+                if payload_offset is None:
+                    continue
+                if payload_offset is False:
+                    if parse_frame is None:
+                        continue
+                    self.fallback_count += 1
+                    payload_id = parse_frame(frame)
+                    if payload_id is None:
+                        continue
+                else:
+                    try:
+                        payload_id = int(frame[payload_offset:])
+                    except ValueError:
+                        continue
+
+                if payload_id not in unique_ids and frame[6:12] in received_macs:
+                    unique_ids.add(payload_id)
+                elif frame[0:6] not in sent_macs:
+                    # Neither a unique received packet nor a sent packet
+                    continue
+                try:
+                    self.payload_ids.append(payload_id)
+                except OverflowError:
+                    raise UnsupportedCapture('Payload id {} is out of range'.format(payload_id))
+                self.times.append(timestamp)
+                self.sent.append(frame[0:6] in sent_macs)
+                self.offsets.append(offset)
+                self.caplens.append(len(frame))
+                self.wirelens.append(wirelen)
+
+    def __len__(self):
+        return len(self.payload_ids)
+
+    def sorted_indexes(self):
+        '''
+        Indexes of the packets sorted by payload id and timestamp. Packets with
+        the same payload id and timestamp are in the order of the capture.
+        '''
+        return [idx for _, _, idx in sorted(zip(self.payload_ids, self.times, range(len(self))))]
+
+    def packets(self, indexes):
+        '''
+        Yield tuples of (payload id, timestamp, sent) of packets at indexes.
+        '''
+        payload_ids, times, sent = self.payload_ids, self.times, self.sent
+        for idx in indexes:
+            yield payload_ids[idx], times[idx], bool(sent[idx])
+
+    def write_pcap(self, filename, indexes):
+        '''
+        Write frames of the packets at indexes to a pcap file, frames are
+        copied from the capture file as is.
+        '''
+        record_header = struct.Struct('<IIII')
+        with open(self.filename, 'rb') as src, open(filename, 'wb') as dst:
+            dst.write(struct.pack('<IHHiIII', PCAP_MAGIC_USEC, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+            for idx in indexes:
+                timestamp = self.times[idx]
+                sec = int(timestamp)
+                usec = int(round((timestamp - sec) * 1000000))
+                src.seek(self.offsets[idx])
+                dst.write(record_header.pack(sec, usec, self.caplens[idx], self.wirelens[idx]))
+                dst.write(src.read(self.caplens[idx]))
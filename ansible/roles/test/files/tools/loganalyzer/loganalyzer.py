@@ -29,10 +29,16 @@ import re
 import os
 import os.path
 import csv
+import fcntl
+import gzip
+import hashlib
+import json
 import time
 import logging
 import logging.handlers
 import subprocess
+import resource
+import tempfile
 from datetime import datetime
 
 # ---------------------------------------------------------------------
@@ -58,6 +64,294 @@ err_start_ignore_marker = -8
 # will not be picked up by the analyzer.
 MAX_LOG_MESSAGE_LENGTH = 1000
 
+# -- Name of the compressed result file written by analyze_extracted action
+extracted_result_file = 'result.loganalysis.json.gz'
+
+# -- Maximum number of markers kept in the log offset file
+MAX_OFFSET_FILE_ENTRIES = 50
+
+# -- Maximum number of compiled regex sets kept by get_regex_set()
+MAX_REGEX_SET_CACHE_SIZE = 64
+regex_set_cache = {}
+
+# -- Block size used by the streaming analysis mode to read log files backwards
+READ_BLOCK_SIZE = 64 * 1024
+
+# -- Inline flags which change how literal characters of a regex are matched
+re_inline_flags = re.compile(r"\(\?[aiLmsux]")
+re_repeat_quantifier = re.compile(r"\{(\d*)(,\d*)?\}")
+
+
+def read_lines_reversed(log_file, block_size=READ_BLOCK_SIZE):
+    '''
+    @summary: Generator which yields lines of a binary file object from the last one to the first one.
+
+    The file is read backwards in blocks of block_size bytes, so memory usage is bounded by the block
+    size (plus the longest line) no matter how large the file is. Lines keep their trailing newline,
+    same as file.readlines().
+
+    @param log_file: File object opened in binary mode.
+    @param block_size: Number of bytes read from the file at once.
+    '''
+    log_file.seek(0, os.SEEK_END)
+    position = log_file.tell()
+    pending = b''
+    while position > 0:
+        read_size = min(block_size, position)
+        position -= read_size
+        log_file.seek(position)
+        data = log_file.read(read_size) + pending
+        parts = data.split(b'\n')
+        if len(parts) == 1:
+            # No newline in the block yet, keep reading backwards
+            pending = data
+            continue
+        if parts[-1]:
+            # Last line of the file without trailing newline
+            yield parts[-1].decode('utf-8', 'replace')
+        for part in reversed(parts[1:-1]):
+            yield (part + b'\n').decode('utf-8', 'replace')
+        pending = parts[0] + b'\n'
+    if pending:
+        yield pending.decode('utf-8', 'replace')
+# ---------------------------------------------------------------------
+
+
+def _skip_char_set(pattern, index):
+    '''
+    @summary: Return index right after the character set starting at pattern[index], None if not terminated.
+    '''
+    index += 1
+    # ']' right after '[' or '[^' is a literal
+    if pattern[index:index + 1] == '^':
+        index += 1
+    if pattern[index:index + 1] == ']':
+        index += 1
+    while index < len(pattern):
+        if pattern[index] == '\\':
+            index += 2
+        elif pattern[index] == ']':
+            return index + 1
+        else:
+            index += 1
+    return None
+
+
+def _skip_group(pattern, index):
+    '''
+    @summary: Return index right after the group or character set starting at pattern[index],
+              None if not terminated.
+    '''
+    if pattern[index] == '[':
+        return _skip_char_set(pattern, index)
+
+    depth = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            index += 2
+        elif char == '[':
+            index = _skip_char_set(pattern, index)
+            if index is None:
+                return None
+        else:
+            if char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+                if depth == 0:
+                    return index + 1
+            index += 1
+    return None
+
+
+def _split_alternation(pattern):
+    '''
+    @summary: Split pattern by the '|' characters which are not inside a group or a character set.
+    '''
+    branches = []
+    start = 0
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            index += 2
+        elif char in '([':
+            index = _skip_group(pattern, index)
+            if index is None:
+                return None
+        elif char == '|':
+            branches.append(pattern[start:index])
+            index += 1
+            start = index
+        else:
+            index += 1
+    branches.append(pattern[start:])
+    return branches
+
+
+def _longest_required_literal(branch):
+    '''
+    @summary: Return the longest literal string which must be present in any string matched by branch.
+              The branch must not contain top level alternation.
+    '''
+    best = ''
+    current = ''
+    index = 0
+    while index < len(branch):
+        char = branch[index]
+        token = None
+        if char == '\\':
+            escaped = branch[index + 1:index + 2]
+            index += 2
+            if escaped and not escaped.isalnum():
+                token = escaped
+            elif escaped in ('x', 'u', 'U', 'N') or escaped.isdigit():
+                # Character codes and back references, skip their arguments
+                while index < len(branch) and (branch[index].isalnum() or branch[index] in '{}'):
+                    index += 1
+            # Other escaped alphanumerics are classes or anchors
+        elif char in '([':
+            index = _skip_group(branch, index)
+            if index is None:
+                return ''
+        elif char in '.^$*+?{':
+            index += 1
+        else:
+            token = char
+            index += 1
+
+        required = token is not None
+        quantifier = branch[index:index + 1]
+        if quantifier in ('*', '?'):
+            required = False
+            index += 1
+        elif quantifier == '+':
+            index += 1
+        elif quantifier == '{':
+            repeat = re_repeat_quantifier.match(branch, index)
+            required = repeat is not None and repeat.group(1) not in ('', '0')
+            if repeat:
+                index = repeat.end()
+        else:
+            quantifier = ''
+
+        if quantifier and branch[index:index + 1] in ('?', '+'):
+            # Lazy or possessive quantifier
+            index += 1
+
+        if required:
+            current += token
+        if not required or quantifier:
+            best = max(best, current, key=len)
+            current = ''
+    return max(best, current, key=len)
+
+
+def build_literal_prefilter(regex_list):
+    '''
+    @summary: Derive a literal-substring prefilter from a list of regular expressions.
+
+    A line can be matched by one of the regular expressions only if it contains at least one of the
+    returned literals, so lines without any of them don't need to be checked by the regex engine.
+
+    @param regex_list: List of regular expression strings.
+
+    @return: Tuple of literals, or None if a literal can't be derived for some of the expressions.
+    '''
+    literals = set()
+    for regex in regex_list:
+        if re_inline_flags.search(regex):
+            return None
+        branches = _split_alternation(regex)
+        if branches is None:
+            return None
+        for branch in branches:
+            literal = _longest_required_literal(branch)
+            if not literal:
+                return None
+            literals.add(literal)
+
+    # A literal containing another literal is redundant
+    return tuple(sorted(literal for literal in literals
+                        if not any(other != literal and other in literal for other in literals)))
+# ---------------------------------------------------------------------
+
+
+class RegexSet(object):
+    '''
+    @summary: List of regular expressions compiled once.
+
+    The expressions are compiled into a single alternation for matching lines and, on demand,
+    one by one for tracking which of them matched, see RegexHits. Use get_regex_set() to reuse compiled sets.
+    '''
+
+    def __init__(self, regex_list):
+        self.patterns = list(regex_list)
+        self.regex = re.compile('|'.join(self.patterns)) if self.patterns else None
+        self._compiled = None
+
+    def __len__(self):
+        return len(self.patterns)
+
+    @property
+    def compiled(self):
+        if self._compiled is None:
+            self._compiled = [re.compile(pattern) for pattern in self.patterns]
+        return self._compiled
+# ---------------------------------------------------------------------
+
+
+class RegexHits(object):
+    '''
+    @summary: Track which regular expressions of a RegexSet matched, while the lines are analyzed.
+
+    The lines matched by the alternation of the set are added in the matching pass, each of them is
+    only checked against the expressions not matched so far. The state is kept here instead of in the
+    RegexSet, so the cached sets can be shared.
+    '''
+
+    def __init__(self, regex_set):
+        self.remaining = list(zip(regex_set.patterns, regex_set.compiled))
+
+    def add(self, line):
+        if self.remaining:
+            self.remaining = [(pattern, regex) for pattern, regex in self.remaining if not regex.search(line)]
+
+    def unmatched(self):
+        '''
+        @return: List of regular expression strings not matching any of the added lines, in the original order.
+        '''
+        return [pattern for pattern, _ in self.remaining]
+# ---------------------------------------------------------------------
+
+
+def get_regex_set(regex_list):
+    '''
+    @summary: Return RegexSet for the list of regular expressions, reusing the one compiled before
+              for the same content.
+
+    @param regex_list: List of regular expression strings.
+    '''
+    key = hashlib.md5(json.dumps(list(regex_list)).encode('utf-8')).hexdigest()
+    regex_set = regex_set_cache.pop(key, None)
+    if regex_set is None:
+        regex_set = RegexSet(regex_list)
+        while len(regex_set_cache) >= MAX_REGEX_SET_CACHE_SIZE:
+            regex_set_cache.pop(next(iter(regex_set_cache)))
+    # Keep the most recently used set last
+    regex_set_cache[key] = regex_set
+    return regex_set
+# ---------------------------------------------------------------------
+
+
+def get_peak_memory_kb():
+    '''
+    @summary: Return peak resident set size of the current process in kilobytes.
+    '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+# ---------------------------------------------------------------------
+
 
 class AnsibleLogAnalyzer:
     '''
@@ -100,10 +394,13 @@ class AnsibleLogAnalyzer:
         return logger
     # ---------------------------------------------------------------------
 
-    def __init__(self, run_id, verbose, start_marker=None):
+    def __init__(self, run_id, verbose, start_marker=None, streaming=False):
         self.run_id = run_id
         self.verbose = verbose
         self.start_marker = start_marker
+        # -- Read log files backwards in blocks and prefilter lines instead of loading whole files
+        self.streaming = streaming
+        self.analysis_stats = {}
     # ---------------------------------------------------------------------
 
     def print_diagnostic_message(self, message):
@@ -246,6 +543,53 @@ class AnsibleLogAnalyzer:
 
         return False
 
+    def record_log_offsets(self, offset_file, log_file_list, marker):
+        '''
+        @summary: Record current (device, inode, size) of the log files into offset_file.
+
+        The offsets are recorded before the marker is placed, so the marker is located after the
+        recorded offset. extract_log uses them to copy only the log produced after the marker
+        instead of unrotating and scanning all the log files.
+
+        @param offset_file:   Path to JSON file with offsets, keyed by marker and log file path.
+        @param log_file_list: List of file paths, to be applied with marker.
+        @param marker:        Marker to be placed into log files.
+        '''
+        # Runs of init for different tests may update the file at the same time, serialize the updates with a lock
+        # on a separate file, which is not replaced
+        with open(offset_file + '.lock', 'w') as lock_fp:
+            fcntl.flock(lock_fp, fcntl.LOCK_EX)
+            offsets = {}
+            if os.path.exists(offset_file):
+                try:
+                    with open(offset_file, 'r') as fp:
+                        offsets = json.load(fp)
+                except ValueError:
+                    self.print_diagnostic_message('Offset file {} is corrupted, recreate it'.format(offset_file))
+
+            file_offsets = {}
+            for log_file in [system_log_file] + log_file_list:
+                if not os.path.exists(log_file):
+                    continue
+                stat = os.stat(log_file)
+                file_offsets[log_file] = [stat.st_dev, stat.st_ino, stat.st_size]
+            offsets.pop(marker, None)
+            offsets[marker] = file_offsets
+
+            # Keep only the latest markers, JSON objects preserve insertion order
+            for stale_marker in list(offsets.keys())[:-MAX_OFFSET_FILE_ENTRIES]:
+                offsets.pop(stale_marker)
+
+            # Write into a unique temporary file in the same directory, then replace the file atomically, so readers
+            # like extract_log never see a partially written file
+            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(offset_file)),
+                                             prefix=os.path.basename(offset_file) + '.', suffix='.tmp',
+                                             delete=False) as fp:
+                json.dump(offsets, fp)
+            os.replace(fp.name, offset_file)
+        self.print_diagnostic_message('marker {}, recorded log offsets {}'.format(marker, file_offsets))
+    # ---------------------------------------------------------------------
+
     def place_marker(self, log_file_list, marker, wait_for_marker=False):
         '''
         @summary: Place marker into '/dev/log' and each log file specified.
@@ -365,6 +709,17 @@ class AnsibleLogAnalyzer:
         return regex, messages_regex
     # ---------------------------------------------------------------------
 
+    def regex_found(self, regex, str):
+        '''
+        @summary: Check whether regex matches anywhere in the given string.
+
+        Streaming mode stops at the first match with search(), legacy mode collects all matches with findall().
+        '''
+        if self.streaming:
+            return regex.search(str) is not None
+        return bool(regex.findall(str))
+    # ---------------------------------------------------------------------
+
     def line_matches(self, str, match_messages_regex, ignore_messages_regex):
         '''
         @summary: This method checks whether given string matches against the
@@ -386,11 +741,11 @@ class AnsibleLogAnalyzer:
 
         ret_code = False
 
-        if ((match_messages_regex is not None) and (match_messages_regex.findall(str))):
+        if ((match_messages_regex is not None) and self.regex_found(match_messages_regex, str)):
             if (ignore_messages_regex is None):
                 ret_code = True
 
-            elif (not ignore_messages_regex.findall(str)):
+            elif (not self.regex_found(ignore_messages_regex, str)):
                 self.print_diagnostic_message('matching line: %s' % str)
                 ret_code = True
 
@@ -411,17 +766,20 @@ class AnsibleLogAnalyzer:
             if (expect_messages_regex is not None) and (expect_messages_regex.match(str)):
                 ret_code = True
         else:
-            if (expect_messages_regex is not None) and (expect_messages_regex.findall(str)):
+            if (expect_messages_regex is not None) and self.regex_found(expect_messages_regex, str):
                 ret_code = True
 
         return ret_code
 
     def analyze_file(self, log_file_path, match_messages_regex, ignore_messages_regex, expect_messages_regex,
-                     maximum_log_length=None):
+                     maximum_log_length=None, prefilter=None, expect_hits=None):
         '''
         @summary: Analyze input file content for messages matching input regex
                   expressions. See line_matches() for details on matching criteria.
 
+                  In streaming mode the file is read backwards block by block and the reading
+                  stops at the start marker, so only the analyzed part of the file is loaded.
+
         @param log_file_path: Patch to the log file.
 
         @param match_messages_regex:
@@ -437,6 +795,11 @@ class AnsibleLogAnalyzer:
 
         @param maximum_log_length - The long log message (length > maximum_log_length) will be dropped by LogAnalyzer.
 
+        @param prefilter - Tuple of literals built by build_literal_prefilter(). Lines which contain none of them
+            are not checked against the regular expressions. None disables prefiltering.
+
+        @param expect_hits - RegexHits of the expected regular expressions, the expected lines are added to it.
+
         @return: List of strings match search criteria.
         '''
 
@@ -451,16 +814,25 @@ class AnsibleLogAnalyzer:
         expected_lines = []
         found_start_marker = False
         found_end_marker = False
+        lines_scanned = 0
+        lines_filtered = 0
+        start_time = time.time()
         if stdin_as_input:
             log_file = sys.stdin
+            rev_lines = reversed(log_file.readlines())
+        elif self.streaming:
+            log_file = open(log_file_path, 'rb')
+            rev_lines = read_lines_reversed(log_file)
         else:
             log_file = open(log_file_path, 'r')
+            rev_lines = reversed(log_file.readlines())
 
         start_marker = self.create_start_marker()
         end_marker = self.create_end_marker()
 
         ignore_marker_run_ids = []
-        for rev_line in reversed(log_file.readlines()):
+        for rev_line in rev_lines:
+            lines_scanned += 1
             if stdin_as_input:
                 in_analysis_range = True
             else:
@@ -522,12 +894,31 @@ class AnsibleLogAnalyzer:
                 if not check_marker and len(rev_line) > maximum_log_length:
                     continue
 
+                if prefilter is not None and not any(literal in rev_line for literal in prefilter):
+                    lines_filtered += 1
+                    continue
+
                 if self.line_is_expected(rev_line, expect_messages_regex):
                     expected_lines.append(rev_line)
+                    if expect_hits is not None:
+                        expect_hits.add(rev_line)
 
                 elif self.line_matches(rev_line, match_messages_regex, ignore_messages_regex):
                     matching_lines.append(rev_line)
 
+        if not stdin_as_input:
+            log_file.close()
+
+        elapsed = time.time() - start_time
+        self.analysis_stats[log_file_path] = {
+            "lines_scanned": lines_scanned,
+            "lines_filtered": lines_filtered,
+            "elapsed": elapsed,
+            "lines_per_sec": lines_scanned / elapsed if elapsed > 0 else 0,
+        }
+        self.print_diagnostic_message('file: %s, scanned %d lines (%d prefiltered) in %.3f sec'
+                                      % (log_file_path, lines_scanned, lines_filtered, elapsed))
+
         # care about the markers only if input is not stdin or no need to check start marker
         if not stdin_as_input and check_marker:
             if (not found_start_marker):
@@ -542,7 +933,7 @@ class AnsibleLogAnalyzer:
     # ---------------------------------------------------------------------
 
     def analyze_file_list(self, log_file_list, match_messages_regex, ignore_messages_regex, expect_messages_regex,
-                          maximum_log_length=None):
+                          maximum_log_length=None, prefilter=None, expect_hits=None):
         '''
         @summary: Analyze input files messages matching input regex expressions.
             See line_matches() for details on matching criteria.
@@ -561,6 +952,12 @@ class AnsibleLogAnalyzer:
         @param maximum_log_length
             The maximum length of the log message. If the length of the log message is greater than this value,
 
+        @param prefilter
+            Tuple of literals used to skip lines which can't match, see analyze_file().
+
+        @param expect_hits
+            RegexHits tracking the expected regular expressions found in the files, see analyze_file().
+
         @return: Returns map <file_name, list_of_matching_strings>
         '''
         res = {}
@@ -570,7 +967,8 @@ class AnsibleLogAnalyzer:
                 continue
             match_strings, expect_strings = self.analyze_file(log_file, match_messages_regex, ignore_messages_regex,
                                                               expect_messages_regex,
-                                                              maximum_log_length=maximum_log_length)
+                                                              maximum_log_length=maximum_log_length,
+                                                              prefilter=prefilter, expect_hits=expect_hits)
 
             match_strings.reverse()
             expect_strings.reverse()
@@ -589,6 +987,9 @@ def usage():
     print('                                 to all log files specified in --logs parameter.')
     print('                                 analyze - perform log analysis of files specified in --logs parameter.')
     print('                                 add_end_marker - add end marker to all log files specified in --logs parameter.')           # noqa: E501
+    print('                                 analyze_extracted - analyze already extracted log files specified in')
+    print('                                 --logs parameter with regular expressions from --regex_file and write')
+    print('                                 matching lines and summary into gzip-compressed JSON file in --out_dir.')
     print('--out_dir path                   Directory path where to place output files, ')
     print('                                 must be present when --action == analyze')
     print('--logs path{,path}               List of full paths to log files to be analyzed.')
@@ -607,11 +1008,19 @@ def usage():
     print('                                 All the strings from these files will be expected to present')
     print('                                 in one of specified log files during the analysis. Must be present')
     print('                                 when action == analyze.')
+    print('--regex_file path                JSON file with lists of "match", "ignore" and "expect" regexes,')
+    print('                                 must be present when action == analyze_extracted.')
+    print('--maximum_log_length length      Skip messages longer than length in files without start/end markers.')
+    print('--offset_file path               File where action init records offsets of the log files before placing')
+    print('                                 the start marker, for incremental log extraction by extract_log.')
+    print('--streaming                      Read log files backwards in blocks up to the start marker and skip lines')
+    print('                                 which can\'t match by a literal prefilter, instead of loading whole files.')
+    print('                                 Analysis statistics are written into the summary file.')
 
 # ---------------------------------------------------------------------
 
 
-def check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in):
+def check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in, regex_file=None):
     '''
     @summary: This function validates command line parameter 'action' and
         other related parameters.
@@ -632,6 +1041,15 @@ def check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in,
             print('ERROR: missing required match_files_in for analyze action')
             ret_code = False
 
+    elif action == 'analyze_extracted':
+        if out_dir is None or len(out_dir) == 0:
+            print('ERROR: missing required out_dir for analyze_extracted action')
+            ret_code = False
+
+        elif regex_file is None or len(regex_file) == 0:
+            print('ERROR: missing required regex_file for analyze_extracted action')
+            ret_code = False
+
     else:
         ret_code = False
         print(('ERROR: invalid action:%s specified' % action))
@@ -659,7 +1077,56 @@ def check_run_id(run_id):
 # ---------------------------------------------------------------------
 
 
-def write_result_file(run_id, out_dir, analysis_result_per_file, messages_regex_e, unused_regex_messages):
+def analyze_extracted_logs(analyzer, log_file_list, regex_file, out_dir, maximum_log_length=None):
+    '''
+    @summary: Analyze already extracted log files and write compressed result into out_dir.
+
+    Used to analyze logs on the DUT, so only the matching lines and summary are transferred
+    instead of the whole extracted logs.
+
+    @param analyzer: AnsibleLogAnalyzer instance.
+
+    @param log_file_list: List of paths to the extracted log files.
+
+    @param regex_file: JSON file with lists of "match", "ignore" and "expect" regular expressions.
+
+    @param out_dir: Output directory full path.
+
+    @param maximum_log_length: The long log message (length > maximum_log_length) will be skipped.
+
+    @return: Path to the gzip-compressed JSON result file.
+    '''
+    with open(regex_file, 'r') as fp:
+        regex_lists = json.load(fp)
+
+    match_set = get_regex_set(regex_lists.get('match', []))
+    ignore_set = get_regex_set(regex_lists.get('ignore', []))
+    expect_set = get_regex_set(regex_lists.get('expect', []))
+
+    prefilter = None
+    if analyzer.streaming:
+        prefilter = build_literal_prefilter(match_set.patterns + expect_set.patterns)
+
+    expect_hits = RegexHits(expect_set)
+    result = analyzer.analyze_file_list(log_file_list, match_set.regex, ignore_set.regex,
+                                        expect_set.regex, maximum_log_length=maximum_log_length,
+                                        prefilter=prefilter, expect_hits=expect_hits)
+
+    data = {
+        'files': dict((key, {'match': val[0], 'expect': val[1]}) for key, val in list(result.items())),
+        'unused_expected_regexp': expect_hits.unmatched(),
+        'stats': analyzer.analysis_stats,
+        'peak_memory_kb': get_peak_memory_kb(),
+    }
+
+    result_file = os.path.join(out_dir, extracted_result_file)
+    with gzip.open(result_file, 'wb') as out_file:
+        out_file.write(json.dumps(data).encode('utf-8'))
+    return result_file
+# ---------------------------------------------------------------------
+
+
+def write_result_file(run_id, out_dir, analysis_result_per_file, unused_regex_messages):
     '''
     @summary: Write results of analysis into a file.
 
@@ -669,12 +1136,13 @@ def write_result_file(run_id, out_dir, analysis_result_per_file, messages_regex_
 
     @param analysis_result_per_file: map file_name: [list of found matching strings]
 
+    @param unused_regex_messages: List of expected regular expressions not found in the files.
+
     @return: void
     '''
 
     match_cnt = 0
     expected_cnt = 0
-    expected_lines_total = []
 
     with open(out_dir + "/result.loganalysis." + run_id + ".log", 'w') as out_file:
         for key, val in list(analysis_result_per_file.items()):
@@ -692,7 +1160,6 @@ def write_result_file(run_id, out_dir, analysis_result_per_file, messages_regex_
 
             for i in expected_lines:
                 out_file.write(i)
-                expected_lines_total.append(i)
             out_file.write('\nExpected and found matches:%d\n' %
                            len(expected_lines))
             expected_cnt += len(expected_lines)
@@ -700,13 +1167,6 @@ def write_result_file(run_id, out_dir, analysis_result_per_file, messages_regex_
         out_file.write(
             "\n-------------------------------------------------\n\n")
         out_file.write('Total matches:%d\n' % match_cnt)
-        # Find unused regex matches
-        for regex in messages_regex_e:
-            for line in expected_lines_total:
-                if re.search(regex, line):
-                    break
-            else:
-                unused_regex_messages.append(regex)
 
         out_file.write('Total expected and found matches:%d\n' % expected_cnt)
         out_file.write('Total expected but not found matches: %d\n\n' %
@@ -720,7 +1180,7 @@ def write_result_file(run_id, out_dir, analysis_result_per_file, messages_regex_
 # ---------------------------------------------------------------------
 
 
-def write_summary_file(run_id, out_dir, analysis_result_per_file, unused_regex_messages):
+def write_summary_file(run_id, out_dir, analysis_result_per_file, unused_regex_messages, analysis_stats=None):
     '''
     @summary: This function writes results summary into a file
 
@@ -730,6 +1190,8 @@ def write_summary_file(run_id, out_dir, analysis_result_per_file, unused_regex_m
 
     @param analysis_result_per_file: map file_name:[list of matching strings]
 
+    @param analysis_stats: map file_name:{analysis statistics}, written into the summary when provided
+
     @return: void
     '''
 
@@ -756,6 +1218,13 @@ def write_summary_file(run_id, out_dir, analysis_result_per_file, unused_regex_m
     out_file.write("TOTAL EXPECTED MISSING MATCHES: %d\n" %
                    len(unused_regex_messages))
     out_file.write("-----------------------------------\n")
+    if analysis_stats:
+        for key, stats in list(analysis_stats.items()):
+            out_file.write("STATS:   %s    LINES %d    PREFILTERED %d    SECONDS %.3f    LINES/SEC %d\n" %
+                           (key, stats["lines_scanned"], stats["lines_filtered"], stats["elapsed"],
+                            stats["lines_per_sec"]))
+        out_file.write("PEAK MEMORY KB:                 %d\n" % get_peak_memory_kb())
+        out_file.write("-----------------------------------\n")
     out_file.flush()
     out_file.close()
 # ---------------------------------------------------------------------
@@ -772,12 +1241,17 @@ def main(argv):
     ignore_files_in = None
     expect_files_in = None
     verbose = False
+    streaming = False
+    offset_file = None
+    regex_file = None
+    maximum_log_length = None
 
     try:
         opts, args = getopt.getopt(argv, "a:r:s:l:o:m:i:e:vh",
                                    ["action=", "run_id=", "start_marker=", "logs=",
                                     "out_dir=", "match_files_in=", "ignore_files_in=",
-                                    "expect_files_in=", "verbose", "help"])
+                                    "expect_files_in=", "verbose", "help", "streaming", "offset_file=",
+                                    "regex_file=", "maximum_log_length="])
 
     except getopt.GetoptError:
         print("Invalid option specified")
@@ -816,17 +1290,32 @@ def main(argv):
         elif (opt in ("-v", "--verbose")):
             verbose = True
 
-    if not (check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in)
+        elif (opt == "--streaming"):
+            streaming = True
+
+        elif (opt == "--offset_file"):
+            offset_file = arg
+
+        elif (opt == "--regex_file"):
+            regex_file = arg
+
+        elif (opt == "--maximum_log_length"):
+            maximum_log_length = int(arg)
+
+    if not (check_action(action, log_files_in, out_dir, match_files_in, ignore_files_in, expect_files_in,
+                         regex_file)
             and check_run_id(run_id)):
         usage()
         sys.exit(err_invalid_input)
 
-    analyzer = AnsibleLogAnalyzer(run_id, verbose, start_marker)
+    analyzer = AnsibleLogAnalyzer(run_id, verbose, start_marker, streaming=streaming)
 
     log_file_list = list([_f for _f in log_files_in.split(tokenizer) if _f])
 
     result = {}
     if action == "init":
+        if offset_file:
+            analyzer.record_log_offsets(offset_file, log_file_list, analyzer.create_start_marker())
         analyzer.place_marker(log_file_list, analyzer.create_start_marker())
         return 0
     elif action == "analyze":
@@ -848,12 +1337,26 @@ def main(argv):
         if not log_file_list:
             log_file_list.append(system_log_file)
 
+        prefilter = None
+        if streaming:
+            prefilter = build_literal_prefilter((messages_regex_m or []) + (messages_regex_e or []))
+            analyzer.print_diagnostic_message('literal prefilter: %s' % (prefilter,))
+
+        expect_hits = RegexHits(get_regex_set(messages_regex_e))
         result = analyzer.analyze_file_list(log_file_list, match_messages_regex,
-                                            ignore_messages_regex, expect_messages_regex)
-        unused_regex_messages = []
-        write_result_file(run_id, out_dir, result,
-                          messages_regex_e, unused_regex_messages)
-        write_summary_file(run_id, out_dir, result, unused_regex_messages)
+                                            ignore_messages_regex, expect_messages_regex,
+                                            prefilter=prefilter, expect_hits=expect_hits)
+        unused_regex_messages = expect_hits.unmatched()
+        write_result_file(run_id, out_dir, result, unused_regex_messages)
+        write_summary_file(run_id, out_dir, result, unused_regex_messages, analyzer.analysis_stats)
+    elif action == "analyze_extracted":
+        if not log_file_list:
+            log_file_list.append(system_log_file)
+
+        result_file = analyze_extracted_logs(analyzer, log_file_list, regex_file, out_dir,
+                                             maximum_log_length=maximum_log_length)
+        analyzer.print_diagnostic_message('analysis result saved into %s' % result_file)
+        return 0
     elif action == "add_end_marker":
         analyzer.place_marker(
             log_file_list, analyzer.create_end_marker(), wait_for_marker=True)
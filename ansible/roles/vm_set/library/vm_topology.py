@@ -230,6 +230,18 @@ def adaptive_temporary_interface(vm_set_name, interface_name, reserved_space=0):
     return t_int_if
 
 
+def log_phase_time(func):
+    """A decorator to log the time spent in a phase of the topology operations, like bind_fp_ports."""
+    @functools.wraps(func)
+    def _wrapper(*args, **kwargs):
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            logging.info('=== Phase %s took %.2f seconds ===' % (func.__name__, time.time() - start))
+    return _wrapper
+
+
 class VMTopology(object):
 
     def __init__(self, vm_names, vm_properties, fp_mtu, max_fp_num, topo, worker,
@@ -469,11 +481,21 @@ class VMTopology(object):
         self.add_ip_to_netns_if(MGMT_PORT_NAME, mgmt_ip, ipv6_addr=mgmt_ipv6_addr,
                                 default_gw=mgmt_gw, default_gw_v6=mgmt_gw_v6)
 
+    @log_phase_time
     def create_bridges(self):
-        for vm in self.vm_names:
-            for fp_num in range(self.max_fp_num):
-                fp_br_name = adaptive_name(OVS_FP_BRIDGE_TEMPLATE, vm, fp_num)
-                self.create_ovs_bridge(fp_br_name, self.fp_mtu)
+        """Create the front panel bridges of all the VMs with one ovs-vsctl transaction and one ip batch."""
+        bridges = [adaptive_name(OVS_FP_BRIDGE_TEMPLATE, vm, fp_num)
+                   for vm in self.vm_names for fp_num in range(self.max_fp_num)]
+        if not bridges:
+            return
+        logging.info('=== Create bridges %s with mtu %d ===' % (bridges, self.fp_mtu))
+        VMTopology.ovs_vsctl_batch(['--may-exist add-br %s' % bridge for bridge in bridges])
+
+        ip_cmds = []
+        if self.fp_mtu != DEFAULT_MTU:
+            ip_cmds.extend('link set dev %s mtu %d' % (bridge, self.fp_mtu) for bridge in bridges)
+        ip_cmds.extend('link set dev %s up' % bridge for bridge in bridges)
+        VMTopology.ip_batch(ip_cmds)
 
     def create_ovs_bridge(self, bridge_name, mtu):
         logging.info('=== Create bridge %s with mtu %d ===' %
@@ -485,16 +507,21 @@ class VMTopology(object):
 
         VMTopology.cmd('ifconfig %s up' % bridge_name)
 
+    @log_phase_time
     def destroy_bridges(self):
-        for vm in self.vm_names:
-            for fp_num in range(self.max_fp_num):
-                fp_br_name = adaptive_name(OVS_FP_BRIDGE_TEMPLATE, vm, fp_num)
-                self.destroy_ovs_bridge(fp_br_name)
+        """Destroy the front panel bridges of all the VMs with one ovs-vsctl transaction."""
+        bridges = [adaptive_name(OVS_FP_BRIDGE_TEMPLATE, vm, fp_num)
+                   for vm in self.vm_names for fp_num in range(self.max_fp_num)]
+        if not bridges:
+            return
+        logging.info('=== Destroy bridges %s ===' % bridges)
+        VMTopology.ovs_vsctl_batch(['--if-exists del-br %s' % bridge for bridge in bridges])
 
     def destroy_ovs_bridge(self, bridge_name):
         logging.info('=== Destroy bridge %s ===' % bridge_name)
         VMTopology.cmd('ovs-vsctl --if-exists del-br %s' % bridge_name)
 
+    @log_phase_time
     def add_injected_fp_ports_to_docker(self):
         """
         add injected front panel ports to docker
@@ -502,7 +529,9 @@ class VMTopology(object):
 
             PTF (int_if) ----------- injected port (ext_if)
 
+        The veth pairs of different ports are independent, they are created by the worker in parallel.
         """
+        add_veth_if_args = []
         for vm, vlans in self.injected_fp_ports.items():
             for vlan in vlans:
                 (_, _, ptf_index) = VMTopology.parse_vm_vlan_port(vlan)
@@ -517,15 +546,17 @@ class VMTopology(object):
                         'sub_interface_separator', SUB_INTERFACE_SEPARATOR)
                     vlan_subintf_vlan_id = properties.get(
                         'sub_interface_vlan_id', SUB_INTERFACE_VLAN_ID)
-                    self.add_veth_if_to_docker(
-                        ext_if, int_if,
+                    add_veth_if_args.append((ext_if, int_if, dict(
                         create_vlan_subintf=create_vlan_subintf,
                         sub_interface_separator=vlan_subintf_sep,
                         sub_interface_vlan_id=vlan_subintf_vlan_id
-                    )
+                    )))
                 else:
-                    self.add_veth_if_to_docker(ext_if, int_if)
+                    add_veth_if_args.append((ext_if, int_if, {}))
+
+        self.worker.map(lambda args: self.add_veth_if_to_docker(args[0], args[1], **args[2]), add_veth_if_args)
 
+    @log_phase_time
     def add_injected_VM_ports_to_docker(self):
         for k, attr in self.OVS_LINKs.items():
             vlans = attr['vlans'][:]
@@ -840,6 +871,7 @@ class VMTopology(object):
             VMTopology.cmd("brctl delif %s %s" %
                            (if_to_br[mgmt_port], mgmt_port))
 
+    @log_phase_time
     def bind_devices_interconnect(self):
         for link_index, vlans in self.devices_interconnect_interfaces.items():
             interconnection_bridge = OVS_INTERCONNECTION_BRIDGE_TEMPLATE % (
@@ -856,6 +888,7 @@ class VMTopology(object):
             self.bind_devices_interconnect_ports(
                 interconnection_bridge, vlan1_iface, vlan2_iface)
 
+    @log_phase_time
     def unbind_devices_interconnect(self):
         for link_index, vlans in self.devices_interconnect_interfaces.items():
             interconnection_bridge = OVS_INTERCONNECTION_BRIDGE_TEMPLATE % (
@@ -888,6 +921,7 @@ class VMTopology(object):
         VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
                        (br_name, vlan2_iface_id, vlan1_iface_id))
 
+    @log_phase_time
     def bind_fp_ports(self, disconnect_vm=False):
         """
         bind dut front panel ports to VMs
@@ -903,6 +937,7 @@ class VMTopology(object):
                  +-----+    |                      |
                             +----------------------+
 
+        The bridges of all the OVS ports are read once, instead of querying them port by port.
         """
         bind_ovs_ports_args = []
         for attr in self.VMs.values():
@@ -920,9 +955,10 @@ class VMTopology(object):
                     (br_name, self.duts_fp_ports[self.duts_name[dut_index]][str(vlan_index)],
                      injected_iface, vm_iface, disconnect_vm)
                 )
+        port_bridges = VMTopology.get_ovs_port_bridges()
         with VMTopologyWorker.safe_subprocess_manager() as [processes, tmpdir]:
-            self.worker.map(lambda args: self.bind_ovs_ports(*args, processes=processes,
-                                                             tmpdir=tmpdir), bind_ovs_ports_args)
+            self.worker.map(lambda args: self.bind_ovs_ports(*args, processes=processes, tmpdir=tmpdir,
+                                                             port_bridges=port_bridges), bind_ovs_ports_args)
 
         for k, attr in self.VM_LINKs.items():
             logging.info("Create VM links for {} : {}".format(k, attr))
@@ -956,6 +992,7 @@ class VMTopology(object):
                 injected_iface = adaptive_name(INJECTED_INTERFACES_TEMPLATE, self.vm_set_name, ptf_index)
                 self.bind_ovs_ports(br_name, port1, injected_iface, port2, disconnect_vm)
 
+    @log_phase_time
     def unbind_fp_ports(self):
         logging.info("=== unbind front panel ports ===")
         unbind_ovs_ports_args = []
@@ -1038,6 +1075,7 @@ class VMTopology(object):
         VMTopology.iface_up(port1)
         VMTopology.iface_up(port2)
 
+    @log_phase_time
     def bind_vm_backplane(self):
 
         if VMTopology.intf_not_exists(self.bp_bridge):
@@ -1056,6 +1094,7 @@ class VMTopology(object):
 
             VMTopology.iface_up(bp_port_name)
 
+    @log_phase_time
     def unbind_vm_backplane(self):
 
         if VMTopology.intf_exists(self.bp_bridge):
@@ -1116,54 +1155,52 @@ class VMTopology(object):
                                    |                      +---- vm_iface
                                    +----------------------+
         """
-        br = VMTopology.get_ovs_bridge_by_port(injected_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, injected_iface))
-
-        br = VMTopology.get_ovs_bridge_by_port(dut_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, dut_iface))
-
-        br = VMTopology.get_ovs_bridge_by_port(vm_iface)
-        if br is not None and br != br_name:
-            VMTopology.cmd('ovs-vsctl --if-exists del-port %s %s' % (br, vm_iface))
+        # Bridges of the ports, from the snapshot of all the OVS ports if it is given
+        port_bridges = kwargs.get("port_bridges")
+        if port_bridges is not None:
+            ports = set(port for port, br in port_bridges.items() if br == br_name)
+        else:
+            ports = VMTopology.get_ovs_br_ports(br_name)
 
-        ports = VMTopology.get_ovs_br_ports(br_name)
-        if injected_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' %
-                           (br_name, injected_iface))
+        # Move the ports to the bridge in one ovs-vsctl transaction
+        ovs_cmds = []
+        for iface in (injected_iface, dut_iface, vm_iface):
+            if port_bridges is not None:
+                br = port_bridges.get(iface)
+            else:
+                br = VMTopology.get_ovs_bridge_by_port(iface)
+            if br is not None and br != br_name:
+                ovs_cmds.append('--if-exists del-port %s %s' % (br, iface))
 
-        if dut_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, dut_iface))
+        for iface in (injected_iface, dut_iface, vm_iface):
+            if iface not in ports:
+                ovs_cmds.append('--may-exist add-port %s %s' % (br_name, iface))
 
-        if vm_iface not in ports:
-            VMTopology.cmd('ovs-vsctl --may-exist add-port %s %s' % (br_name, vm_iface))
+        if ovs_cmds:
+            VMTopology.ovs_vsctl_batch(ovs_cmds)
 
         bindings = VMTopology.get_ovs_port_bindings(br_name, [dut_iface])
         dut_iface_id = bindings[dut_iface]
         injected_iface_id = bindings[injected_iface]
         vm_iface_id = bindings[vm_iface]
 
-        # clear old bindings
-        VMTopology.cmd('ovs-ofctl del-flows %s' % br_name)
+        all_cmds = []
+        bind_helper = lambda cmd: \
+            all_cmds.append(cmd.split()[-1])  # noqa: E731
 
         if disconnect_vm:
             # Drop packets from VM
-            VMTopology.cmd(
-                "ovs-ofctl add-flow %s table=0,in_port=%s,action=drop" % (br_name, vm_iface_id))
+            bind_helper("ovs-ofctl add-flow %s table=0,in_port=%s,action=drop" % (br_name, vm_iface_id))
         else:
             # Add flow from a VM to an external iface
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                           (br_name, vm_iface_id, dut_iface_id))
+            bind_helper("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
+                        (br_name, vm_iface_id, dut_iface_id))
 
         if disconnect_vm:
             # Add flow from external iface to ptf container
-            VMTopology.cmd("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
-                           (br_name, dut_iface_id, injected_iface_id))
+            bind_helper("ovs-ofctl add-flow %s table=0,in_port=%s,action=output:%s" %
+                        (br_name, dut_iface_id, injected_iface_id))
         else:
-            all_cmds = []
-            bind_helper = lambda cmd: \
-                all_cmds.append(cmd.split()[-1])  # noqa: E731
 
             # Add flow from external iface to a VM and a ptf container
             # Allow BGP, IPinIP, fragmented packets, ICMP, SNMP packets and layer2 packets from DUT to neighbors
@@ -1242,14 +1279,21 @@ class VMTopology(object):
             bind_helper("ovs-ofctl add-flow %s 'table=0,in_port=%s,action=output:%s'" %
                         (br_name, injected_iface_id, dut_iface_id))
 
-            if all_cmds:
-                processes = kwargs.get("processes")
-                tmpdir = kwargs.get("tmpdir")
-                with tempfile.NamedTemporaryFile("w", dir=tmpdir, delete=False) as f:
-                    for rule in all_cmds:
-                        f.write(rule.strip("'") + "\n")
+        # Replace the old bindings with the flows in one ovs-ofctl command
+        processes = kwargs.get("processes")
+        tmpdir = kwargs.get("tmpdir")
+        with tempfile.NamedTemporaryFile("w", dir=tmpdir, delete=False) as f:
+            for rule in all_cmds:
+                f.write(rule.strip("'") + "\n")
 
-                processes.append(VMTopology.fire_and_forget("ovs-ofctl add-flows {} {}".format(br_name, f.name)))
+        replace_flows_cmd = "ovs-ofctl replace-flows {} {}".format(br_name, f.name)
+        if processes is not None:
+            processes.append(VMTopology.fire_and_forget(replace_flows_cmd))
+        else:
+            try:
+                VMTopology.cmd(replace_flows_cmd)
+            finally:
+                os.remove(f.name)
 
     def unbind_ovs_ports(self, br_name, vm_port, **kwargs):
         """unbind all ports except the vm port from an ovs bridge"""
@@ -1264,9 +1308,7 @@ class VMTopology(object):
                     bind_helper('ovs-vsctl --if-exists del-port %s %s' % (br_name, port))
 
             if all_cmds:
-                processes = kwargs.get("processes")
-                batch_cmd = 'ovs-vsctl -- %s' % (' -- '.join(all_cmds))
-                processes.append(VMTopology.fire_and_forget(batch_cmd))
+                VMTopology.ovs_vsctl_batch(all_cmds, processes=kwargs.get("processes"))
 
     def unbind_ovs_port(self, br_name, port):
         """unbind a port from an ovs bridge"""
@@ -1348,6 +1390,7 @@ class VMTopology(object):
 
         self.destroy_ovs_bridge(br_name)
 
+    @log_phase_time
     def add_host_ports(self):
         """
         add dut port in the ptf docker
@@ -1436,6 +1479,7 @@ class VMTopology(object):
         """Enable loopback device in the netns."""
         VMTopology.cmd("ip netns exec %s ifconfig lo up" % self.netns)
 
+    @log_phase_time
     def setup_netns_source_routing(self):
         """Setup policy-based routing to forward packet to its igress ports."""
 
@@ -1494,6 +1538,7 @@ class VMTopology(object):
                 VMTopology.cmd("ip netns exec %s ip route add default via %s dev %s table %s" % (
                     self.netns, gateway_addr, ns_if, rt_name))
 
+    @log_phase_time
     def remove_host_ports(self):
         """
         remove dut port from the ptf docker
@@ -1552,7 +1597,15 @@ class VMTopology(object):
         tmp_name = BP_PORT_NAME + VMTopology._generate_fingerprint(ext_if, MAX_INTF_LEN - len(BP_PORT_NAME))
         self.remove_veth_if_from_docker(ext_if, BP_PORT_NAME, tmp_name)
 
+    @log_phase_time
     def remove_injected_fp_ports_from_docker(self):
+        """
+        Remove injected front panel ports from docker
+
+        Same as remove_veth_if_from_docker for every port, but the interfaces are listed once in the PTF docker and
+        on host, and the ip commands of all the ports are run with one 'ip -batch' in the PTF docker and one on host.
+        """
+        veth_ifs = []
         for vm, vlans in self.injected_fp_ports.items():
             for vlan in vlans:
                 (_, _, ptf_index) = VMTopology.parse_vm_vlan_port(vlan)
@@ -1563,7 +1616,31 @@ class VMTopology(object):
                     BACKEND_TOR_TYPE, BACKEND_LEAF_TYPE)
                 if not create_vlan_subintf:
                     tmp_name = int_if + VMTopology._generate_fingerprint(ext_if, MAX_INTF_LEN - len(int_if))
-                    self.remove_veth_if_from_docker(ext_if, int_if, tmp_name)
+                    veth_ifs.append((ext_if, int_if, tmp_name))
+
+        if not self.pid:
+            for ext_if, int_if, tmp_name in veth_ifs:
+                self.remove_veth_if_from_docker(ext_if, int_if, tmp_name)
+            return
+
+        ptf_intfs = VMTopology.get_intfs(pid=self.pid)
+        host_intfs = VMTopology.get_intfs()
+        ptf_cmds = []
+        host_cmds = []
+        for ext_if, int_if, tmp_name in veth_ifs:
+            logging.info("=== Cleanup port, int_if: %s, ext_if: %s, tmp_name: %s ===" % (ext_if, int_if, tmp_name))
+            if int_if in ptf_intfs:
+                # Name it back to temp name in PTF container to avoid potential conflicts,
+                # then set it to default namespace
+                ptf_cmds.append("link set dev %s down" % int_if)
+                ptf_cmds.append("link set dev %s name %s" % (int_if, tmp_name))
+                ptf_cmds.append("link set dev %s netns 1" % tmp_name)
+            # Delete its peer in default namespace
+            if ext_if in host_intfs:
+                host_cmds.append("link delete dev %s" % ext_if)
+
+        VMTopology.ip_batch(ptf_cmds, pid=self.pid)
+        VMTopology.ip_batch(host_cmds)
 
     @staticmethod
     def _generate_fingerprint(name, digit=6):
@@ -1679,7 +1756,8 @@ class VMTopology(object):
                 shell=False)
 
     @staticmethod
-    def cmd(cmdline, grep_cmd=None, retry=1, negative=False, shell=False, split_cmd=True, ignore_errors=False):
+    def cmd(cmdline, grep_cmd=None, retry=1, negative=False, shell=False, split_cmd=True, ignore_errors=False,
+            input_data=None):
         """Execute a command and return the output
 
         Args:
@@ -1688,6 +1766,8 @@ class VMTopology(object):
             retry (int, optional): Max number of retry if command result is unexpected. Defaults to 1.
             negative (bool, optional): If negative is True, expect the command to fail. Defaults to False.
             ignore_errors (bool, optional): If ignore_errors is True, return the output even if the command fails.
+            input_data (str, optional): Data sent to stdin of the command, like commands of 'ip -batch -'.
+                Defaults to None.
 
         Raises:
             Exception: If command result is unexpected after max number of retries, raise an exception.
@@ -1701,6 +1781,8 @@ class VMTopology(object):
         for attempt in range(retry):
             logging.debug('*** CMD: %s, grep: %s, attempt: %d' %
                           (cmdline, grep_cmd, attempt + 1))
+            if input_data is not None:
+                logging.debug('*** INPUT: \n%s' % input_data)
             if split_cmd:
                 cmdline = shlex.split(cmdline_ori)
             process = subprocess.Popen(
@@ -1721,7 +1803,7 @@ class VMTopology(object):
                 out, err = process_grep.communicate()
                 ret_code = process_grep.returncode
             else:
-                out, err = process.communicate()
+                out, err = process.communicate(input_data.encode('utf-8') if input_data is not None else None)
                 ret_code = process.returncode
             out, err = out.decode('utf-8'), err.decode('utf-8')
 
@@ -1757,6 +1839,86 @@ class VMTopology(object):
                 % (ret_code, err, cmdline_ori, ' | ' + grep_cmd_ori if grep_cmd_ori else '')
             raise Exception(err_msg)
 
+    @staticmethod
+    def ip_batch(cmds, pid=None, netns=None):
+        """Run ip commands with one 'ip -batch' process.
+
+        By default the commands are run on host. If a pid is specified, they are run in the network namespace of the
+        pid. If a netns is specified, they are run in the netns. The pid argument takes precedence.
+        The batch stops at the first failed command, and an exception is raised like VMTopology.cmd.
+
+        Args:
+            cmds (list): ip commands without the leading 'ip', like 'link set dev eth0 up'.
+            pid (str, optional): Pid of docker. Defaults to None.
+            netns (str, optional): netns name. Defaults to None.
+        """
+        if not cmds:
+            return
+        if pid:
+            cmdline = 'nsenter -t %s -n ip -batch -' % pid
+        elif netns:
+            cmdline = 'ip netns exec %s ip -batch -' % netns
+        else:
+            cmdline = 'ip -batch -'
+        VMTopology.cmd(cmdline, input_data='\n'.join(cmds) + '\n')
+
+    @staticmethod
+    def get_intfs(pid=None, netns=None):
+        """Get names of all the interfaces with one 'ip -o link show'.
+
+        The pid and netns arguments are the same as VMTopology.intf_exists.
+
+        Returns:
+            set: Names of the interfaces, without the '@<peer>' suffix.
+        """
+        if pid:
+            cmdline = 'nsenter -t %s -n ip -o link show' % pid
+        elif netns:
+            cmdline = 'ip netns exec %s ip -o link show' % netns
+        else:
+            cmdline = 'ip -o link show'
+        intfs = set()
+        for line in VMTopology.cmd(cmdline).splitlines():
+            fields = line.split(': ', 2)
+            if len(fields) > 1:
+                intfs.add(fields[1].split('@')[0])
+        return intfs
+
+    @staticmethod
+    def ovs_vsctl_batch(cmds, processes=None):
+        """Run ovs-vsctl commands in one transaction, like 'ovs-vsctl -- add-port br0 p1 -- add-port br0 p2'.
+
+        Args:
+            cmds (list): ovs-vsctl commands without the leading 'ovs-vsctl'.
+            processes (list, optional): If it is given, the transaction is fired and forgot, and its process is
+                appended to the list. Defaults to None.
+        """
+        batch_cmd = 'ovs-vsctl -- %s' % (' -- '.join(cmds))
+        if processes is not None:
+            processes.append(VMTopology.fire_and_forget(batch_cmd))
+        else:
+            VMTopology.cmd(batch_cmd)
+
+    @staticmethod
+    def get_ovs_port_bridges():
+        """Get bridges of all the OVS ports with one 'ovs-vsctl show'.
+
+        Returns:
+            dict: Port name to bridge name.
+        """
+        out = VMTopology.cmd('ovs-vsctl show')
+        port_bridges = {}
+        bridge = None
+        for line in out.splitlines():
+            matched = re.match(r'^\s+(Bridge|Port)\s+"?([^"\s]+)"?\s*$', line)
+            if not matched:
+                continue
+            if matched.group(1) == 'Bridge':
+                bridge = matched.group(2)
+            elif bridge is not None:
+                port_bridges[matched.group(2)] = bridge
+        return port_bridges
+
     @staticmethod
     def get_ovs_br_ports(bridge):
         out = VMTopology.cmd('ovs-vsctl list-ports %s' % bridge)
@@ -5,6 +5,7 @@ import shutil
 import psutil
 import socket
 import signal
+import heapq
 import logging
 from random import randint
 from random import Random
@@ -116,6 +117,95 @@ def load_coverage_history():
         tcmap.read_coverage_history(csv_file)
 
 
+def read_module_durations(filepaths):
+    # execution time of the module in a run is the sum of TimeTaken of its rows
+    # in the functions CSV, which include the prolog and epilog rows
+    runs = []
+    for filepath in filepaths:
+        if os.path.isdir(filepath):
+            csv_file = paths.get_functions_csv(filepath, True)
+            if not os.path.exists(csv_file):
+                csv_file = paths.get_functions_csv(filepath)
+            filepath = csv_file
+        rows = utils.read_csv(filepath)
+        if not rows or "Module" not in rows[0] or "TimeTaken" not in rows[0]:
+            warn("Module execution times are not found in {}".format(filepath))
+            continue
+        mcol, tcol = rows[0].index("Module"), rows[0].index("TimeTaken")
+        durations = {}
+        for row in rows[1:]:
+            if len(row) <= max(mcol, tcol) or not row[mcol]:
+                continue
+            durations[row[mcol]] = durations.get(row[mcol], 0) + utils.time_parse(row[tcol])
+        runs.append(durations)
+
+    # average over the runs
+    retval = {}
+    for durations in runs:
+        for mname, secs in durations.items():
+            retval.setdefault(mname, []).append(secs)
+    for mname, values in retval.items():
+        retval[mname] = sum(values) // len(values)
+    return retval
+
+
+def get_module_duration(durations, mname, default=0):
+    # module names in the CSV are base names unless SPYTEST_REPEAT_MODULE_SUPPORT is used
+    if mname in durations:
+        return durations[mname]
+    return durations.get(os.path.basename(mname), default)
+
+
+def get_default_duration(durations):
+    # modules without history are taken as median modules
+    values = sorted(durations.values())
+    return values[len(values) // 2] if values else 0
+
+
+def simulate_schedule(modules, durations, testbeds, nodes=None, orders=None, model="lpt"):
+    """
+    Predict the execution of the modules on the testbeds without running them.
+    Every free testbed takes the first pending module it can execute, in the given
+    order of the modules or longest first with the "lpt" model.
+    :param modules: list of module names
+    :param durations: dict of module name to execution time in seconds
+    :param testbeds: number of testbeds or list of testbed names
+    :param nodes: dict of module name to list of testbeds which can execute it, default all
+    :param orders: dict of module name to order, higher orders are executed first
+    :return: SpyTestDict of makespan, loads and modules per testbed and unassigned modules
+    """
+    if isinstance(testbeds, int):
+        testbeds = list(range(testbeds))
+    nodes, orders = nodes or {}, orders or {}
+    default = get_default_duration(durations)
+    times = {mname: get_module_duration(durations, mname, default) for mname in modules}
+    if model == "lpt":
+        pending = sorted(modules, key=lambda m: (-orders.get(m, 0), -times[m]))
+    else:
+        pending = sorted(modules, key=lambda m: -orders.get(m, 0))
+
+    retval = SpyTestDict()
+    retval.loads = {testbed: 0 for testbed in testbeds}
+    retval.modules = {testbed: [] for testbed in testbeds}
+    free = [(0, index) for index in range(len(testbeds))]
+    while free and pending:
+        load, index = heapq.heappop(free)
+        testbed = testbeds[index]
+        for mname in pending:
+            if mname not in nodes or testbed in nodes[mname]:
+                break
+        else:
+            # nothing left for this testbed
+            continue
+        pending.remove(mname)
+        retval.modules[testbed].append(mname)
+        retval.loads[testbed] = load + times[mname]
+        heapq.heappush(free, (retval.loads[testbed], index))
+    retval.unassigned = pending
+    retval.makespan = max(retval.loads.values()) if testbeds else 0
+    return retval
+
+
 def init_type_nodes():
     node_types = ["one", "two", "three", "four"]
     backup_nodes = env.get("SPYTEST_BATCH_BACKUP_NODES")
@@ -552,6 +642,7 @@ class SpyTestScheduling(object):
         self.default_topo = ""
         self.max_order = self.default_order
         self._load_buckets()
+        self._load_durations()
 
         self.test_spytest_infra_first = None
         self.test_spytest_infra_second = None
@@ -600,6 +691,37 @@ class SpyTestScheduling(object):
                 else:
                     self.base_names[basename] = name
 
+    def _load_durations(self):
+        self.durations = {}
+        self.default_duration = 0
+        model = env.get("SPYTEST_BATCH_SCHEDULING_MODEL", "default")
+        if model != "lpt":
+            return
+        history = env.get("SPYTEST_BATCH_MODULE_HISTORY", "")
+        filepaths = [filepath for filepath in history.split(",") if filepath]
+        self.durations = read_module_durations(filepaths)
+        if not self.durations:
+            warn("Module execution times are not loaded from '{}', using default scheduling".format(history))
+            return
+        self.default_duration = get_default_duration(self.durations)
+        trace("Loaded execution times of {} modules, default {}".format(
+            len(self.durations), utils.time_format(self.default_duration)))
+
+    def get_duration(self, mname):
+        return get_module_duration(self.durations, mname, self.default_duration)
+
+    def _show_predicted_makespan(self, modules):
+        testbeds = [worker.name for worker in self.wa.workers.values() if worker.node_type == "Main"]
+        nodes = {mname: minfo.nodes for mname, minfo in modules.items()}
+        orders = {}
+        for mname, minfo in modules.items():
+            order = self.get_module_data(mname, minfo.used_tpref).order if self.order_support else 0
+            orders[mname] = order if env.match("SPYTEST_BATCH_ORDER_HIGH2LOW", "1", "1") else -order
+        for model in ["default", "lpt"]:
+            res = simulate_schedule(list(modules.keys()), self.durations, testbeds, nodes, orders, model)
+            msg = "Predicted {} scheduling makespan {} on {} testbeds"
+            trace(msg.format(model, utils.time_format(res.makespan), len(testbeds)))
+
     def set_worker_node_locked(self, node, value):
         gid = get_gw_name(node.gateway)
         worker = self.wa.workers[gid]
@@ -953,6 +1075,8 @@ class SpyTestScheduling(object):
                     md = self.get_module_data(mname, minfo.used_tpref)
                     trace(msg.format(md.bucket, mname))
             self._show_module_info()
+            if self.durations:
+                self._show_predicted_makespan(modules)
 
         _show_testbed_info()
 
@@ -1021,8 +1145,12 @@ class SpyTestScheduling(object):
         orders = list(range(0, self.max_order + 1))
         if env.match("SPYTEST_BATCH_ORDER_HIGH2LOW", "1", "1"):
             orders = reversed(orders)
+        items = modules.items()
+        if self.durations:
+            # longest processing time first
+            items = sorted(items, key=lambda item: self.get_duration(item[0]), reverse=True)
         for order in orders:
-            for mname, minfo in modules.items():
+            for mname, minfo in items:
                 if name not in minfo.nodes:
                     continue
                 md = self.get_module_data(mname, minfo.used_tpref)
@@ -2524,3 +2652,41 @@ def simulate_deadnode(*args, **kwargs):
 
 
 wa = batch_init()
+
+
+def simulate_main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Predict the makespan of SPyTest batch runs.')
+    parser.add_argument("--history", action="append", required=True,
+                        help="functions CSV or logs path of an earlier run, can be repeated")
+    parser.add_argument("--testbeds", action="store", type=int, nargs="+", default=[1],
+                        help="testbed counts to simulate")
+    parser.add_argument("--modules", action="store", default=None,
+                        help="file with the list of modules, default all modules in history")
+    args = parser.parse_args()
+
+    durations = read_module_durations(args.history)
+    if args.modules:
+        modules = [line for line in utils.read_lines(args.modules) if line]
+    else:
+        modules = sorted(durations.keys())
+    default = get_default_duration(durations)
+    times = [get_module_duration(durations, mname, default) for mname in modules]
+    total = sum(times)
+    print("Modules: {} History: {} Total Time: {}".format(len(modules), len(durations), utils.time_format(total)))
+
+    header = ["Testbeds", "Default Makespan", "LPT Makespan", "Lower Bound"]
+    rows = []
+    for count in args.testbeds:
+        row = [count]
+        for model in ["default", "lpt"]:
+            res = simulate_schedule(modules, durations, count, model=model)
+            row.append(utils.time_format(res.makespan))
+        row.append(utils.time_format(max(times + [total // max(count, 1)])))
+        rows.append(row)
+    print(utils.sprint_vtable(header, rows))
+
+
+if __name__ == "__main__":
+    simulate_main()
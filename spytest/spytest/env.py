@@ -8,6 +8,7 @@ defaults = {
     "SPYTEST_NO_CONSOLE_LOG": "0",
     "SPYTEST_PROMPTS_FILENAME": None,
     "SPYTEST_TEXTFSM_INDEX_FILENAME": None,
+    "SPYTEST_TEXTFSM_CACHE_SIZE": "256",
     "SPYTEST_UI_POSITIVE_CASES_ONLY": "0",
     "SPYTEST_REPEAT_MODULE_SUPPORT": "0",
     "SPYTEST_FILE_PREFIX": "results",
@@ -107,6 +108,8 @@ dev_defaults = {
     "SPYTEST_BATCH_MODULE_TOPO_PREF": None,
     "SPYTEST_BATCH_MATCHING_BUCKET_ORDER": "larger,largest",
     "SPYTEST_BATCH_RERUN": None,
+    "SPYTEST_BATCH_SCHEDULING_MODEL": "default",
+    "SPYTEST_BATCH_MODULE_HISTORY": None,
     "SPYTEST_TESTBED_FILE": "testbed.yaml",
     "SPYTEST_FILE_MODE": "0",
     "SPYTEST_SCHEDULING": None,
@@ -3219,6 +3219,8 @@ class WorkArea(object):
             ofh.write("\nTOTAL TG Time = {}".format(stats.tg_cmd_time))
             ofh.write("\nTOTAL PROMPT NFOUND = {}".format(stats.pnfound))
             ofh.write("\nTOTAL TECH SUPPORT = {}".format(stats.ts_files))
+            tmpl_time = sum([ptime for _, _, ptime in stats.tmpl_stats.values()])
+            ofh.write("\nTOTAL TEMPLATE Parse Time = {:.1f} ms".format(tmpl_time))
             for [start_time, thid, ctype, dut, cmd, ctime] in stats.cmds:
                 start_msg = "\n{} {}".format(get_timestamp(this=start_time), thid)
                 if ctype == "CMD":
@@ -3235,6 +3237,9 @@ class WorkArea(object):
                     ofh.write("{}PROMPT NFOUND: {}".format(start_msg, cmd))
                 elif ctype == "TECH_SUPPORT":
                     ofh.write("{}TECH SUPPORT: {}".format(start_msg, cmd))
+            for tmpl, [count, hits, ptime] in sorted(stats.tmpl_stats.items()):
+                msg = "\nTEMPLATE PARSE: {} count = {} cache hits = {} ({}%) time = {:.1f} ms"
+                ofh.write(msg.format(tmpl, count, hits, int(hits * 100 / count), ptime))
             ofh.write("\n=========================================================\n")
         try:
             self.stats_count = self.stats_count + 1
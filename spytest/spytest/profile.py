@@ -22,6 +22,7 @@ class Profile(object):
         self.cmds = []
         self.profile_ids = dict()
         self.canbe_parallel = []
+        self.tmpl_stats = dict()
 
     def __init__(self):
         self.init()
@@ -79,6 +80,10 @@ class Profile(object):
         self.ts_files = self.ts_files + 1
         self.cmds.append([start_time, thid, "TECH_SUPPORT", None, cmd, ""])
 
+    def template(self, tmpl, parse_time, hit):
+        [count, hits, total_time] = self.tmpl_stats.get(tmpl, [0, 0, 0])
+        self.tmpl_stats[tmpl] = [count + 1, hits + int(hit), total_time + parse_time]
+
     def get_stats(self):
         stats = SpyTestDict()
         stats.tg_total_wait = self.tg_total_wait
@@ -93,6 +98,7 @@ class Profile(object):
         stats.canbe_parallel = self.canbe_parallel
         stats.pnfound = self.pnfound
         stats.ts_files = self.ts_files
+        stats.tmpl_stats = self.tmpl_stats
         return stats
 
 
@@ -125,3 +131,7 @@ def prompt_nfound(cmd):
 
 def tech_support(cmd):
     return obj.tech_support(cmd)
+
+
+def template(tmpl, parse_time, hit):
+    return obj.template(tmpl, parse_time, hit)
@@ -2,6 +2,8 @@ import sys
 import os
 import re
 import json
+import time
+import threading
 from collections import OrderedDict
 
 bundled_parser = os.getenv("SPYTEST_TEXTFSM_USE_BUNDLED_PARSER")
@@ -14,11 +16,63 @@ try:
     import clitable
 except Exception:
     from textfsm import clitable
+try:
+    import texttable
+except Exception:
+    from textfsm import texttable
 
 from spytest import env  # noqa: E402
+from spytest import profile  # noqa: E402
 import utilities.common as utils  # noqa: E402
 
 
+class TemplateCache(object):
+    """
+    LRU cache of the compiled TextFSM state machines of the templates in a directory.
+    The state machines are reset and reused to parse instead of reading the template files again.
+    """
+
+    def __init__(self, root, size):
+        self.root = root
+        self.size = size
+        self.fsms = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, tmpl_file):
+        with self.lock:
+            entry = self.fsms.pop(tmpl_file, None)
+            hit = bool(entry)
+            if not entry:
+                with open(os.path.join(self.root, tmpl_file), "r") as tmpl_fp:
+                    entry = [textfsm.TextFSM(tmpl_fp), threading.Lock()]
+            self.fsms[tmpl_file] = entry
+            while len(self.fsms) > self.size:
+                self.fsms.popitem(last=False)
+        return entry, hit
+
+    def parse(self, tmpl_file, data):
+        start = time.time()
+        [fsm, lock], hit = self.get(tmpl_file)
+        with lock:
+            fsm.Reset()
+            rows = fsm.ParseText(data)
+        profile.template(tmpl_file, (time.time() - start) * 1000, hit)
+        return fsm, rows
+
+
+template_caches = dict()
+template_caches_lock = threading.Lock()
+
+
+# template cache shared by the Template objects of the platform
+def get_template_cache(root):
+    with template_caches_lock:
+        if root not in template_caches:
+            size = env.getint("SPYTEST_TEXTFSM_CACHE_SIZE", 256)
+            template_caches[root] = TemplateCache(root, size)
+        return template_caches[root]
+
+
 class Template(object):
 
     def __init__(self, platform=None, cli=None, root=None):
@@ -41,6 +95,29 @@ class Template(object):
             self.cli_tables[index] = clitable.CliTable(index, self.root)
         self.platform = platform
         self.cli = cli
+        self.cache = get_template_cache(self.root)
+        self.cmd_tmpls = dict()
+
+    # find the templates to parse the output of given command
+    def resolve(self, cmd):
+        if cmd in self.cmd_tmpls:
+            return self.cmd_tmpls[cmd]
+        attrs = dict(Command=cmd)
+        tmpl_file, templates = None, None
+        for cli_table in self.cli_tables.values():
+            row_idx = cli_table.index.GetRowMatch(attrs)
+            if row_idx != 0:
+                tmpl_file = cli_table.index.index[row_idx]['Template']
+                if self.platform:
+                    attrs["Platform"] = self.platform
+                if self.cli:
+                    attrs["cli"] = self.cli
+                row_idx = cli_table.index.GetRowMatch(attrs)
+                if row_idx != 0:
+                    templates = cli_table.index.index[row_idx]['Template'].split(":")
+                break
+        self.cmd_tmpls[cmd] = [tmpl_file, templates]
+        return self.cmd_tmpls[cmd]
 
     # find the template given command
     def get_tmpl(self, cmd):
@@ -84,24 +161,38 @@ class Template(object):
 
     # find template the given command and apply on given data
     def apply(self, output, cmd):
-        attrs = dict(Command=cmd)
-        if self.platform:
-            attrs["Platform"] = self.platform
-        if self.cli:
-            attrs["cli"] = self.cli
-
-        tmpl_file = self.get_tmpl(cmd)
+        tmpl_file, templates = self.resolve(cmd)
         if not tmpl_file:
             raise ValueError('Unknown command "%s"' % (cmd))
 
-        cli_table = self.get_table(cmd)
-        if not cli_table:
+        if not templates:
             raise ValueError('Unable to parse command "%s"' % (cmd))
 
-        cli_table.ParseCmd(output, attrs)
-        objs = self.result(cli_table.header, cli_table)
+        header, rows = self.parse(templates, output)
+        objs = self.result(header, rows)
         return [tmpl_file, objs]
 
+    # parse the data with the templates, same as clitable.CliTable.ParseCmd
+    def parse(self, templates, data):
+        fsm, rows = self.cache.parse(templates[0], data)
+        if len(templates) == 1:
+            return fsm.header, rows
+        keys = set(fsm.GetValuesByAttrib('Key'))
+        table = self.texttable(fsm.header, rows)
+        for tmpl_file in templates[1:]:
+            fsm, rows = self.cache.parse(tmpl_file, data)
+            keys = keys or set(fsm.GetValuesByAttrib('Key'))
+            table.extend(self.texttable(fsm.header, rows), keys)
+        return table.header, table
+
+    @staticmethod
+    def texttable(header, rows):
+        table = texttable.TextTable()
+        table.header = header
+        for row in rows:
+            table.Append(row)
+        return table
+
     def result(self, header, rows):
         objs = []
         for row in rows:
@@ -159,11 +250,7 @@ class Template(object):
 
     # apply the given template on given data
     def apply_textfsm(self, tmpl_file, data):
-        tmpl_file2 = os.path.join(self.root, tmpl_file)
-        tmpl_fp = open(tmpl_file2, "r")
-        re_table = textfsm.TextFSM(tmpl_fp)
-        out = re_table.ParseText(data)
-        tmpl_fp.close()
+        re_table, out = self.cache.parse(tmpl_file, data)
         objs = self.result(re_table.header, out)
         return re_table.header, objs
 
@@ -443,6 +443,7 @@ class ScapyDriver(object):
                     ipg = self.packet.build_ipg(pwa_next)
                     pwa_next.tx_time = self.utils.clock() + ipg - build_time - send_time
                     pwa_next_list.append(pwa_next)
+            self.packet.tx_flush()
             pwa_list = pwa_next_list
         self.logger.debug("{} {} Completed {}".format(func, self.iface, tx_count))
 
@@ -454,6 +455,9 @@ class ScapyDriver(object):
         if self.dbg > 2 or (self.dbg > 1 and pwa.left != 0):
             self.logger.debug("stream: {} delay: {} pps: {}".format(pwa.stream.stream_id, delay, pwa.rate_pps))
         delay = 0 if delay < 0 else delay
+        if delay > 0:
+            # send the packets queued in TX ring before waiting
+            self.packet.tx_flush()
         if delay > 1.0 / 10:
             self.utils.msleep(delay * 1000, 10)
         elif delay > 1.0 / 100:
@@ -25,12 +25,15 @@ from dicts import SpyTestDict
 from utils import Utils
 from utils import RunTimeException
 from logger import Logger
+from stats import frame_class_stat
 from lock import Lock
-from protocol import PacketProtocol
+from protocol import PacketProtocol, frame_class
 from interface import PacketInterface
 from bgp_exabgp import ExaBgp
 from dot1x import Dot1x
 from dhcps import Dhcps
+from template import PacketTemplate
+from ring import RxRing, TxRing
 
 try:
     print("SCAPY VERSION = {}".format(Conf().version))
@@ -151,10 +154,19 @@ class ScapyPacket(object):
         self.rx_sock = None
         self.tx_sock = None
         self.tx_sock_failed = False
+        self.rx_ring = None
+        self.tx_ring = None
+        self.tx_ring_failed = False
         self.finished = False
         self.mtu = 9194
         self.use_bridge = bool(os.getenv("SPYTEST_SCAPY_USE_BRIDGE", "1") != "0")
         self.logger.info("use_bridge = {}".format(self.use_bridge))
+        self.use_template = bool(os.getenv("SPYTEST_SCAPY_USE_TEMPLATE", "1") != "0")
+        self.logger.info("use_template = {}".format(self.use_template))
+        # comma separated interfaces using PACKET_MMAP rings or * for all
+        mmap_ports = os.getenv("SPYTEST_SCAPY_MMAP_PORTS", "").strip()
+        self.use_mmap = bool(iface) and (mmap_ports == "*" or iface in mmap_ports.split(","))
+        self.logger.info("use_mmap = {}".format(self.use_mmap))
         self.pp = PacketProtocol(self)
         self.pi = PacketInterface(self)
         self.bgp = ExaBgp(self)
@@ -261,9 +273,12 @@ class ScapyPacket(object):
         self.dot1x.cleanup()
         self.dhcps.cleanup()
         self.finished = True
+        self.rx_ring = self.close_sock(self.rx_ring)
         self.rx_sock = self.close_sock(self.rx_sock)
+        self.tx_ring = self.close_sock(self.tx_ring)
         self.tx_sock = self.close_sock(self.tx_sock)
         self.tx_sock_failed = False
+        self.tx_ring_failed = False
         self.init_bridge(self.iface)
         self.finished = False
 
@@ -272,7 +287,15 @@ class ScapyPacket(object):
             return
         ETH_P_ALL = 3
         self.rx_sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
-        self.rx_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 12 * 1024)
+        if self.use_mmap:
+            try:
+                self.rx_ring = RxRing(self.rx_sock)
+            except Exception as exp:
+                self.logger.error("Failed to create RX ring {} {}".format(self.iface, exp))
+                self.rx_sock = self.close_sock(self.rx_sock)
+                self.rx_sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        if not self.rx_ring:
+            self.rx_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 12 * 1024)
         try:
             self.rx_sock.bind((self.iface + "-rx", 3))
         except Exception as exp:
@@ -281,7 +304,8 @@ class ScapyPacket(object):
             if not self.use_custom_exp:
                 raise exp
             raise RunTimeException(exp, msg)
-        afpacket.enable_auxdata(self.rx_sock)
+        if not self.rx_ring:
+            afpacket.enable_auxdata(self.rx_sock)
 
     def set_link(self, status):
         msg = "link:{} status:{}".format(self.iface, status)
@@ -297,29 +321,39 @@ class ScapyPacket(object):
             return None
 
         try:
-            data = afpacket.recv(self.rx_sock, 12 * 1024)
+            if self.rx_ring:
+                data = self.rx_ring.recv(1000)
+            else:
+                data = afpacket.recv(self.rx_sock, 12 * 1024)
         except Exception as exp:
             if self.finished:
                 return None
             raise exp
-        packet = Ether(data)
+        if data is None:
+            return None
+        fclass = frame_class(data)
+        port.incrStat(frame_class_stat(fclass))
         self.stats_lock.acquire()
         self.rx_count = self.rx_count + 1
         self.stats_lock.release()
         self.trace_stats()
 
+        # scapy packet is needed only to trace, protocol packets are built in pp.process
+        packet = Ether(data) if self.dbg > 3 or (self.dbg > 1 and self.show_summary) else None
+
         if self.dbg > 1:
             cmd = "" if not self.show_summary else packet.command()
-            msg = "readp:{} len:{} count:{} {}".format
-            self.logger.debug(msg(iface, len(data), self.rx_count, cmd))
+            msg = "readp:{} len:{} count:{} class:{} {}".format
+            self.logger.debug(msg(iface, len(data), self.rx_count, fclass, cmd))
 
         if self.dbg > 3:
             self.trace_packet(packet, self.hex)
 
         # handle protocol packets
-        self.pp.process(port, packet)
+        self.pp.process(port, data, fclass, packet)
 
-        return packet
+        # stats and captures of the driver work on the frame bytes
+        return data
 
     def sendp(self, pkt, data, iface, stream_name, left):
         self.stats_lock.acquire()
@@ -335,7 +369,8 @@ class ScapyPacket(object):
         if self.dbg > 3:
             self.trace_packet(pkt, self.hex)
 
-        return self.send(data, iface)
+        # stream packets are sent from the TX ring on tx_flush
+        return self.send(data, iface, flush=False)
 
     def mkcmd(self, data):
         try:
@@ -349,7 +384,7 @@ class ScapyPacket(object):
         cmd = self.mkcmd(data)
         return "{}:{} len:{} {} {}".format(func, iface, len(data), cmd, str(exp))
 
-    def send(self, data, iface, trace=False):
+    def send(self, data, iface, trace=False, flush=True):
 
         if trace and self.dbg > 2:
             cmd = self.mkcmd(data)
@@ -359,6 +394,20 @@ class ScapyPacket(object):
         if self.dry:
             return
 
+        if self.use_mmap and not self.tx_ring and not self.tx_ring_failed:
+            try:
+                self.tx_ring = TxRing(iface)
+            except Exception as exp:
+                self.tx_ring_failed = True
+                self.logger.error("Failed to create TX ring {} {}".format(iface, exp))
+
+        # try sending using ring
+        if self.tx_ring:
+            try:
+                return self.tx_ring.queue(data, flush)
+            except Exception as exp:
+                self.logger.debug(self.expmsg(data, iface, exp, "ring-send"))
+
         if not self.tx_sock:
             try:
                 self.tx_sock = L2Socket(iface)
@@ -389,6 +438,13 @@ class ScapyPacket(object):
         self.logger.error("Failed to send normal {}".format(err1))
         self.logger.error("Failed to send legacy {}".format(err2))
 
+    def tx_flush(self):
+        if self.tx_ring:
+            try:
+                self.tx_ring.flush()
+            except Exception as exp:
+                self.logger.error("Failed to flush TX ring {} {}".format(self.iface, exp))
+
     def trace_stats(self):
         # self.logger.debug("Name: {} RX: {} TX: {}".format(self.iface, self.rx_count, self.tx_count))
         pass
@@ -406,34 +462,44 @@ class ScapyPacket(object):
     def trace_packet(self, pkt, hex=True, fields=True, force=False):
         if not fields and not hex:
             return
-        if isinstance(pkt, str):
+        # frames received by readp are given to the driver as bytes
+        if isinstance(pkt, (str, bytes, bytearray)):
             pkt = Ether(pkt)
         if fields:
             self.show_pkt(pkt, force)
         if hex:
             self.logger.debug(hexdump(pkt, dump=True))
 
+    def get_signature(self, pwa):
+        sid = pwa.stream.get_sid()
+        sid = sid or "DeadBeef"
+        return binascii.unhexlify(sid)
+
     def send_packet(self, pwa, iface, stream_name, left):
-        if pwa.padding:
-            strpkt = self.utils.tobytes(pwa.pkt / pwa.padding)
+        if pwa.template:
+            sid = self.get_signature(pwa) if pwa.add_signature else None
+            bstr = pwa.template.build(pwa.pad_len, sid)
         else:
-            strpkt = self.utils.tobytes(pwa.pkt)
-
-        # insert stream id before CRC
-        if pwa.add_signature:
-            sid = pwa.stream.get_sid()
-            sid = sid or "DeadBeef"
-            if sid:
-                sid = binascii.unhexlify(sid)
+            if pwa.padding:
+                strpkt = self.utils.tobytes(pwa.pkt / pwa.padding)
+            else:
+                strpkt = self.utils.tobytes(pwa.pkt)
+
+            # insert stream id before CRC
+            if pwa.add_signature:
+                sid = self.get_signature(pwa)
                 strpkt = strpkt[:-len(sid)] + sid
 
-        try:
-            crc1 = '{:08x}'.format(socket.htonl(zlib.crc32(strpkt) & 0xFFFFFFFF))
-            crc = binascii.unhexlify(crc1)
-        except Exception:
-            crc = binascii.unhexlify('00' * 4)
-        bstr = strpkt + self.utils.tobytes(crc)
-        self.sendp(Ether(bstr), bstr, iface, stream_name, left)
+            try:
+                crc1 = '{:08x}'.format(socket.htonl(zlib.crc32(strpkt) & 0xFFFFFFFF))
+                crc = binascii.unhexlify(crc1)
+            except Exception:
+                crc = binascii.unhexlify('00' * 4)
+            bstr = strpkt + self.utils.tobytes(crc)
+
+        # scapy packet is needed only to trace
+        pkt = Ether(bstr) if self.dbg > 2 else None
+        self.sendp(pkt, bstr, iface, stream_name, left)
         return bstr
 
     def check(self, pkt):
@@ -914,21 +980,37 @@ class ScapyPacket(object):
         pwa.frame_size_min = frame_size_min
         pwa.frame_size_max = frame_size_max
         pwa.frame_size_step = frame_size_step
+        pwa.template = self.build_template(pwa)
         self.add_padding(pwa, True)
 
         return pwa
 
+    def build_template(self, pwa):
+        if not self.use_template:
+            return None
+        try:
+            return PacketTemplate(pwa.pkt, pwa.stream.kws, self.utils)
+        except Exception as exp:
+            self.logger.debug("stream {} packets are built using scapy: {}".format(pwa.stream.stream_id, exp))
+        return None
+
+    def set_padding(self, pwa, padLen):
+        pwa.pad_len = padLen
+        if not pwa.template:
+            pwa.padding = Padding(binascii.unhexlify('00' * padLen))
+        pwa.add_signature = True
+
     def add_padding(self, pwa, first):
         pwa.padding = None
+        pwa.pad_len = 0
         if pwa.length_mode == "random":
-            pktLen = len(pwa.pkt)
+            pktLen = pwa.template.length if pwa.template else len(pwa.pkt)
             frame_size = random.randrange(pwa.frame_size_min, pwa.frame_size_max + 1)
             padLen = int(frame_size - pktLen - 4)
             if padLen > 0:
-                pwa.padding = Padding(binascii.unhexlify('00' * padLen))
-                pwa.add_signature = True
+                self.set_padding(pwa, padLen)
         elif pwa.length_mode in ["increment", "incr"]:
-            pktLen = len(pwa.pkt)
+            pktLen = pwa.template.length if pwa.template else len(pwa.pkt)
             if first:
                 frame_size = pwa.frame_size_min
             else:
@@ -939,11 +1021,16 @@ class ScapyPacket(object):
                 pwa.frame_size_current = frame_size
             padLen = int(pwa.frame_size_current - pktLen - 4)
             if padLen > 0:
-                pwa.padding = Padding(binascii.unhexlify('00' * padLen))
-                pwa.add_signature = True
+                self.set_padding(pwa, padLen)
 
     def build_next_dma(self, pwa):
 
+        # patch the fields in the stream template, pwa.pkt is not changed
+        if pwa.template:
+            pwa.template.next()
+            self.add_padding(pwa, False)
+            return pwa
+
         # Change Ether SRC MAC
         mac_src_mode = pwa.stream.kws.get("mac_src_mode", "fixed").strip()
         mac_src_step = pwa.stream.kws.get("mac_src_step", "00:00:00:00:00:01")
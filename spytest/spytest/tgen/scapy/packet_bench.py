@@ -0,0 +1,64 @@
+'''
+Benchmark of the packet build paths of ScapyPacket: scapy and stream template.
+
+Packets of the unit test streams (ut_streams.py) are built with both paths,
+without sending them, and the packets per second of each path are reported
+per stream type. The packets of both paths are compared to make sure they
+are the same.
+
+Usage:
+    python3 packet_bench.py [--packets 5000] [--stream 0]
+'''
+import time
+import random
+import argparse
+
+from packet import ScapyPacket
+from port import ScapyStream
+from ut_streams import ut_stream_get
+
+
+def stream_type(kws):
+    parts = [kws.get("l3_protocol", "raw"), kws.get("l4_protocol", "")]
+    modes = [key[:-len("_mode")] for key, value in kws.items() if key.endswith("_mode") and value != "fixed"
+             and key not in ["transmit_mode", "data_pattern_mode"]]
+    return "/".join([part for part in parts if part] + modes)
+
+
+def measure(packet, index, kws, count, use_template):
+    packet.use_template = use_template
+    random.seed(index)
+    stream = ScapyStream("1", index, "stream-{}".format(index), [], **kws)
+    pwa = packet.build_first(stream)
+    frames = []
+    start = time.time()
+    for _ in range(count):
+        frames.append(packet.send_packet(pwa, "", stream.stream_id, pwa.left))
+        pwa = packet.build_next(pwa)
+    pps = count / max(time.time() - start, 1e-9)
+    return frames, pps, bool(pwa.template)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of ScapyPacket build paths')
+    parser.add_argument('--packets', type=int, default=5000, help='Number of packets per stream')
+    parser.add_argument('--stream', type=int, default=None, help='Index of the unit test stream, default all')
+    args = parser.parse_args()
+
+    packet = ScapyPacket("", dry=True)
+    indexes = [args.stream] if args.stream is not None else range(100)
+    print('{:<6} {:<60} {:>12} {:>14} {:>8}'.format('index', 'stream', 'scapy (pps)', 'template (pps)', 'speedup'))
+    for index in indexes:
+        kws = ut_stream_get(index, transmit_mode='continuous')
+        if not kws:
+            break
+        scapy_frames, scapy_pps, _ = measure(packet, index, kws, args.packets, False)
+        template_frames, template_pps, used = measure(packet, index, kws, args.packets, True)
+        assert scapy_frames == template_frames, 'Packets of stream {} are different'.format(index)
+        print('{:<6} {:<60} {:>12.0f} {:>14} {:>8}'.format(
+            index, stream_type(kws), scapy_pps, '{:.0f}'.format(template_pps) if used else 'scapy',
+            '{:.1f}'.format(template_pps / scapy_pps) if used else '-'))
+
+
+if __name__ == '__main__':
+    main()
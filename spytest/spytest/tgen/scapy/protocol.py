@@ -1,4 +1,5 @@
 import copy
+import struct
 import binascii
 import traceback
 
@@ -20,6 +21,58 @@ from scapy.contrib.igmp import IGMP
 from scapy.contrib.igmpv3 import IGMPv3, IGMPv3mr, IGMPv3gr, IGMPv3mq
 from scapy.utils import chexdump
 
+VLAN_TPIDS = [0x8100, 0x88A8, 0x9100]
+ETHER_TYPE_CLASSES = {0x0806: "arp", 0x888E: "eapol", 0x8809: "lacp", 0x88CC: "lldp"}
+IPV4_PROTO_CLASSES = {2: "igmp", 89: "ospf"}
+# classes of the frames decoded with scapy for the protocol handling in PacketProtocol.process
+decode_classes = ["dhcp", "igmp", "ospf", "eapol"]
+
+
+def l4_ports_class(data, offset, proto, dhcp_ports, dhcp_class):
+    if proto not in [6, 17]:
+        return None
+    sport, dport = struct.unpack_from("!HH", data, offset)
+    if proto == 17 and (sport in dhcp_ports or dport in dhcp_ports):
+        return dhcp_class
+    if proto == 6 and 179 in [sport, dport]:
+        return "bgp"
+    return None
+
+
+def frame_class(data):
+    """
+    Classify the received frame from its bytes by EtherType, IP protocol and UDP/TCP port
+    so that the scapy packet is built only for the frames needed by the protocol handling.
+    """
+    try:
+        offset = 12
+        ether_type = struct.unpack_from("!H", data, offset)[0]
+        while ether_type in VLAN_TPIDS:
+            offset = offset + 4
+            ether_type = struct.unpack_from("!H", data, offset)[0]
+        offset = offset + 2
+        if ether_type < 0x0600:
+            # 802.3 length, STP uses LLC SAP 0x42
+            dsap = struct.unpack_from("!B", data, offset)[0]
+            return "stp" if dsap == 0x42 else "other"
+        if ether_type == 0x0800:
+            ver_ihl, proto = struct.unpack_from("!B8xB", data, offset)
+            if proto in IPV4_PROTO_CLASSES:
+                return IPV4_PROTO_CLASSES[proto]
+            offset = offset + (ver_ihl & 0x0F) * 4
+            return l4_ports_class(data, offset, proto, [67, 68], "dhcp") or "ipv4"
+        if ether_type == 0x86DD:
+            next_header = struct.unpack_from("!B", data, offset + 6)[0]
+            offset = offset + 40
+            if next_header == 58:
+                # router/neighbor solicitation/advertisement and redirect
+                icmp_type = struct.unpack_from("!B", data, offset)[0]
+                return "nd" if 133 <= icmp_type <= 137 else "ipv6"
+            return l4_ports_class(data, offset, next_header, [546, 547], "dhcpv6") or "ipv6"
+        return ETHER_TYPE_CLASSES.get(ether_type, "other")
+    except struct.error:
+        return "other"
+
 
 class PacketProtocol(object):
 
@@ -32,19 +85,22 @@ class PacketProtocol(object):
     def __del__(self):
         pass
 
-    def process(self, port, pkt):
+    def process(self, port, data, fclass, pkt=None):
+
+        if fclass in decode_classes:
+            pkt = pkt or Ether(data)
 
-        if IP in pkt and pkt.proto == 89:
-            self.ospf_rx(port, pkt)
+            if IP in pkt and pkt.proto == 89:
+                self.ospf_rx(port, pkt)
 
-        if BOOTP in pkt:
-            self.dhcp_rx(port, pkt)
+            if BOOTP in pkt:
+                self.dhcp_rx(port, pkt)
 
-        if IGMP in pkt or IGMPv3 in pkt:
-            self.igmp_rx(port, pkt)
+            if IGMP in pkt or IGMPv3 in pkt:
+                self.igmp_rx(port, pkt)
 
-        if EAP in pkt:
-            self.dot1x_rx(port, pkt)
+            if EAP in pkt:
+                self.dot1x_rx(port, pkt)
 
         self.igmp_tx_query_periodic(port)
         self.dot1x_tx_periodic(port)
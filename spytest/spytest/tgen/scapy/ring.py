@@ -0,0 +1,313 @@
+"""
+AF_PACKET TPACKET_V3 memory mapped rings
+
+RxRing maps a receive ring of blocks shared with the kernel: received frames
+are read from the blocks in place and a block is given back to the kernel once
+all of its frames are read, so there is no system call per frame and bursts
+fill the ring instead of overflowing the socket receive buffer.
+TxRing maps a transmit ring of frames: frames are copied to the ring and sent
+in a batch by a single send call on flush.
+
+Usage (self test over a veth pair in a network namespace, needs root):
+    python3 ring.py [--frames 10000] [--size 128]
+"""
+
+import os
+import sys
+import mmap
+import time
+import socket
+import struct
+import select
+import argparse
+import subprocess
+from threading import Lock
+from threading import Thread
+
+ETH_P_ALL = 3
+ETH_P_8021Q = 0x8100
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+PACKET_TX_RING = 13
+PACKET_LOSS = 14
+TPACKET_V3 = 2
+
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1 << 0
+TP_STATUS_AVAILABLE = 0
+TP_STATUS_SEND_REQUEST = 1 << 0
+TP_STATUS_SENDING = 1 << 1
+TP_STATUS_WRONG_FORMAT = 1 << 2
+TP_STATUS_VLAN_VALID = 1 << 4
+TP_STATUS_VLAN_TPID_VALID = 1 << 6
+
+# struct tpacket_req3
+TPACKET_REQ3 = struct.Struct("7I")
+# struct tpacket_block_desc: version, offset_to_priv, hdr_v1: block_status, num_pkts, offset_to_first_pkt
+BLOCK_DESC = struct.Struct("5I")
+# struct tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac, tp_net,
+# hv1: tp_rxhash, tp_vlan_tci, tp_vlan_tpid
+TPACKET3_HDR = struct.Struct("6I2H2IH")
+# TPACKET_ALIGN(sizeof(struct tpacket3_hdr)), offset of frame data in TX ring
+TPACKET3_HDRLEN = 48
+
+
+def set_version(sock):
+    sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+
+
+class RxRing(object):
+    """
+    TPACKET_V3 receive ring of the AF_PACKET socket, to be created before binding the socket.
+    """
+
+    def __init__(self, sock, block_size=1 << 20, block_nr=16, frame_size=2048, timeout_ms=10):
+        self.sock = sock
+        self.block_size = block_size
+        self.block_nr = block_nr
+        set_version(sock)
+        frame_nr = (block_size // frame_size) * block_nr
+        req = TPACKET_REQ3.pack(block_size, block_nr, frame_size, frame_nr, timeout_ms, 0, 0)
+        sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+        self.map = mmap.mmap(sock.fileno(), block_size * block_nr, mmap.MAP_SHARED,
+                             mmap.PROT_READ | mmap.PROT_WRITE)
+        self.poller = select.poll()
+        self.poller.register(sock.fileno(), select.POLLIN | select.POLLERR)
+        self.block = 0
+        self.block_base = None
+        self.pkts_left = 0
+        self.offset = 0
+        self.count = 0
+        self.drops = 0
+
+    def close(self):
+        if self.map:
+            self.map.close()
+            self.map = None
+
+    def next_block(self, timeout):
+        # give the current block back to the kernel
+        if self.block_base is not None:
+            struct.pack_into("I", self.map, self.block_base + 8, TP_STATUS_KERNEL)
+            self.block = (self.block + 1) % self.block_nr
+            self.block_base = None
+
+        base = self.block * self.block_size
+        status = struct.unpack_from("I", self.map, base + 8)[0]
+        if not status & TP_STATUS_USER:
+            if not self.poller.poll(timeout):
+                return False
+            status = struct.unpack_from("I", self.map, base + 8)[0]
+            if not status & TP_STATUS_USER:
+                return False
+
+        _, _, _, num_pkts, offset = BLOCK_DESC.unpack_from(self.map, base)
+        self.block_base = base
+        self.pkts_left = num_pkts
+        self.offset = base + offset
+        return True
+
+    def recv(self, timeout=None):
+        """
+        Read the next frame from the ring, the VLAN tag offloaded by the NIC is inserted back.
+        @timeout Time in milli seconds to wait for a frame, None to wait forever
+        @return Bytes of the frame or None on timeout
+        """
+        while not self.pkts_left:
+            if not self.next_block(timeout):
+                return None
+
+        hdr = TPACKET3_HDR.unpack_from(self.map, self.offset)
+        next_offset, snaplen, status, mac, tci = hdr[0], hdr[3], hdr[5], hdr[6], hdr[9]
+        start = self.offset + mac
+        if tci != 0 or status & TP_STATUS_VLAN_VALID:
+            tpid = hdr[10] if status & TP_STATUS_VLAN_TPID_VALID else ETH_P_8021Q
+            data = self.map[start:start + 12] + struct.pack("!HH", tpid, tci) + self.map[start + 12:start + snaplen]
+        else:
+            data = self.map[start:start + snaplen]
+        self.pkts_left = self.pkts_left - 1
+        self.offset = self.offset + next_offset
+        self.count = self.count + 1
+        return data
+
+    def stats(self):
+        """
+        Read the kernel counters of the socket (reset on read) and accumulate the drops.
+        @return Tuple of packets and drops since the previous call
+        """
+        packets, drops, _ = struct.unpack("3I", self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 12))
+        self.drops = self.drops + drops
+        return packets, drops
+
+
+class TxRing(object):
+    """
+    TPACKET_V3 transmit ring of the AF_PACKET socket bound to the interface.
+    Frames are queued in the ring and sent together on flush.
+    """
+
+    def __init__(self, iface, frame_size=16384, frame_nr=256):
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            set_version(self.sock)
+            # discard malformed frames instead of stopping the transmit
+            self.sock.setsockopt(SOL_PACKET, PACKET_LOSS, 1)
+            req = TPACKET_REQ3.pack(frame_size, frame_nr, frame_size, frame_nr, 0, 0, 0)
+            self.sock.setsockopt(SOL_PACKET, PACKET_TX_RING, req)
+            self.map = mmap.mmap(self.sock.fileno(), frame_size * frame_nr, mmap.MAP_SHARED,
+                                 mmap.PROT_READ | mmap.PROT_WRITE)
+            self.sock.bind((iface, 0))
+        except Exception:
+            self.sock.close()
+            raise
+        self.frame_size = frame_size
+        self.frame_nr = frame_nr
+        self.frame = 0
+        self.pending = 0
+        self.count = 0
+        self.errors = 0
+        self.lock = Lock()
+        self.poller = select.poll()
+        self.poller.register(self.sock.fileno(), select.POLLOUT)
+
+    def close(self):
+        self.lock.acquire()
+        if self.map:
+            self.map.close()
+            self.map = None
+        self.sock.close()
+        self.lock.release()
+
+    def _frame_status(self, offset):
+        return struct.unpack_from("I", self.map, offset + 20)[0]
+
+    def _queue(self, data):
+        if len(data) > self.frame_size - TPACKET3_HDRLEN:
+            raise ValueError("frame of {} bytes does not fit in the ring".format(len(data)))
+        offset = self.frame * self.frame_size
+        status = self._frame_status(offset)
+        while status & (TP_STATUS_SEND_REQUEST | TP_STATUS_SENDING):
+            # ring is full, send the queued frames
+            self._flush()
+            self.poller.poll(100)
+            status = self._frame_status(offset)
+        if status & TP_STATUS_WRONG_FORMAT:
+            self.errors = self.errors + 1
+        start = offset + TPACKET3_HDRLEN
+        self.map[start:start + len(data)] = data
+        struct.pack_into("I", self.map, offset, 0)
+        struct.pack_into("I", self.map, offset + 16, len(data))
+        struct.pack_into("I", self.map, offset + 20, TP_STATUS_SEND_REQUEST)
+        self.frame = (self.frame + 1) % self.frame_nr
+        self.pending = self.pending + 1
+
+    def _flush(self):
+        if self.pending:
+            self.sock.send(b"")
+            self.count = self.count + self.pending
+            self.pending = 0
+
+    def queue(self, data, flush=False):
+        """
+        Copy the frame to the ring, the frames are sent on flush or when the ring is full.
+        """
+        self.lock.acquire()
+        try:
+            self._queue(data)
+            if flush:
+                self._flush()
+        finally:
+            self.lock.release()
+        return len(data)
+
+    def send(self, frames):
+        """
+        Send the list of frames in a batch.
+        """
+        self.lock.acquire()
+        try:
+            for data in frames:
+                self._queue(data)
+            self._flush()
+        finally:
+            self.lock.release()
+        return len(frames)
+
+    def flush(self):
+        self.lock.acquire()
+        try:
+            self._flush()
+        finally:
+            self.lock.release()
+
+
+def selftest(count, size):
+    rx_sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    rx_ring = RxRing(rx_sock)
+    rx_sock.bind(("rx0", ETH_P_ALL))
+    tx_ring = TxRing("tx0")
+
+    frames = []
+    for index in range(count):
+        header = struct.pack("!6s6sHI", b"\x00\x00\x00\x00\x00\x02", b"\x00\x00\x00\x00\x00\x01", 0x88B5, index)
+        frames.append(header + b"\x00" * max(size - len(header), 0))
+
+    received = []
+
+    def receive():
+        while len(received) < len(frames):
+            data = rx_ring.recv(500)
+            if data is None:
+                break
+            if data[12:14] == b"\x88\xb5":
+                received.append(data)
+
+    rx_thread = Thread(target=receive)
+    rx_thread.start()
+    start = time.time()
+    for index in range(0, len(frames), 64):
+        tx_ring.send(frames[index:index + 64])
+    tx_time = time.time() - start
+    rx_thread.join()
+    _, drops = rx_ring.stats()
+
+    print("sent {} frames in {:.3f}s ({:.0f} pps)".format(tx_ring.count, tx_time, tx_ring.count / tx_time))
+    print("received {} frames, drops {}".format(len(received), drops))
+    tx_ring.close()
+    rx_ring.close()
+    rx_sock.close()
+    assert received == frames, "Received frames are different"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Self test of RxRing and TxRing over a veth pair')
+    parser.add_argument('--frames', type=int, default=10000, help='Number of frames to send')
+    parser.add_argument('--size', type=int, default=128, help='Size of the frames')
+    parser.add_argument('--netns', default='ring-test', help='Name of the network namespace')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        # running in the network namespace
+        return selftest(args.frames, args.size)
+
+    def run(cmd):
+        subprocess.check_call(cmd.split())
+
+    run("ip netns add {}".format(args.netns))
+    try:
+        run("ip -n {} link add tx0 type veth peer name rx0".format(args.netns))
+        run("ip -n {} link set tx0 mtu 9194".format(args.netns))
+        run("ip -n {} link set rx0 mtu 9194".format(args.netns))
+        run("ip -n {} link set tx0 up".format(args.netns))
+        run("ip -n {} link set rx0 up".format(args.netns))
+        subprocess.check_call(["ip", "netns", "exec", args.netns, sys.executable, os.path.abspath(__file__),
+                               "--run", "--frames", str(args.frames), "--size", str(args.size)])
+    finally:
+        subprocess.call(["ip", "netns", "del", args.netns])
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,7 @@ from dicts import SpyTestDict
 from port import ScapyPort
 from logger import Logger
 from utils import Utils
+from stats import frame_classes, frame_class_stat
 from stats import dhcpc_stats_aggregate_init
 from stats import dhcpc_stats_session_init
 from stats import dhcps_stats_aggregate_init
@@ -799,6 +800,7 @@ class ScapyServer(object):
                 res[port_handle][mode] = SpyTestDict()
                 res[port_handle]["name"] = port.iface
                 self.fill_stats(res[port_handle][mode], stats, stats, port=port)
+                self.fill_frame_class_stats(res[port_handle][mode], stats)
             elif mode == "traffic_item_0":
                 res[mode] = SpyTestDict()
                 for stream, stats in port.getStreamStats():
@@ -891,6 +893,12 @@ class ScapyServer(object):
             res["rx"]["oversize_count"] = self.stat_value(rx_stats.oversizeFramesReceived, detailed)
             res["rx"]["name"] = port.port_handle if port else ""
 
+    def fill_frame_class_stats(self, res, rx_stats):
+        classes = SpyTestDict()
+        for name in frame_classes:
+            classes[name] = rx_stats.get(frame_class_stat(name), 0)
+        res["rx"]["frame_classes"] = classes
+
     def fill_streams(self, res, port, stream_id_list=None):
         # stats = port.getStats()
         # self.logger.error("PORT", port.port_handle, stats)
@@ -1,5 +1,13 @@
 from dicts import SpyTestDict
 
+# classes of the received frames, see protocol.frame_class
+frame_classes = ["arp", "nd", "dhcp", "dhcpv6", "igmp", "ospf", "bgp",
+                 "eapol", "lacp", "lldp", "stp", "ipv4", "ipv6", "other"]
+
+
+def frame_class_stat(name):
+    return "{}FramesReceived".format(name)
+
 
 def port_stats_init(stats=None):
     stats = stats or SpyTestDict()
@@ -12,6 +20,8 @@ def port_stats_init(stats=None):
     stats.userDefinedStat1 = 0
     stats.userDefinedStat2 = 0
     stats.captureFilter = 0
+    for name in frame_classes:
+        stats[frame_class_stat(name)] = 0
     return stats
 
 
@@ -0,0 +1,266 @@
+import zlib
+import struct
+import socket
+import binascii
+
+from scapy.packet import NoPayload
+from scapy.layers.l2 import Dot1Q, ARP
+from scapy.layers.inet import IP, UDP, TCP
+from scapy.layers.inet6 import IPv6, _ICMPv6
+from utils import Utils
+
+# modes of the fields handled by the template, same as ScapyPacket.build_next_dma
+incr_modes = ["increment", "incr"]
+decr_modes = ["decrement", "decr"]
+
+
+def mac2int(mac):
+    return int(mac.replace(':', '').replace(".", ''), 16)
+
+
+def ipv42int(ip):
+    return struct.unpack("!I", socket.inet_aton(ip))[0]
+
+
+def ipv62int(ip):
+    return Utils.ipv6_ip2long(ip)
+
+
+def csum_fold(value):
+    while value >> 16:
+        value = (value & 0xFFFF) + (value >> 16)
+    return value
+
+
+def csum_words(value, size):
+    total = 0
+    for _ in range(size // 2):
+        total = total + (value & 0xFFFF)
+        value = value >> 16
+    return total
+
+
+class TemplateField(object):
+    """
+    Field of the stream patched in the template for every packet.
+    The value changes the same way as the scapy packet field in ScapyPacket.build_next_dma,
+    values out of the field range wrap around.
+    """
+
+    def __init__(self, name, offset, size, value, reset=0, step=0, limit=0,
+                 values=None, base=None, mask=None, checksums=None):
+        self.name = name
+        self.offset = offset
+        self.size = size
+        self.value = value
+        self.reset = reset
+        self.step = step
+        self.limit = limit
+        self.values = values
+        self.base = base
+        self.mask = mask if mask is not None else (1 << (size * 8)) - 1
+        # list of (offset, is_udp) of the checksums covering the field
+        self.checksums = checksums or []
+        self.count = 0
+
+    def next(self):
+        if self.values is not None:
+            self.count = self.count + 1
+            if self.count >= len(self.values):
+                self.count = 0
+            self.value = self.values[self.count]
+            return
+        base = self.base.value if self.base else self.value
+        self.value = base + self.step
+        self.count = self.count + 1
+        if self.limit > 0 and self.count >= self.limit:
+            self.value = self.reset
+            self.count = 0
+
+    def encode(self, value):
+        if self.size == 2:
+            return struct.pack("!H", value)
+        if self.size == 4:
+            return struct.pack("!I", value)
+        return binascii.unhexlify("{:0{}x}".format(value, self.size * 2))
+
+
+class PacketTemplate(object):
+    """
+    Bytes template of a stream built once from the scapy packet of the stream.
+
+    Next packets are generated by patching the fields changed by the stream modes at their
+    byte offsets, and updating the checksums covering them incrementally (RFC 1624),
+    instead of changing the scapy packet fields and building the packet again.
+    Raises ValueError for streams which are not supported, those are built with scapy.
+    """
+
+    def __init__(self, pkt, kws, utils):
+        self.buf = bytearray(bytes(pkt))
+        self.length = len(self.buf)
+        self.kws = kws
+        self.utils = utils
+        self.offsets = self.get_offsets(pkt)
+        self.fields = []
+        self.add_mac_fields(pkt)
+        self.add_arp_fields(pkt)
+        self.add_ip_fields(pkt)
+        self.add_vlan_field(pkt)
+        self.add_l4_fields(pkt, TCP, "tcp")
+        self.add_l4_fields(pkt, UDP, "udp")
+        for field in self.fields:
+            if bytes(self.buf[field.offset:field.offset + field.size]) != self.pack(field):
+                raise ValueError("{} mismatch at offset {}".format(field.name, field.offset))
+
+    @staticmethod
+    def get_offsets(pkt):
+        offsets = {}
+        layer, offset = pkt, 0
+        while not isinstance(layer, NoPayload):
+            offsets.setdefault(layer.__class__, offset)
+            offset = offset + len(layer) - len(layer.payload)
+            layer = layer.payload
+        return offsets
+
+    def get_mode(self, prop, modes):
+        mode = self.kws.get(prop, "fixed").strip()
+        if mode != "fixed" and mode not in modes:
+            raise ValueError("unsupported {} = {}".format(prop, mode))
+        return mode
+
+    def add_field(self, mode, name, offset, size, value, reset, step, count_prop, **kwargs):
+        if mode == "fixed":
+            return None
+        limit = self.utils.intval(self.kws, count_prop, 0)
+        step = -step if mode in decr_modes else step
+        field = TemplateField(name, offset, size, value, reset, step, limit, **kwargs)
+        self.fields.append(field)
+        return field
+
+    def add_mac_fields(self, pkt):
+        for name, offset in [("mac_src", 6), ("mac_dst", 0)]:
+            mode = self.get_mode("{}_mode".format(name), ["increment", "decrement", "list"])
+            macs = self.kws[name]
+            value = mac2int(getattr(pkt[0], name[4:]))
+            if mode == "list":
+                field = TemplateField(name, offset, 6, value, values=[mac2int(mac) for mac in macs])
+                self.fields.append(field)
+                continue
+            step = mac2int(self.kws.get("{}_step".format(name), "00:00:00:00:00:01"))
+            self.add_field(mode, name, offset, 6, value, mac2int(macs[0]), step, "{}_count".format(name))
+
+    def add_arp_fields(self, pkt):
+        if ARP not in pkt:
+            return
+        offset = self.offsets[ARP]
+        for prop, attr, field_offset, default in [("arp_src_hw", "hwsrc", 8, "00:00:01:00:00:02"),
+                                                  ("arp_dst_hw", "hwdst", 18, "00:00:00:00:00:00")]:
+            mode = self.get_mode("{}_mode".format(prop), ["increment", "decrement"])
+            step = mac2int(self.kws.get("{}_step".format(prop), "00:00:00:00:00:01"))
+            reset = mac2int(self.kws.get("{}_addr".format(prop), default).replace(".", ":"))
+            self.add_field(mode, prop, offset + field_offset, 6, mac2int(getattr(pkt[ARP], attr)),
+                           reset, step, "{}_count".format(prop))
+
+    def l4_checksum(self, pkt, layer_class):
+        # offset of the checksum of the layer above IP/IPv6 covering the pseudo header
+        layer = pkt[layer_class].payload
+        offset = self.offsets.get(layer.__class__)
+        if isinstance(layer, TCP):
+            return [(offset + 16, False)]
+        if isinstance(layer, UDP):
+            return [(offset + 6, True)]
+        if layer_class == IPv6 and isinstance(layer, _ICMPv6):
+            return [(offset + 2, False)]
+        return []
+
+    def add_ip_fields(self, pkt):
+        if IP in pkt:
+            offset = self.offsets[IP]
+            checksums = [(offset + 10, False)] + self.l4_checksum(pkt, IP)
+            for prop, attr, field_offset, default in [("ip_src", "src", 12, "0.0.0.0"),
+                                                      ("ip_dst", "dst", 16, "192.0.0.1")]:
+                mode = self.get_mode("{}_mode".format(prop), ["increment", "decrement"])
+                step = ipv42int(self.kws.get("{}_step".format(prop), "0.0.0.1"))
+                reset = ipv42int(self.kws.get("{}_addr".format(prop), default))
+                self.add_field(mode, prop, offset + field_offset, 4, ipv42int(getattr(pkt[IP], attr)),
+                               reset, step, "{}_count".format(prop), checksums=checksums)
+        if IPv6 in pkt:
+            offset = self.offsets[IPv6]
+            checksums = self.l4_checksum(pkt, IPv6)
+            for prop, attr, field_offset, default in [("ipv6_src", "src", 8, "fe80:0:0:0:0:0:0:12"),
+                                                      ("ipv6_dst", "dst", 24, "fe80:0:0:0:0:0:0:22")]:
+                mode = self.get_mode("{}_mode".format(prop), ["increment", "decrement"])
+                step = ipv62int(self.kws.get("{}_step".format(prop), "::1"))
+                reset = ipv62int(self.kws.get("{}_addr".format(prop), default))
+                self.add_field(mode, prop, offset + field_offset, 16, ipv62int(getattr(pkt[IPv6], attr)),
+                               reset, step, "{}_count".format(prop), checksums=checksums)
+
+    def add_vlan_field(self, pkt):
+        if Dot1Q not in pkt:
+            return
+        mode = self.get_mode("vlan_id_mode", ["increment", "decrement"])
+        step = self.utils.intval(self.kws, "vlan_id_step", 1)
+        reset = self.utils.intval(self.kws, "vlan_id", 0)
+        self.add_field(mode, "vlan_id", self.offsets[Dot1Q], 2, pkt[Dot1Q].vlan, reset, step,
+                       "vlan_id_count", mask=0x0FFF)
+
+    def add_l4_fields(self, pkt, layer_class, prefix):
+        if layer_class not in pkt:
+            return
+        offset = self.offsets[layer_class]
+        checksum = [(offset + (16 if layer_class == TCP else 6), layer_class == UDP)]
+        modes = incr_modes + decr_modes
+        src_mode = self.get_mode("{}_src_port_mode".format(prefix), modes)
+        dst_mode = self.get_mode("{}_dst_port_mode".format(prefix), modes)
+        src = self.add_field(src_mode, "{}_src_port".format(prefix), offset, 2, pkt[layer_class].sport,
+                             self.utils.intval(self.kws, "{}_src_port".format(prefix), 0),
+                             self.utils.intval(self.kws, "{}_src_port_step".format(prefix), 1),
+                             "{}_src_port_count".format(prefix), checksums=checksum)
+        # same as build_next_dma, the destination port is stepped from the source port
+        base = src or TemplateField("{}_src_port".format(prefix), offset, 2, pkt[layer_class].sport)
+        self.add_field(dst_mode, "{}_dst_port".format(prefix), offset + 2, 2, pkt[layer_class].dport,
+                       self.utils.intval(self.kws, "{}_dst_port".format(prefix), 0),
+                       self.utils.intval(self.kws, "{}_dst_port_step".format(prefix), 1),
+                       "{}_dst_port_count".format(prefix), base=base, checksums=checksum)
+
+    def pack(self, field):
+        if field.size == 2 and field.mask != 0xFFFF:
+            old = struct.unpack_from("!H", self.buf, field.offset)[0]
+            return field.encode((old & ~field.mask & 0xFFFF) | (field.value & field.mask))
+        return field.encode(field.value & field.mask)
+
+    def update_checksum(self, offset, is_udp, old_words, new_words):
+        csum = struct.unpack_from("!H", self.buf, offset)[0]
+        if is_udp and csum == 0:
+            # UDP without checksum
+            return
+        total = ~csum & 0xFFFF or 0xFFFF
+        total = csum_fold(total + 0xFFFF - csum_fold(old_words) + new_words)
+        csum = ~total & 0xFFFF
+        if is_udp and csum == 0:
+            csum = 0xFFFF
+        struct.pack_into("!H", self.buf, offset, csum)
+
+    def next(self):
+        for field in self.fields:
+            old = self.buf[field.offset:field.offset + field.size]
+            field.next()
+            new = self.pack(field)
+            if new == old:
+                continue
+            self.buf[field.offset:field.offset + field.size] = new
+            if field.checksums:
+                old_words = csum_words(int(binascii.hexlify(old), 16), field.size)
+                new_words = csum_words(int(binascii.hexlify(new), 16), field.size)
+                for offset, is_udp in field.checksums:
+                    self.update_checksum(offset, is_udp, old_words, new_words)
+
+    def build(self, pad_len=0, sid=None):
+        strpkt = self.buf + bytearray(pad_len) if pad_len > 0 else bytearray(self.buf)
+
+        # insert stream id before CRC
+        if sid:
+            strpkt[-len(sid):] = sid
+
+        crc = struct.pack("!I", socket.htonl(zlib.crc32(strpkt) & 0xFFFFFFFF))
+        return bytes(strpkt + crc)
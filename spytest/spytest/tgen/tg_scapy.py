@@ -206,6 +206,8 @@ class ScapyClient(object):
                       "SPYTEST_SCAPY_DOT1X_IMPL", os.getenv("SPYTEST_SCAPY_DOT1X_IMPL", "1"))
         self._execute(func_name, self.conn.server_control, "set-env",
                       "SPYTEST_SCAPY_USE_BRIDGE", os.getenv("SPYTEST_SCAPY_USE_BRIDGE", "1"))
+        self._execute(func_name, self.conn.server_control, "set-env",
+                      "SPYTEST_SCAPY_MMAP_PORTS", os.getenv("SPYTEST_SCAPY_MMAP_PORTS", ""))
         res = self.tg_connect(port_list=self.tg_port_list)
         self._set_port_handle(None, None)
         for port in self.tg_port_list:
@@ -4,14 +4,14 @@ import inspect
 import logging
 import os
 import pickle
-import random
+import re
 import shutil
 import sys
 import time
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from pickle import UnpicklingError
-from threading import Lock
+from threading import Lock, RLock
 from six import with_metaclass
 
 
@@ -23,6 +23,7 @@ CACHE_LOCATION = os.path.join(CURRENT_PATH, '../../../_cache')
 SIZE_LIMIT = 1000000000  # 1G bytes, max disk usage allowed by cache
 ENTRY_LIMIT = 1000000    # Max number of pickle files allowed in cache.
 DISABLE_CACHE_PARAM = "disable_cache"
+FINGERPRINT_KEY = "cache_fingerprint"
 
 
 class Singleton(type):
@@ -53,69 +54,128 @@ class FactsCache(with_metaclass(Singleton, object)):
         self._cache_location = os.path.abspath(cache_location)
         self._cache = defaultdict(dict)
         self._write_lock = Lock()
+        # Time when the facts in memory were cached {(zone, key): timestamp}, used for checking TTL
+        self._timestamps = {}
+        # Index of cache files {(zone, key): file size} in least recently used first order,
+        # loaded on first write and updated on read, write and cleanup
+        self._usage = None
+        self._usage_size = 0
+        # Functions getting fingerprints of zones {zone: function}, called on first use of cached facts of the zone
+        self._fingerprint_getters = {}
+        self._fingerprint_checking = set()
+        self._fingerprint_lock = RLock()
+
+    def _load_usage(self):
+        """Build the cache usage index with a single scan of the cache folder.
+        Files modified earlier are considered less recently used.
+        """
+        self._usage = OrderedDict()
+        self._usage_size = 0
+        if not os.path.isdir(self._cache_location):
+            return
+        entries = []
+        for zone in os.listdir(self._cache_location):
+            cache_subfolder = os.path.join(self._cache_location, zone)
+            if not os.path.isdir(cache_subfolder):
+                continue
+            for f in os.listdir(cache_subfolder):
+                if f.endswith('.pickle'):
+                    stat = os.stat(os.path.join(cache_subfolder, f))
+                    entries.append((stat.st_mtime, zone, f[:-len('.pickle')], stat.st_size))
+        for _, zone, key, size in sorted(entries):
+            self._update_usage(zone, key, size)
+
+    def _update_usage(self, zone, key, size):
+        self._usage_size += size - self._usage.get((zone, key), 0)
+        self._usage[(zone, key)] = size
+        self._usage.move_to_end((zone, key))
+
+    def _touch_usage(self, zone, key):
+        if self._usage is not None and (zone, key) in self._usage:
+            self._usage.move_to_end((zone, key))
+
+    def _remove_usage(self, zone=None, key=None):
+        if self._usage is None:
+            return
+        for (z, k) in list(self._usage):
+            if (zone is None or z == zone) and (key is None or k == key):
+                self._usage_size -= self._usage.pop((z, k))
+
+    def _check_usage(self, zone, key):
+        """Check cache usage, evict least recently used facts while usage exceeds the limitations.
 
-    def _check_usage(self):
-        """Check cache usage, raise exception if usage exceeds the limitations.
+        Args:
+            zone (str): Zone of the facts about to be written, they are not evicted.
+            key (str): Name of the facts about to be written, they are not evicted.
         """
-        total_size = 0
-        total_entries = 0
-        for root, _, files in os.walk(self._cache_location):
-            for f in files:
-                fp = os.path.join(root, f)
-                total_size += os.path.getsize(fp)
-                total_entries += 1
-
-        if total_size > SIZE_LIMIT or total_entries > ENTRY_LIMIT:
-            msg = 'Cache usage exceeds limitations. total_size={}, SIZE_LIMIT={}, total_entries={}, ENTRY_LIMIT={}' \
-                .format(total_size, SIZE_LIMIT, total_entries, ENTRY_LIMIT)
-            raise Exception(msg)
+        if self._usage is None:
+            self._load_usage()
+
+        def _exceeds_limitations():
+            total_entries = len(self._usage) + (0 if (zone, key) in self._usage else 1)
+            return self._usage_size > SIZE_LIMIT or total_entries > ENTRY_LIMIT
+
+        while _exceeds_limitations():
+            lru_entry = next((entry for entry in self._usage if entry != (zone, key)), None)
+            if lru_entry is None:
+                break
+            logger.info('[Cache] Cache usage exceeds limitations. total_size={}, SIZE_LIMIT={}, total_entries={}, '
+                        'ENTRY_LIMIT={}, evict least recently used "{}.{}"'
+                        .format(self._usage_size, SIZE_LIMIT, len(self._usage), ENTRY_LIMIT, *lru_entry))
+            self.cleanup(*lru_entry)
 
     def _read_facts_file(self, facts_file, z, k):
         with open(facts_file, 'rb') as f:
             self._cache[z][k] = pickle.load(f)
+            self._timestamps[(z, k)] = os.fstat(f.fileno()).st_mtime
             logger.debug('[Cache] Loaded cached facts "{}.{}" from {}'.format(z, k, facts_file))
             return self._cache[z][k]
 
-    def read(self, zone, key):
+    def _is_expired(self, zone, key, ttl):
+        if ttl is None:
+            return False
+        age = time.time() - self._timestamps.get((zone, key), 0)
+        if age > ttl:
+            logger.info('[Cache] Cached facts "{}.{}" expired, age {:.0f}s exceeds TTL {}s'.format(zone, key, age, ttl))
+            return True
+        return False
+
+    def read(self, zone, key, ttl=None):
         """Read cached facts.
 
         Args:
             zone (str): Cached facts are organized by zones. This argument is to specify the zone name.
                 The zone name could be hostname.
             key (str): Name of cached facts.
+            ttl (int): Time to live of cached facts in seconds. Facts cached earlier are considered not existing.
+                Default is None, cached facts never expire.
 
         Returns:
             obj: Cached object, usually a dictionary.
         """
+        self._check_pending_fingerprint(zone)
         # Lazy load
         if zone in self._cache and key in self._cache[zone]:
+            if self._is_expired(zone, key, ttl):
+                return self.NOTEXIST
             logger.debug('[Cache] Read cached facts "{}.{}"'.format(zone, key))
+            self._touch_usage(zone, key)
             return self._cache[zone][key]
         else:
             facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
             try:
-                return self._read_facts_file(facts_file, zone, key)
+                facts = self._read_facts_file(facts_file, zone, key)
+                if self._is_expired(zone, key, ttl):
+                    return self.NOTEXIST
+                self._touch_usage(zone, key)
+                return facts
             except (IOError, ValueError) as e:
                 logger.info('[Cache] Load cache file "{}" failed with IOError or ValueError: {}'
                             .format(os.path.abspath(facts_file), repr(e)))
                 return self.NOTEXIST
             except (EOFError, UnpicklingError) as e:
-                # When parallel run is enabled, multiple processes may try to read/write the same cache file,
-                # so there will be a chance that
-                #   - a file is being written by process1 while process2 is reading it, causing EOFError in process2
-                #   - a file is being read by multiple processes at the same time, causing UnpicklingError in some of
-                #     the processes
-                # In these cases, we will retry to read the file after a short random sleep. If we still get the same
-                # error after retrying, we will return NOTEXIST to overwrite the file.
-                retry_attempts = 3
-                for attempt in range(retry_attempts):
-                    time.sleep(random.randint(3, 6))
-                    try:
-                        return self._read_facts_file(facts_file, zone, key)
-                    except (EOFError, UnpicklingError):
-                        logger.warning('[Cache] Retry {}/{} failed for file "{}"'
-                                       .format(attempt + 1, retry_attempts, facts_file))
-
+                # Cache files are replaced atomically by write, so readers never see partially written files even
+                # when parallel processes use the same cache. A broken file is returned as NOTEXIST to overwrite it.
                 logger.error('[Cache] Load cache file "{}" failed with EOFError or UnpicklingError: {}'
                              .format(facts_file, repr(e)))
                 return self.NOTEXIST
@@ -136,24 +196,90 @@ class FactsCache(with_metaclass(Singleton, object)):
         Returns:
             boolean: Caching facts is successful or not.
         """
+        self._check_pending_fingerprint(zone)
         with self._write_lock:
-            self._check_usage()
+            self._check_usage(zone, key)
             facts_file = os.path.join(self._cache_location, '{}/{}.pickle'.format(zone, key))
+            # Dump to a temporary file and rename it, so that readers in parallel processes never see a partially
+            # written file. The write lock serializes writers of this process, pid separates processes.
+            tmp_file = '{}.{}.tmp'.format(facts_file, os.getpid())
             try:
                 cache_subfolder = os.path.join(self._cache_location, zone)
                 if not os.path.exists(cache_subfolder):
                     logger.info('[Cache] Create cache dir {}'.format(cache_subfolder))
-                    os.makedirs(cache_subfolder)
+                    os.makedirs(cache_subfolder, exist_ok=True)
 
-                with open(facts_file, 'wb') as f:
+                with open(tmp_file, 'wb') as f:
                     pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
-                    self._cache[zone][key] = value
-                    logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
-                    return True
+                    size = f.tell()
+                os.replace(tmp_file, facts_file)
+                self._cache[zone][key] = value
+                self._timestamps[(zone, key)] = time.time()
+                self._update_usage(zone, key, size)
+                logger.info('[Cache] Cached facts "{}.{}" to {}'.format(zone, key, facts_file))
+                return True
             except (IOError, ValueError) as e:
                 logger.error('[Cache] Dump cache file "{}" failed with exception: {}'.format(facts_file, repr(e)))
+                if os.path.exists(tmp_file):
+                    os.remove(tmp_file)
                 return False
 
+    def check_fingerprint(self, zone, fingerprint):
+        """Invalidate cached facts of a zone if they were gathered from a different state of the device.
+
+        The fingerprint is any string identifying the state the facts depend on, like the image version and
+        checksum of config files. When it is different from the fingerprint stored with the cached facts, the facts of
+        the zone and its per ASIC zones ("<zone>-asic<N>") are cleaned up.
+
+        Args:
+            zone (str): Zone name, usually hostname.
+            fingerprint (str): Fingerprint of current state.
+
+        Returns:
+            boolean: True if cached facts are still valid, False if they were cleaned up.
+        """
+        cached_fingerprint = self.read(zone, FINGERPRINT_KEY)
+        if cached_fingerprint == fingerprint:
+            return True
+        if cached_fingerprint is not self.NOTEXIST:
+            logger.info('[Cache] Fingerprint of "{}" changed, cleanup its cached facts'.format(zone))
+        zones = [zone]
+        if os.path.isdir(self._cache_location):
+            zones.extend(z for z in os.listdir(self._cache_location) if z.startswith('{}-asic'.format(zone)))
+        for z in zones:
+            self.cleanup(z)
+        self.write(zone, FINGERPRINT_KEY, fingerprint)
+        return False
+
+    def set_fingerprint_getter(self, zone, getter):
+        """Check fingerprint of a zone lazily, the first time cached facts of the zone are read or written.
+
+        Getting the fingerprint usually needs a command on the device, so it is skipped if no cached facts of the
+        zone are used, like when the facts are always gathered with caching disabled.
+
+        Args:
+            zone (str): Zone name, usually hostname. Its per ASIC zones ("<zone>-asic<N>") are covered too.
+            getter (function): Function without arguments returning fingerprint of current state, see check_fingerprint.
+        """
+        with self._fingerprint_lock:
+            self._fingerprint_getters[zone] = getter
+
+    def _check_pending_fingerprint(self, zone):
+        host_zone = re.sub(r'-asic\d+$', '', str(zone))
+        if host_zone not in self._fingerprint_getters:
+            return
+        # Readers of the zone in other threads wait until the fingerprint is checked
+        with self._fingerprint_lock:
+            getter = self._fingerprint_getters.get(host_zone)
+            if getter is None or host_zone in self._fingerprint_checking:
+                return
+            self._fingerprint_checking.add(host_zone)
+            try:
+                self.check_fingerprint(host_zone, getter())
+            finally:
+                self._fingerprint_checking.discard(host_zone)
+                self._fingerprint_getters.pop(host_zone, None)
+
     def cleanup(self, zone=None, key=None):
         """Cleanup cached files.
 
@@ -168,6 +294,8 @@ class FactsCache(with_metaclass(Singleton, object)):
                 if zone in self._cache and key in self._cache[zone]:
                     del self._cache[zone][key]
                     logger.debug('[Cache] Removed "{}.{}" from cache.'.format(zone, key))
+                self._timestamps.pop((zone, key), None)
+                self._remove_usage(zone, key)
                 try:
                     cache_file = os.path.join(self._cache_location, zone, '{}.pickle'.format(key))
                     os.remove(cache_file)
@@ -179,6 +307,10 @@ class FactsCache(with_metaclass(Singleton, object)):
                 if zone in self._cache:
                     del self._cache[zone]
                     logger.debug('[Cache] Removed zone "{}" from cache'.format(zone))
+                for (z, k) in list(self._timestamps):
+                    if z == zone:
+                        del self._timestamps[(z, k)]
+                self._remove_usage(zone)
                 try:
                     cache_subfolder = os.path.join(self._cache_location, zone)
                     shutil.rmtree(cache_subfolder)
@@ -187,6 +319,8 @@ class FactsCache(with_metaclass(Singleton, object)):
                     logger.error('[Cache] Remove cache subfolder "{}" failed with exception: {}'.format(zone, repr(e)))
         else:
             self._cache = defaultdict(dict)
+            self._timestamps = {}
+            self._remove_usage()
             try:
                 shutil.rmtree(self._cache_location)
                 logger.debug('[Cache] Removed all cache files under "{}"'.format(self._cache_location))
@@ -241,7 +375,7 @@ def _get_disable_cache(target, args, kwargs):
     return bound_args.arguments.get(DISABLE_CACHE_PARAM, False)
 
 
-def cached(name, zone_getter=None, after_read=None, before_write=None):
+def cached(name, zone_getter=None, after_read=None, before_write=None, ttl=None):
     """Decorator for enabling cache for facts.
 
     The cached facts are to be stored by <name>.pickle. Because the cached pickle files must be stored under subfolder
@@ -258,6 +392,7 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
         zone_getter ([function]): Function used to get hostname used as zone.
         after_read ([function]): Hook function used to process facts after read from cache.
         before_write ([function]): Hook function used to process facts before write into cache.
+        ttl ([int]): Time to live of the cached facts in seconds. Expired facts are gathered again.
     Returns:
         [function]: Decorator function.
     """
@@ -274,7 +409,7 @@ def cached(name, zone_getter=None, after_read=None, before_write=None):
             _zone_getter = zone_getter or _get_default_zone
             zone = _zone_getter(target, args, kargs)
 
-            cached_facts = cache.read(zone, name)
+            cached_facts = cache.read(zone, name, ttl=ttl)
             if after_read:
                 cached_facts = after_read(cached_facts, target, args, kargs)
             if cached_facts is not FactsCache.NOTEXIST:
@@ -1,6 +1,7 @@
 import inspect
 import json
 import logging
+import time
 
 from multiprocessing.pool import ThreadPool
 
@@ -50,6 +51,31 @@ class AnsibleHostBase(object):
                 self.mgmt_ipv6 = None
         self.hostname = hostname
 
+    def _record_latency(self, transport, module_name, elapsed):
+        """
+        @summary: Record latency of a module call, for comparing the cost of different transports.
+        """
+        latency = self.__dict__.setdefault('_call_latency', {})
+        stats = latency.setdefault(transport, {}).setdefault(
+            module_name, {'count': 0, 'total': 0.0, 'max': 0.0})
+        stats['count'] += 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+
+    def get_call_latency(self):
+        """
+        @summary: Get latency counters of module calls on this host.
+
+        @return: Dict like {transport: {module_name: {'count': int, 'total': float, 'max': float, 'avg': float}}}.
+            Transport is 'ansible' for modules run by ansible.
+        """
+        latency = {}
+        for transport, modules in self.__dict__.get('_call_latency', {}).items():
+            latency[transport] = {}
+            for module_name, stats in modules.items():
+                latency[transport][module_name] = dict(stats, avg=stats['total'] / stats['count'])
+        return latency
+
     def __getattr__(self, module_name):
         if self.host.has_module(module_name):
             self.module_name = module_name
@@ -102,7 +128,9 @@ class AnsibleHostBase(object):
 
         module_args = json.loads(json.dumps(module_args, cls=AnsibleHostBase.CustomEncoder))
         complex_args = json.loads(json.dumps(complex_args, cls=AnsibleHostBase.CustomEncoder))
+        start_time = time.time()
         res = self.module(*module_args, **complex_args)[self.hostname]
+        self._record_latency('ansible', self.module_name, time.time() - start_time)
 
         if verbose:
             logger.debug(
@@ -0,0 +1,108 @@
+import copy
+import json
+import logging
+import re
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Idempotent read-only commands whose output can be reused until the next call which may change the host. Commands
+# with output changing over time, like counters or clock, are not in the list and are never cached.
+CACHEABLE_COMMANDS = (
+    'show interface status',
+    'show interfaces status',
+    'show feature status',
+    'show features',
+    'crm show resources all',
+)
+CACHEABLE_COMMAND_PATTERN = re.compile(
+    r'^\s*(sudo\s+)?(ip\s+netns\s+exec\s+\S+\s+)?(' +
+    '|'.join(r'\s+'.join(re.escape(word) for word in cmd.split()) for cmd in CACHEABLE_COMMANDS) +
+    r')(\s+(-n|--namespace|-d|--display)\s+\S+)*\s*$')
+# Modules not changing the state of the host
+READ_ONLY_MODULES = ('config_facts', 'minigraph_facts', 'stat', 'slurp', 'fetch', 'find', 'setup', 'ping')
+CACHEABLE_COMMAND_MODULES = ('shell', 'command')
+
+_response_caches = weakref.WeakSet()
+
+
+class ResponseCache(object):
+    """
+    @summary: Read-through cache of responses of read-only module calls on a host.
+
+    Results of the idempotent read-only commands in CACHEABLE_COMMANDS run by 'shell' or 'command', and results of
+    'config_facts' from running config are cached, keyed by module name and arguments (which include the namespace).
+    Any other 'shell' or 'command' call, and any module not in READ_ONLY_MODULES, invalidates the cache.
+    """
+
+    def __init__(self, hostname):
+        self.hostname = hostname
+        self._responses = {}
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+        _response_caches.add(self)
+
+    @staticmethod
+    def _is_cacheable(module_name, module_args, complex_args):
+        if module_name in CACHEABLE_COMMAND_MODULES:
+            if len(module_args) != 1 or not isinstance(module_args[0], str):
+                return False
+            return bool(CACHEABLE_COMMAND_PATTERN.match(module_args[0]))
+        if module_name == 'config_facts':
+            return complex_args.get('source') == 'running'
+        return False
+
+    @staticmethod
+    def _is_write(module_name):
+        # Any command not in the allowlist may change the host, like 'portstat -c' or 'docker exec swss ...'
+        return module_name in CACHEABLE_COMMAND_MODULES or module_name not in READ_ONLY_MODULES
+
+    def invalidate(self):
+        if self._responses:
+            self.stats['invalidations'] += 1
+            self._responses.clear()
+
+    def call(self, module_name, run, *module_args, **complex_args):
+        """
+        @summary: Call module through the cache.
+
+        @param module_name: Name of the module.
+        @param run: Function running the module.
+        """
+        key_args = dict((k, v) for k, v in complex_args.items() if k not in ('verbose', 'module_ignore_errors'))
+        if not self._is_cacheable(module_name, module_args, key_args):
+            if self._is_write(module_name):
+                self.invalidate()
+            return run(*module_args, **complex_args)
+
+        key = (module_name, json.dumps(module_args, sort_keys=True, default=str),
+               json.dumps(key_args, sort_keys=True, default=str))
+        if key in self._responses:
+            self.stats['hits'] += 1
+            logger.debug('[{}] Use cached response of {} {}'.format(self.hostname, module_name, module_args))
+            return copy.deepcopy(self._responses[key])
+
+        self.stats['misses'] += 1
+        res = run(*module_args, **complex_args)
+        if not (res.get('failed', False) or res.get('rc', 0) != 0):
+            self._responses[key] = copy.deepcopy(res)
+        return res
+
+    def reset(self):
+        """
+        @summary: Clear cached responses and stats.
+        """
+        self._responses.clear()
+        self.stats = dict.fromkeys(self.stats, 0)
+
+
+def reset_response_caches(section):
+    """
+    @summary: Log stats of all the response caches and reset them.
+
+    @param section: Description of the test section finished, like '<nodeid> setup'.
+    """
+    for cache in list(_response_caches):
+        if any(cache.stats.values()):
+            logger.info('Response cache of {} in {}: hits={hits}, misses={misses}, invalidations={invalidations}'
+                        .format(cache.hostname, section, **cache.stats))
+        cache.reset()
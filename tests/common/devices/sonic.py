@@ -13,15 +13,20 @@ from datetime import datetime, timedelta
 
 from ansible import constants as ansible_constants
 from ansible.plugins.loader import connection_loader
+from pytest_ansible.results import ModuleResult
 
 from tests.common.devices.base import AnsibleHostBase
 from tests.common.devices.constants import ACL_COUNTERS_UPDATE_INTERVAL_IN_SEC
+from tests.common.devices.response_cache import ResponseCache
+from tests.common.devices.ssh_shell import SshShell, SshShellConnectionError, get_ssh_credentials
 from tests.common.helpers.dut_utils import is_supervisor_node, is_macsec_capable_node
 from tests.common.str_utils import str2bool
-from tests.common.utilities import get_host_visible_vars
-from tests.common.cache import cached
+from tests.common.utilities import get_host_visible_vars, get_inv_files_mtime
+from tests.common.cache import cached, FactsCache
 from tests.common.helpers.constants import DEFAULT_ASIC_ID, DEFAULT_NAMESPACE
 from tests.common.helpers.platform_api.chassis import is_inband_port
+from tests.common.helpers.show_parser import parse_column_positions, parse_show_table, parse_show_json, \
+    get_json_show_command
 from tests.common.helpers.parallel import parallel_run_threaded
 from tests.common.errors import RunAnsibleModuleFail
 from tests.common import constants
@@ -84,6 +89,7 @@ class SonicHost(AnsibleHostBase):
             }
             self.host.options['variable_manager'].extra_vars.update(evars)
 
+        FactsCache().set_fingerprint_getter(self.hostname, self._get_facts_fingerprint)
         self._facts = self._gather_facts()
         self._os_version = self._get_os_version()
 
@@ -103,6 +109,109 @@ class SonicHost(AnsibleHostBase):
         self.is_multi_asic = True if self.facts["num_asic"] > 1 else False
         self._kernel_version = self._get_kernel_version()
 
+    def _get_facts_fingerprint(self):
+        """
+        Get fingerprint of the DUT state that cached facts depend on: image version, checksum of config_db files and
+        modification time of inventory files. Cached facts of the DUT are invalidated when it changes.
+        """
+        res = self.shell("sonic-cfggen -y /etc/sonic/sonic_version.yml -v build_version; "
+                         "md5sum /etc/sonic/config_db*.json", module_ignore_errors=True)
+        inv_files = getattr(self.host.options['inventory_manager'], '_sources', [])
+        return json.dumps({"dut": res.get("stdout_lines", []), "inv_files_mtime": get_inv_files_mtime(inv_files)})
+
+    def enable_ssh_fast_path(self, username=None, passwords=None, timeout=None):
+        """
+        Run 'shell' and 'command' modules over a persistent ssh connection instead of ansible.
+
+        Calls with arguments not supported by the fast path, or failed to connect over ssh, are still run by ansible.
+        Results are in the same format as the ansible modules. Latency of both paths is recorded, see
+        get_call_latency.
+
+        Args:
+            username (str): ssh username, default is the ansible ssh user of the host.
+            passwords (list): Candidate ssh passwords, default is the ansible passwords of the host.
+            timeout (int): Seconds to wait for a command on the fast path, a command not done in time fails. Default
+                is waiting until the command is done, like ansible.
+        """
+        if username is None or passwords is None:
+            default_username, default_passwords = get_ssh_credentials(self)
+            username = username or default_username
+            passwords = passwords or default_passwords
+        self.disable_ssh_fast_path()
+        self._ssh_shell = SshShell(self.hostname, self.mgmt_ip, username, passwords, timeout=timeout)
+
+    def disable_ssh_fast_path(self):
+        """
+        Run 'shell' and 'command' modules by ansible and close the ssh connection of the fast path.
+        """
+        ssh_shell = self.__dict__.pop('_ssh_shell', None)
+        if ssh_shell:
+            ssh_shell.close()
+
+    def enable_response_cache(self):
+        """
+        Cache results of idempotent show commands, like 'show interfaces status' of get_interfaces_status, and running
+        config facts until a call which may change the DUT.
+
+        Results are keyed by module and arguments, so calls in different namespaces are cached separately. Any other
+        'shell' or 'command' call, like 'config ...', 'shutdown' or 'config_reload', invalidates the cache. See
+        ResponseCache for details.
+        """
+        if not self.__dict__.get('_response_cache'):
+            self._response_cache = ResponseCache(self.hostname)
+
+    def disable_response_cache(self):
+        """
+        Disable the response cache of the DUT.
+        """
+        self.__dict__.pop('_response_cache', None)
+
+    def __getattr__(self, module_name):
+        ssh_shell = self.__dict__.get('_ssh_shell')
+        if ssh_shell and module_name in ('shell', 'command'):
+            def _run_module(*module_args, **complex_args):
+                return self._run_over_ssh(ssh_shell, module_name, *module_args, **complex_args)
+        else:
+            _run_module = super(SonicHost, self).__getattr__(module_name)
+
+        response_cache = self.__dict__.get('_response_cache')
+        if response_cache:
+            def _run_cached(*module_args, **complex_args):
+                return response_cache.call(module_name, _run_module, *module_args, **complex_args)
+            return _run_cached
+        return _run_module
+
+    def _run_over_ssh(self, ssh_shell, module_name, *module_args, **complex_args):
+        """
+        Run 'shell' or 'command' on the ssh fast path, fall back to ansible for unsupported arguments or ssh
+        connection failure.
+        """
+        verbose = complex_args.pop('verbose', True)
+        module_ignore_errors = complex_args.pop('module_ignore_errors', False)
+        if not SshShell.supports(module_args, complex_args):
+            return super(SonicHost, self).__getattr__(module_name)(
+                *module_args, verbose=verbose, module_ignore_errors=module_ignore_errors, **complex_args)
+
+        start_time = time.time()
+        try:
+            result = ssh_shell.run(module_name, module_args[0], **complex_args)
+        except SshShellConnectionError as e:
+            logger.warning("{}, run by ansible instead".format(e))
+            return super(SonicHost, self).__getattr__(module_name)(
+                *module_args, verbose=verbose, module_ignore_errors=module_ignore_errors, **complex_args)
+        self._record_latency('ssh', module_name, time.time() - start_time)
+        res = ModuleResult(**result)
+
+        if verbose:
+            logger.debug("[{}] SshShell::{}, args={} Result => {}".format(
+                self.hostname, module_name, module_args[0], json.dumps(result)))
+        else:
+            logger.debug("[{}] SshShell::{} done, rc={}".format(self.hostname, module_name, result['rc']))
+
+        if res.is_failed and not module_ignore_errors:
+            raise RunAnsibleModuleFail("run module {} failed".format(module_name), res)
+        return res
+
     def __str__(self):
         return '<SonicHost {}>'.format(self.hostname)
 
@@ -1638,71 +1747,11 @@ Totals               6450                 6449
         return feature_status, True
 
     def _parse_column_positions(self, sep_line, sep_char='-'):
-        """Parse the position of each columns in the command output
-
-        Args:
-            sep_line: The output line separating actual data and column headers
-            sep_char: The character used in separation line. Defaults to '-'.
-
-        Returns:
-            Returns a list. Each item is a tuple with two elements. The first element is start position of a column.
-            The second element is the end position of the column.
-        """
-        prev = ' ',
-        positions = []
-        for pos, char in enumerate(sep_line + ' '):
-            if char == sep_char:
-                if char != prev:
-                    left = pos
-            else:
-                if char != prev:
-                    right = pos
-                    positions.append((left, right))
-            prev = char
-        return positions
+        """Parse the position of each columns in the command output, see show_parser.parse_column_positions."""
+        return parse_column_positions(sep_line, sep_char)
 
     def _parse_show(self, output_lines, header_len=1):
-
-        result = []
-
-        sep_line_pattern = re.compile(r"^( *-+ *)+$")
-        sep_line_found = False
-        for idx, line in enumerate(output_lines):
-            if sep_line_pattern.match(line):
-                sep_line_found = True
-                header_lines = output_lines[idx - header_len:idx]
-                sep_line = output_lines[idx]
-                content_lines = output_lines[idx + 1:]
-                break
-
-        if not sep_line_found:
-            logging.error('Failed to find separation line in the show command output')
-            return result
-
-        try:
-            positions = self._parse_column_positions(sep_line)
-        except Exception as e:
-            logging.error('Possibly bad command output, exception: {}'.format(repr(e)))
-            return result
-
-        headers = []
-        for (left, right) in positions:
-            header = " ".join([header_line[left:right].strip().lower() for header_line in header_lines]).strip()
-            headers.append(header)
-
-        for content_line in content_lines:
-            # When an empty line is encountered while parsing the tabulate content, it is highly possible that the
-            # tabulate content has been drained. The empty line and rest of the lines should not be parsed.
-            if len(content_line) == 0:
-                break
-            item = {}
-            for idx, (left, right) in enumerate(positions):
-                k = headers[idx]
-                v = content_line[left:right].strip()
-                item[k] = v
-            result.append(item)
-
-        return result
+        return parse_show_table(output_lines, header_len).to_list()
 
     def show_and_parse(self, show_cmd, header_len=1, **kwargs):
         """Run a show command and parse the output using a generic pattern.
@@ -1783,6 +1832,43 @@ Totals               6450                 6449
             output = output[start_line_index:end_line_index]
         return self._parse_show(output, header_len)
 
+    def show_and_parse_table(self, show_cmd, header_len=1, use_json=True, **kwargs):
+        """Run a show command and parse the output to a columnar ShowTable.
+
+        Parsing is the same as show_and_parse, but the columnar table is cheaper for large outputs like
+        'show interfaces counters' on linecards with hundreds of ports. Rows can be looked up by a key column without
+        building dicts of all the rows, for example:
+
+            counters = duthost.show_and_parse_table("show interfaces counters")
+            rx_ok = counters.get("Ethernet0", "iface")["rx_ok"]
+            up_ports = counters.filter(state="U")
+
+        If the command supports JSON output with the same columns, see show_parser.JSON_SHOW_COMMANDS, the JSON output
+        is parsed instead. It falls back to the tabular output if the JSON output can't be parsed.
+
+        Args:
+            show_cmd: The show command that will be executed.
+            header_len: Number of lines of the column headers.
+            use_json: Use JSON output of the command if supported. Defaults to True.
+
+        Returns:
+            ShowTable. It can be used as the list of dicts returned by show_and_parse.
+        """
+        start_line_index = kwargs.pop("start_line_index", 0)
+        end_line_index = kwargs.pop("end_line_index", None)
+        json_cmd, key_column = get_json_show_command(show_cmd) if use_json else (None, None)
+        if json_cmd and start_line_index == 0 and end_line_index is None:
+            res = self.shell(json_cmd, **dict(kwargs, module_ignore_errors=True))
+            if not res.is_failed:
+                try:
+                    return parse_show_json(res["stdout"], key_column)
+                except ValueError as e:
+                    logger.debug("Failed to parse JSON output of '{}': {}".format(json_cmd, repr(e)))
+            logger.info("Fall back to parse tabular output of '{}'".format(show_cmd))
+
+        output = self.shell(show_cmd, **kwargs)["stdout_lines"]
+        return parse_show_table(output[start_line_index:end_line_index], header_len)
+
     @cached(name='mg_facts')
     def get_extended_minigraph_facts(self, tbinfo, namespace=DEFAULT_NAMESPACE):
         mg_facts = self.minigraph_facts(host=self.hostname, namespace=namespace)['ansible_facts']
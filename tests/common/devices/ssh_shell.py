@@ -0,0 +1,162 @@
+import datetime
+import logging
+import shlex
+import threading
+import time
+
+import jinja2
+
+from tests.common.utilities import _paramiko_ssh
+
+logger = logging.getLogger(__name__)
+
+# Arguments of the shell/command modules supported by the ssh fast path, calls with other arguments like
+# 'executable', 'stdin' or 'module_async' are run as ansible modules.
+SUPPORTED_ARGS = ('chdir', )
+
+# Return code of a command not done in time, like the 'timeout' command
+TIMEOUT_RC = 124
+
+
+class SshShellConnectionError(Exception):
+    """
+    @summary: Failed to connect to the host or to open a channel for the command, the command is not run.
+    """
+    pass
+
+
+class SshShell(object):
+    """
+    @summary: Run shell/command on a host over a persistent ssh connection.
+
+    One paramiko connection is kept open and each command is run in a new channel of the connection, so running a
+    command doesn't need to connect and start the ansible module on the host. Commands are run as root by 'sudo -n'
+    to be consistent with ansible modules run with 'become'.
+    """
+
+    def __init__(self, hostname, ip_address, username, passwords, timeout=None):
+        self.hostname = hostname
+        self.ip_address = ip_address
+        self.username = username
+        self.passwords = passwords
+        # Seconds to wait for a command, None for waiting until the command is done like ansible
+        self.timeout = timeout
+        self._ssh = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def supports(module_args, complex_args):
+        """
+        @summary: Check if the shell/command call can be run on the ssh fast path.
+        """
+        return len(module_args) == 1 and isinstance(module_args[0], str) and \
+            all(arg in SUPPORTED_ARGS for arg in complex_args)
+
+    def _connect(self):
+        with self._lock:
+            transport = self._ssh.get_transport() if self._ssh else None
+            if transport is None or not transport.is_active():
+                if self._ssh:
+                    self._ssh.close()
+                logger.info("[{}] Open ssh connection for fast shell to {}".format(self.hostname, self.ip_address))
+                self._ssh, password = _paramiko_ssh(self.ip_address, self.username, self.passwords)
+                # Use the working password for reconnecting
+                self.passwords = [password]
+            return self._ssh
+
+    def _exec_command(self, remote_cmd):
+        try:
+            return self._connect().exec_command(remote_cmd)
+        except Exception as e:
+            raise SshShellConnectionError("[{}] Failed to run command over ssh to {}: {}".format(
+                self.hostname, self.ip_address, repr(e)))
+
+    def close(self):
+        with self._lock:
+            if self._ssh:
+                self._ssh.close()
+                self._ssh = None
+
+    def run(self, module_name, cmd, chdir=None):
+        """
+        @summary: Run command and return result in the same format as the ansible shell/command module.
+
+        A command not done in self.timeout seconds fails with rc TIMEOUT_RC. SshShellConnectionError is raised if the
+        command can't be run because of ssh connection failure.
+
+        @param module_name: 'shell' or 'command'. For 'command', the command is not interpreted by a shell.
+        @param cmd: Command string.
+        @param chdir: Change into this directory before running the command.
+        """
+        if module_name == 'shell':
+            remote_cmd = "sudo -n /bin/sh -c {}".format(shlex.quote(cmd))
+        else:
+            remote_cmd = "sudo -n {}".format(" ".join(shlex.quote(arg) for arg in shlex.split(cmd)))
+        if chdir:
+            remote_cmd = "cd {} && {}".format(shlex.quote(chdir), remote_cmd)
+
+        start = datetime.datetime.now()
+        _, stdout, stderr = self._exec_command(remote_cmd)
+        # stdout and stderr share the window of the channel, read them concurrently so that a command writing a lot
+        # to stderr doesn't hang while stdout is read until EOF
+        outputs = {}
+        readers = []
+        for name, stream in (('stdout', stdout), ('stderr', stderr)):
+            reader = threading.Thread(target=lambda name=name, stream=stream: outputs.update({name: stream.read()}))
+            reader.daemon = True
+            reader.start()
+            readers.append(reader)
+        deadline = time.time() + self.timeout if self.timeout is not None else None
+        for reader in readers:
+            reader.join(max(0, deadline - time.time()) if deadline is not None else None)
+        timed_out = any(reader.is_alive() for reader in readers)
+        if timed_out:
+            logger.warning("[{}] Command '{}' not done in {}s, close its channel".format(
+                self.hostname, cmd, self.timeout))
+            stdout.channel.close()
+            rc = TIMEOUT_RC
+            msg = 'command timed out after {}s'.format(self.timeout)
+        else:
+            rc = stdout.channel.recv_exit_status()
+            msg = 'non-zero return code' if rc != 0 else ''
+        end = datetime.datetime.now()
+
+        out = outputs.get('stdout', b'').decode('utf-8', errors='replace').rstrip('\r\n')
+        err = outputs.get('stderr', b'').decode('utf-8', errors='replace').rstrip('\r\n')
+        result = {
+            'changed': True,
+            'cmd': cmd,
+            'rc': rc,
+            'stdout': out,
+            'stderr': err,
+            'stdout_lines': out.splitlines(),
+            'stderr_lines': err.splitlines(),
+            'start': str(start),
+            'end': str(end),
+            'delta': str(end - start),
+            'msg': msg,
+            'failed': rc != 0,
+        }
+        return result
+
+
+def get_ssh_credentials(host):
+    """
+    @summary: Get ssh username and candidate passwords of a host from its ansible variables.
+
+    @param host: Object of AnsibleHostBase.
+    """
+    hostvars = host.host.options['variable_manager']._hostvars[host.hostname]
+
+    def _render(value):
+        if isinstance(value, str):
+            return jinja2.Template(value).render(**hostvars)
+        return value
+
+    username = _render(hostvars.get('ansible_ssh_user') or hostvars.get('ansible_user'))
+    passwords = []
+    for var in ('ansible_ssh_pass', 'ansible_password', 'ansible_altpassword'):
+        if hostvars.get(var):
+            passwords.append(_render(hostvars[var]))
+    passwords.extend(_render(password) for password in hostvars.get('ansible_altpasswords') or [])
+    return username, [password for password in passwords if password]
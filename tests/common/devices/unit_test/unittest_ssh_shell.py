@@ -0,0 +1,189 @@
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+from tests.common.devices.base import AnsibleHostBase
+from tests.common.devices.sonic import SonicHost
+from tests.common.devices.ssh_shell import SshShell, TIMEOUT_RC
+
+# Window of the fake channel shared by stdout and stderr, like the window of a paramiko channel
+WINDOW_SIZE = 64 * 1024
+CHUNK_SIZE = 4 * 1024
+
+
+class FakeChannel(object):
+    """Fake of paramiko channel running a command, which blocks when stdout and stderr not read fill the window."""
+
+    def __init__(self, stdout=b'', stderr=b'', rc=0, hang=False):
+        self.rc = rc
+        self.hang = hang
+        self.buffers = {'stdout': bytearray(), 'stderr': bytearray()}
+        self.done = False
+        self.closed = False
+        self.cond = threading.Condition()
+        thread = threading.Thread(target=self._run_command, args=(stdout, stderr))
+        thread.daemon = True
+        thread.start()
+
+    def _write(self, name, data):
+        for idx in range(0, len(data), CHUNK_SIZE):
+            chunk = data[idx:idx + CHUNK_SIZE]
+            with self.cond:
+                while not self.closed and sum(len(buf) for buf in self.buffers.values()) + len(chunk) > WINDOW_SIZE:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                self.buffers[name] += chunk
+                self.cond.notify_all()
+
+    def _run_command(self, stdout, stderr):
+        # Write stderr first, reading stdout until EOF before stderr deadlocks
+        self._write('stderr', stderr)
+        self._write('stdout', stdout)
+        with self.cond:
+            while self.hang and not self.closed:
+                self.cond.wait()
+            self.done = True
+            self.cond.notify_all()
+
+    def read(self, name):
+        data = bytearray()
+        with self.cond:
+            while True:
+                if self.buffers[name]:
+                    data += self.buffers[name]
+                    self.buffers[name].clear()
+                    self.cond.notify_all()
+                elif self.done or self.closed:
+                    return bytes(data)
+                else:
+                    self.cond.wait()
+
+    def recv_exit_status(self):
+        with self.cond:
+            while not self.done:
+                self.cond.wait()
+        return self.rc
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class FakeChannelFile(object):
+
+    def __init__(self, channel, name):
+        self.channel = channel
+        self.name = name
+
+    def read(self):
+        return self.channel.read(self.name)
+
+
+def mock_ssh_client(**channel_args):
+    """Mock of paramiko SSHClient, each command is run in a new FakeChannel."""
+    client = mock.MagicMock()
+    client.get_transport.return_value.is_active.return_value = True
+    client.channels = []
+
+    def _exec_command(remote_cmd):
+        channel = FakeChannel(**channel_args)
+        client.channels.append(channel)
+        return None, FakeChannelFile(channel, 'stdout'), FakeChannelFile(channel, 'stderr')
+
+    client.exec_command.side_effect = _exec_command
+    return client
+
+
+class TestSshShell(unittest.TestCase):
+    """Test cases for running commands over ssh with a mocked paramiko client."""
+
+    def run_shell(self, client, cmd, timeout=None, wait=10):
+        ssh_shell = SshShell('dut', '10.0.0.1', 'admin', ['password'], timeout=timeout)
+        results = []
+        with mock.patch('tests.common.devices.ssh_shell._paramiko_ssh', return_value=(client, 'password')):
+            thread = threading.Thread(target=lambda: results.append(ssh_shell.run('shell', cmd)))
+            thread.daemon = True
+            thread.start()
+            thread.join(wait)
+        self.assertFalse(thread.is_alive(), 'Command is not done in {}s'.format(wait))
+        return results[0]
+
+    # Test case: Large stdout and stderr written together are read without deadlock
+    def test_large_stdout_and_stderr(self):
+        stdout = b''.join(b'out line %d\n' % idx for idx in range(100000))
+        stderr = b''.join(b'err line %d\n' % idx for idx in range(100000))
+        client = mock_ssh_client(stdout=stdout, stderr=stderr)
+
+        res = self.run_shell(client, 'show techsupport')
+
+        client.exec_command.assert_called_once_with("sudo -n /bin/sh -c 'show techsupport'")
+        self.assertEqual(res['rc'], 0)
+        self.assertFalse(res['failed'])
+        self.assertEqual(res['stdout'], stdout.decode().rstrip('\n'))
+        self.assertEqual(res['stderr'], stderr.decode().rstrip('\n'))
+        self.assertEqual(len(res['stdout_lines']), 100000)
+        self.assertEqual(res['stderr_lines'][-1], 'err line 99999')
+
+    # Test case: A command with nonzero rc fails like the ansible shell module
+    def test_nonzero_rc(self):
+        client = mock_ssh_client(stdout=b'', stderr=b'Error: No such command "foo".\n', rc=2)
+
+        res = self.run_shell(client, 'show foo')
+
+        self.assertEqual(res['rc'], 2)
+        self.assertTrue(res['failed'])
+        self.assertEqual(res['msg'], 'non-zero return code')
+        self.assertEqual(res['stderr_lines'], ['Error: No such command "foo".'])
+
+    # Test case: A command not done in time fails, and its channel is closed
+    def test_timeout(self):
+        client = mock_ssh_client(stdout=b'partial\n', hang=True)
+
+        start_time = time.time()
+        res = self.run_shell(client, 'sleep 3600', timeout=0.5)
+
+        self.assertLess(time.time() - start_time, 5)
+        self.assertEqual(res['rc'], TIMEOUT_RC)
+        self.assertTrue(res['failed'])
+        self.assertEqual(res['msg'], 'command timed out after 0.5s')
+        self.assertTrue(client.channels[0].closed)
+
+
+class TestSshFastPathFallback(unittest.TestCase):
+    """Test cases for falling back to ansible when the ssh fast path can't connect."""
+
+    def setUp(self):
+        self.duthost = SonicHost.__new__(SonicHost)
+        self.duthost.hostname = 'dut'
+        self.duthost._ssh_shell = SshShell('dut', '10.0.0.1', 'admin', ['password'])
+        self.ansible_module = mock.MagicMock(return_value={'rc': 0, 'stdout': 'from ansible', 'failed': False})
+        patcher = mock.patch.object(AnsibleHostBase, '__getattr__', lambda host, name: self.ansible_module)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    # Test case: The command is run by ansible if the ssh connection fails
+    def test_fall_back_on_connection_failure(self):
+        with mock.patch('tests.common.devices.ssh_shell._paramiko_ssh', side_effect=socket.timeout('timed out')):
+            res = self.duthost.shell('show version', module_ignore_errors=True)
+
+        self.assertEqual(res['stdout'], 'from ansible')
+        self.ansible_module.assert_called_once_with('show version', verbose=True, module_ignore_errors=True)
+        self.assertNotIn('ssh', self.duthost.get_call_latency())
+
+    # Test case: The command is run over ssh if the connection succeeds
+    def test_no_fall_back_when_connected(self):
+        client = mock_ssh_client(stdout=b'SONiC Software Version\n')
+        with mock.patch('tests.common.devices.ssh_shell._paramiko_ssh', return_value=(client, 'password')):
+            res = self.duthost.shell('show version')
+
+        self.assertEqual(res['stdout'], 'SONiC Software Version')
+        self.ansible_module.assert_not_called()
+        self.assertEqual(self.duthost.get_call_latency()['ssh']['shell']['count'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
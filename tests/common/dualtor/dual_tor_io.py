@@ -11,7 +11,7 @@ import os
 import six
 import scapy.all as scapyall
 import ptf.testutils as testutils
-from itertools import groupby
+from array import array
 
 from tests.common.dualtor.dual_tor_common import CableType
 from tests.common.utilities import wait_until, convert_scapy_packet_to_bytes
@@ -29,10 +29,157 @@ TEMPLATES_DIR = "templates/"
 SUPERVISOR_CONFIG_DIR = "/etc/supervisor/conf.d/"
 DUAL_TOR_SNIFFER_CONF_TEMPL = "dual_tor_sniffer.conf.j2"
 DUAL_TOR_SNIFFER_CONF = "dual_tor_sniffer.conf"
+LINKTYPE_ETHERNET = 1
+ETH_TYPE_IPV4 = 0x0800
+IP_PROTO_ICMP = 1
+IP_PROTO_TCP = 6
+# Traffic directions whose server address is the IP destination, it is the IP source for the others
+SERVER_IS_IP_DST_DIRECTIONS = ("t1_to_server", "t1_to_soc")
 
 logger = logging.getLogger(__name__)
 
 
+def mac_to_bytes(mac):
+    """
+    @summary: Convert a MAC address string to bytes, to compare it with MAC addresses of raw frames.
+        As scapy packets are compared with the MAC address string as is, only strings in the format of
+        scapy (lower case, separated by ':') can match, otherwise None is returned.
+    """
+    try:
+        mac_bytes = bytearray(int(octet, 16) for octet in mac.split(':'))
+    except (AttributeError, ValueError):
+        return None
+    if len(mac_bytes) != 6 or mac != ':'.join('%02x' % octet for octet in mac_bytes):
+        return None
+    return bytes(mac_bytes)
+
+
+def parse_tcp_frame(frame, sport, dport):
+    """
+    @summary: Parse an Ethernet/IPv4/TCP frame of the flow from sport to dport from raw bytes at fixed offsets.
+    Returns:
+        Tuple of (ip_src, ip_dst, payload) in bytes if the frame is a packet of the flow, None if it is not,
+        or False if the frame can't be parsed from raw bytes, like VLAN tagged frames or IP fragments.
+    """
+    if len(frame) < 34 or frame[12:14] != b'\x08\x00' or (six.indexbytes(frame, 14) >> 4) != 4:
+        return False
+    ihl = (six.indexbytes(frame, 14) & 0x0f) * 4
+    total_len, flags_frag, proto = struct.unpack('!H2xHxB', frame[16:24])
+    # More fragments flag or fragment offset
+    if ihl < 20 or total_len < ihl + 20 or flags_frag & 0x3fff:
+        return False
+    if proto == IP_PROTO_ICMP:
+        return None
+    tcp = 14 + ihl
+    if proto != IP_PROTO_TCP or len(frame) < tcp + 20:
+        return False
+    if struct.unpack('!HH', frame[tcp:tcp + 4]) != (sport, dport):
+        return None
+    data_offset = (six.indexbytes(frame, tcp + 12) >> 4) * 4
+    if data_offset < 20 or total_len < ihl + data_offset or len(frame) < tcp + data_offset:
+        return False
+    # Same as bytes of the TCP payload of scapy packet, Ethernet padding is included
+    return frame[26:30], frame[30:34], frame[tcp + data_offset:]
+
+
+def get_payload_id(payload_bytes):
+    """
+    @summary: Get the packet id from the TCP payload like '12XXXX...', raise exception if the payload is invalid.
+    """
+    if six.PY2:
+        return int(payload_bytes.replace('X', ''))
+    return int(payload_bytes.decode().replace('X', ''))
+
+
+class ServerFlow(object):
+    """
+    @summary: Running disruption accounting of the packets of a server.
+
+    Packets are added one by one while the capture is read. Received packets are accounted in order of
+    (payload id, timestamp) as they arrive, only the last received packet, the duplications and the disruptions
+    are kept besides compact arrays of received ids and timestamps. If a received packet arrives out of order,
+    the accounting is replayed over the received packets sorted by (payload id, timestamp) in finish().
+    """
+    __slots__ = ('sent_packets', 'received_ids', 'received_times', 'frames', 'duplications', 'disruptions',
+                 '_last', '_ordered')
+
+    def __init__(self):
+        self.sent_packets = 0
+        self.received_ids = array('q')
+        self.received_times = array('d')
+        # List of (payload id, timestamp, frame, wirelen) to dump the filtered pcap
+        self.frames = []
+        self._ordered = True
+        self._reset_accounting()
+
+    def _reset_accounting(self):
+        self.duplications = []
+        self.disruptions = []
+        self._last = None
+
+    def add_sent(self):
+        self.sent_packets += 1
+
+    def add_received(self, payload_id, timestamp):
+        if self._ordered and self._last is not None and (payload_id, timestamp) < self._last:
+            self._ordered = False
+        self.received_ids.append(payload_id)
+        self.received_times.append(timestamp)
+        if self._ordered:
+            self._account(payload_id, timestamp)
+
+    def _account(self, curr_payload, curr_time):
+        # Look back at the previous received packet to check for gaps/duplicates
+        if self._last is not None:
+            prev_payload, prev_time = self._last
+            if prev_payload == curr_payload:
+                # Duplicate packet detected, consecutive packets with the same payload are one duplication group
+                if self.duplications and self.duplications[-1]['start_id'] == curr_payload:
+                    self.duplications[-1]['end_time'] = curr_time
+                    self.duplications[-1]['duplication_count'] += 1
+                else:
+                    self.duplications.append({
+                        'start_time': curr_time,
+                        'end_time': curr_time,
+                        'start_id': curr_payload,
+                        'end_id': curr_payload,
+                        'duplication_count': 1
+                    })
+            if prev_payload + 1 < curr_payload:
+                # Non-sequential packets indicate a disruption
+                self.disruptions.append({
+                    'start_time': prev_time,
+                    'end_time': curr_time,
+                    'start_id': prev_payload,
+                    'end_id': curr_payload
+                })
+        self._last = (curr_payload, curr_time)
+
+    def __len__(self):
+        return len(self.received_ids)
+
+    def finish(self):
+        """
+        @summary: Replay the accounting in order of (payload id, timestamp) if received packets were out of order.
+            Packets with the same payload id and timestamp keep the order of the capture.
+        """
+        if self._ordered:
+            return
+        self._reset_accounting()
+        received = zip(self.received_ids, self.received_times, range(len(self.received_ids)))
+        for payload_id, timestamp, _ in sorted(received):
+            self._account(payload_id, timestamp)
+        self._ordered = True
+
+    @property
+    def first_received_id(self):
+        return min(self.received_ids) if self.received_ids else None
+
+    @property
+    def last_received_id(self):
+        return self._last[0] if self._last else None
+
+
 class DualTorIO:
     """Class to conduct IO over ports in `active-standby` mode."""
 
@@ -129,7 +276,7 @@ class DualTorIO:
         else:
             self.packets_per_server = self.packets_to_send // len(self.test_interfaces)
 
-        self.all_packets = []
+        self.capture_pcap = None
 
     def setup_ptf_sniffer(self):
         """Setup ptf sniffer supervisor config."""
@@ -622,8 +769,6 @@ class DualTorIO:
         """Fetch the captured packet file generated by the ptf sniffer."""
         logger.info('Fetching pcap file from ptf')
         self.ptfhost.fetch(src=self.capture_pcap, dest='/tmp/', flat=True, fail_on_missing=False)
-        self.all_packets = scapyall.rdpcap(self.capture_pcap)
-        logger.info("Number of all packets captured: {}".format(len(self.all_packets)))
 
     def send_packets(self):
         """Send packets generated."""
@@ -683,174 +828,180 @@ class DualTorIO:
             self.lost_packets dictionary, in format:
             disrupt_start_id = (missing_packets_count, disrupt_time,
             disrupt_start_timestamp, disrupt_stop_timestamp)
+
+            The captured pcap file is read in a single streaming pass, frames are parsed
+            from raw bytes and accounted per server by ServerFlow, so the captured packets
+            are not loaded as scapy packets.
         """
         examine_start = datetime.datetime.now()
         logger.info("Packet flow examine started {}".format(str(examine_start)))
 
-        if not self.all_packets:
-            logger.error("self.all_packets not defined.")
+        if not self.capture_pcap or not os.path.exists(self.capture_pcap):
+            logger.error("Captured pcap file {} not found.".format(self.capture_pcap))
             return None
 
-        # Filter out packets:
-        filtered_packets = [pkt for pkt in self.all_packets if
-                            scapyall.TCP in pkt and
-                            scapyall.ICMP not in pkt and
-                            pkt[scapyall.TCP].sport == self.tcp_sport and
-                            pkt[scapyall.TCP].dport == TCP_DST_PORT and
-                            self.check_tcp_payload(pkt) and
-                            (
-                                pkt[scapyall.Ether].dst == self.sent_pkt_dst_mac or
-                                pkt[scapyall.Ether].src in self.received_pkt_src_mac
-                            )]
-        logger.info("Number of filtered packets captured: {}".format(len(filtered_packets)))
-        if not filtered_packets or len(filtered_packets) == 0:
+        server_flows = self.read_server_flows(self.capture_pcap)
+        if not server_flows:
             logger.error("Sniffer failed to capture any traffic")
 
-        server_to_packet_map = defaultdict(list)
-
-        # Split packets into separate lists based on server IP
-        for packet in filtered_packets:
-            server_addr = self.get_server_address(packet)
-            server_to_packet_map[server_addr].append(packet)
-
-        # E731 Use a def instead of a lambda
-        def get_packet_sort_key(packet):
-            payload_bytes = convert_scapy_packet_to_bytes(packet[scapyall.TCP].payload)
-            if six.PY2:
-                payload_int = int(payload_bytes.replace('X', ''))
-            else:
-                payload_int = int(payload_bytes.decode().replace('X', ''))
-            return (payload_int, packet.time)
-
-        # For each server's packet list, sort by payload then timestamp
-        # (in case of duplicates)
-        for server in list(server_to_packet_map.keys()):
-            server_to_packet_map[server].sort(key=get_packet_sort_key)
-
         logger.info("Measuring traffic disruptions...")
-        for server_ip, packet_list in list(server_to_packet_map.items()):
+        for server_ip, flow in list(server_flows.items()):
             filename = '/tmp/capture_filtered_{}.pcap'.format(server_ip)
-            scapyall.wrpcap(filename, packet_list)
+            self.dump_server_flow(filename, flow)
             logger.info("Filtered pcap dumped to {}".format(filename))
 
         self.test_results = {}
 
-        for server_ip in natsorted(list(server_to_packet_map.keys())):
-            result = self.examine_each_packet(server_ip, server_to_packet_map[server_ip])
+        for server_ip in natsorted(list(server_flows.keys())):
+            result = self.examine_server_flow(server_ip, server_flows[server_ip])
             logger.info("Server {} results:\n{}"
                         .format(server_ip, json.dumps(result, indent=4)))
             self.test_results[server_ip] = result
+        logger.info("Packet flow examine finished after {}".format(str(datetime.datetime.now() - examine_start)))
 
-    def examine_each_packet(self, server_ip, packets):
-        num_sent_packets = 0
-        received_packet_list = list()
-        duplicate_packet_list = list()
-        disruption_ranges = list()
+    def read_server_flows(self, pcap_file):
+        """
+        @summary: Read the captured packets of the flow in a single streaming pass, and account them per server.
+        Returns:
+            Dict of {server address: ServerFlow}.
+        """
+        sent_mac = mac_to_bytes(self.sent_pkt_dst_mac)
+        received_macs = [mac_to_bytes(mac) for mac in self.received_pkt_src_mac]
+        ip_index = 1 if self.traffic_direction in SERVER_IS_IP_DST_DIRECTIONS else 0
+        server_flows = defaultdict(ServerFlow)
+        server_addrs = {}
+        all_count, filtered_count, scapy_count = 0, 0, 0
+
+        reader = scapyall.RawPcapReader(pcap_file)
+        try:
+            for frame, metadata in reader:
+                all_count += 1
+                if hasattr(metadata, 'tshigh'):
+                    linktype = metadata.linktype
+                    timestamp = ((metadata.tshigh << 32) + metadata.tslow) / metadata.tsresol
+                else:
+                    linktype = reader.linktype
+                    scale = 1000000000 if reader.nano else 1000000
+                    timestamp = (metadata.sec * scale + metadata.usec) / scale
+
+                parsed = parse_tcp_frame(frame, self.tcp_sport, TCP_DST_PORT) \
+                    if linktype == LINKTYPE_ETHERNET else False
+                if parsed is None:
+                    continue
+                if parsed is False:
+                    # Frames not parsed from raw bytes are examined as scapy packets
+                    scapy_count += 1
+                    packet = scapyall.Ether(frame) if linktype == LINKTYPE_ETHERNET else \
+                        scapyall.conf.l2types[linktype](frame)
+                    if not (scapyall.TCP in packet and
+                            scapyall.ICMP not in packet and
+                            packet[scapyall.TCP].sport == self.tcp_sport and
+                            packet[scapyall.TCP].dport == TCP_DST_PORT and
+                            self.check_tcp_payload(packet)):
+                        continue
+                    payload_id = get_payload_id(convert_scapy_packet_to_bytes(packet[scapyall.TCP].payload))
+                    server_addr = self.get_server_address(packet)
+                    eth_dst = mac_to_bytes(packet[scapyall.Ether].dst)
+                    eth_src = mac_to_bytes(packet[scapyall.Ether].src)
+                else:
+                    try:
+                        payload_id = get_payload_id(parsed[2])
+                    except Exception:
+                        continue
+                    server_ip = parsed[ip_index]
+                    server_addr = server_addrs.get(server_ip)
+                    if server_addr is None:
+                        server_addr = server_addrs[server_ip] = socket.inet_ntoa(server_ip)
+                    eth_dst, eth_src = frame[0:6], frame[6:12]
+
+                if eth_dst is not None and eth_dst == sent_mac:
+                    # This is a sent packet
+                    server_flows[server_addr].add_sent()
+                elif eth_src is not None and eth_src in received_macs:
+                    # This is a received packet.
+                    server_flows[server_addr].add_received(payload_id, timestamp)
+                else:
+                    continue
+                filtered_count += 1
+                server_flows[server_addr].frames.append((payload_id, timestamp, frame, metadata.wirelen))
+        finally:
+            reader.close()
+
+        for flow in server_flows.values():
+            flow.finish()
+        logger.info("Number of all packets captured: {}".format(all_count))
+        logger.info("Number of filtered packets captured: {}, examined as scapy packets: {}".format(
+            filtered_count, scapy_count))
+        return server_flows
+
+    def dump_server_flow(self, filename, flow):
+        """
+        @summary: Dump the filtered frames of a server to a pcap file, sorted by payload then timestamp.
+        """
+        record_header = struct.Struct('<IIII')
+        with open(filename, 'wb') as f:
+            f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+            for _, timestamp, frame, wirelen in sorted(flow.frames, key=lambda item: item[:2]):
+                sec = int(timestamp)
+                usec = int(round((timestamp - sec) * 1000000))
+                f.write(record_header.pack(sec, usec, len(frame), wirelen))
+                f.write(frame)
+
+    def examine_server_flow(self, server_ip, flow):
+        """
+        @summary: Build the test result of a server from its accounted packets.
+        """
         disruption_before_traffic = False
         disruption_after_traffic = False
-        duplicate_ranges = []
-
-        for packet in packets:
-            if packet[scapyall.Ether].dst == self.sent_pkt_dst_mac:
-                # This is a sent packet
-                num_sent_packets += 1
-                continue
-            if packet[scapyall.Ether].src in self.received_pkt_src_mac:
-                # This is a received packet.
-                # scapy 2.4.5 will use Decimal to calulcate time, but json.dumps
-                # can't recognize Decimal, transform to float here
-                curr_time = float(packet.time)
-                curr_payload_bytes = convert_scapy_packet_to_bytes(packet[scapyall.TCP].payload)
-                if six.PY2:
-                    curr_payload = int(curr_payload_bytes.replace('X', ''))
-                else:
-                    curr_payload = int(curr_payload_bytes.decode().replace('X', ''))
-
-                # Look back at the previous received packet to check for gaps/duplicates
-                # Only if we've already received some packets
-                if len(received_packet_list) > 0:
-                    prev_payload, prev_time = received_packet_list[-1]
-
-                    if prev_payload == curr_payload:
-                        # Duplicate packet detected, increment the counter
-                        duplicate_packet_list.append((curr_payload, curr_time))
-                    if prev_payload + 1 < curr_payload:
-                        # Non-sequential packets indicate a disruption
-                        disruption_dict = {
-                            'start_time': prev_time,
-                            'end_time': curr_time,
-                            'start_id': prev_payload,
-                            'end_id': curr_payload
-                        }
-                        disruption_ranges.append(disruption_dict)
-
-                # Save packets as (payload_id, timestamp) tuples
-                # for easier timing calculations later
-                received_packet_list.append((curr_payload, curr_time))
-
-        if len(received_packet_list) == 0:
+
+        if len(flow) == 0:
             logger.error("Sniffer failed to filter any traffic from DUT")
         else:
-            # Find ranges of consecutive packets that have been duplicated
-            # All consecutive packets with the same payload will be grouped as one
-            # duplication group.
-            # For example, for the duplication list as the following:
-            # [(70, 1744253633.499116), (70, 1744253633.499151), (70, 1744253633.499186),
-            #  (81, 1744253635.49922), (81, 1744253635.499255)]
-            # two duplications will be reported:
-            # "duplications": [
-            #     {
-            #         "start_time": 1744253633.499116,
-            #         "end_time": 1744253633.499186,
-            #         "start_id": 70,
-            #         "end_id": 70,
-            #         "duplication_count": 3
-            #     },
-            #     {
-            #         "start_time": 1744253635.49922,
-            #         "end_time": 1744253635.499255,
-            #         "start_id": 81,
-            #         "end_id": 81,
-            #         "duplication_count": 2
-            #     }
-            # ]
-            for _, grouper in groupby(duplicate_packet_list, lambda d: d[0]):
-                duplicates = list(grouper)
-                duplicate_start, duplicate_end = duplicates[0], duplicates[-1]
-                duplicate_dict = {
-                    'start_time': duplicate_start[1],
-                    'end_time': duplicate_end[1],
-                    'start_id': duplicate_start[0],
-                    'end_id': duplicate_end[0],
-                    'duplication_count': len(duplicates)
-                }
-                duplicate_ranges.append(duplicate_dict)
-
             # If the first packet we received is not #0, some disruption started
             # before traffic started. Store the id of the first received packet
-            if received_packet_list[0][0] != 0:
-                disruption_before_traffic = received_packet_list[0][0]
+            if flow.first_received_id != 0:
+                disruption_before_traffic = flow.first_received_id
             # If the last packet we received does not match the number of packets
             # sent, some disruption continued after the traffic finished.
             # Store the id of the last received packet
-            if received_packet_list[-1][0] != self.packets_sent_per_server.get(server_ip) - 1:
-                disruption_after_traffic = received_packet_list[-1][0]
-
+            if flow.last_received_id != self.packets_sent_per_server.get(server_ip) - 1:
+                disruption_after_traffic = flow.last_received_id
+
+        # All consecutive packets with the same payload are grouped as one duplication group.
+        # For example, for the duplicated packets as the following:
+        # [(70, 1744253633.499116), (70, 1744253633.499151), (70, 1744253633.499186),
+        #  (81, 1744253635.49922), (81, 1744253635.499255)]
+        # two duplications will be reported:
+        # "duplications": [
+        #     {
+        #         "start_time": 1744253633.499116,
+        #         "end_time": 1744253633.499186,
+        #         "start_id": 70,
+        #         "end_id": 70,
+        #         "duplication_count": 3
+        #     },
+        #     {
+        #         "start_time": 1744253635.49922,
+        #         "end_time": 1744253635.499255,
+        #         "start_id": 81,
+        #         "end_id": 81,
+        #         "duplication_count": 2
+        #     }
+        # ]
         result = {
-            'sent_packets': num_sent_packets,
-            'received_packets': len(received_packet_list),
+            'sent_packets': flow.sent_packets,
+            'received_packets': len(flow),
             'disruption_before_traffic': disruption_before_traffic,
             'disruption_after_traffic': disruption_after_traffic,
-            'duplications': duplicate_ranges,
-            'disruptions': disruption_ranges
+            'duplications': flow.duplications,
+            'disruptions': flow.disruptions
         }
 
-        if num_sent_packets < self.packets_sent_per_server.get(server_ip):
-            server_addr = self.get_server_address(packet)
+        if flow.sent_packets < self.packets_sent_per_server.get(server_ip):
             logger.error('Not all sent packets were captured. '
                          'Something went wrong!')
             logger.error('Dumping server {} results and continuing:\n{}'
-                         .format(server_addr, json.dumps(result, indent=4)))
+                         .format(server_ip, json.dumps(result, indent=4)))
 
         return result
 
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import logging
 import tempfile
@@ -167,6 +168,151 @@ def get_t2_fib_info(duthosts, duts_cfg_facts, duts_mg_facts, testname=None):
     return fib_info
 
 
+class FibSnapshot(object):
+    """Compact snapshot of the routes of an asic, dumped from APPL_DB of the DUT.
+
+    Only prefix, nexthop and ifname of the routes are kept. The checksum of the compact dump identifies the generation
+    of the route table, so unchanged route tables don't need to be fetched and resolved again.
+    """
+
+    def __init__(self, checksum, routes):
+        """
+        Args:
+            checksum (str): md5 checksum of the compact dump.
+            routes (dict): Map of prefix to tuple (nexthop, ifname).
+        """
+        self.checksum = checksum
+        self.routes = routes
+
+    @classmethod
+    def load(cls, checksum, path):
+        routes = {}
+        with open(path) as fp:
+            for line in fp:
+                prefix, nexthop, ifname = line.rstrip('\n').split('\t')
+                routes[prefix] = (nexthop, ifname)
+        return cls(checksum, routes)
+
+    def diff(self, previous):
+        """Get the prefixes changed since the previous snapshot.
+
+        Returns:
+            tuple: Sets of prefixes (added, removed, changed).
+        """
+        added = set(self.routes) - set(previous.routes)
+        removed = set(previous.routes) - set(self.routes)
+        changed = set(prefix for prefix, route in self.routes.items()
+                      if prefix in previous.routes and previous.routes[prefix] != route)
+        return added, removed, changed
+
+
+# Convert the JSON dump of routes to lines of '<prefix>\t<nexthop>\t<ifname>' on the DUT
+FIB_DUMP_SCRIPT = ("import json,sys; [sys.stdout.write('\\t'.join((k.split(':', 1)[1], v['value'].get('nexthop', ''), "
+                   "v['value'].get('ifname', ''))) + '\\n') for k, v in sorted(json.load(sys.stdin).items())]")
+
+# Map of (hostname, asic_index, route_key) to tuple (FibSnapshot, fingerprint of config used to resolve routes,
+# map of prefix to resolved PTF ports or None for skipped prefix)
+_fib_snapshots = {}
+
+
+def _resolve_route_ports(prefix, nh, ifname_list, po, ports, sub_interfaces, ptf_indices):
+    """Resolve a route to PTF ports connected to its output ports.
+
+    Returns:
+        list: PTF ports of the route, or None if the route should be skipped.
+    """
+    skip = False
+    oports = []
+    for ifname in ifname_list.split(','):
+        if ifname in po:
+            # ignore the prefix, if the prefix nexthop is not a frontend port
+            if len(list(po[ifname].keys())) > 0:
+                if 'role' in ports[list(po[ifname].keys())[0]] and \
+                        ports[list(po[ifname].keys())[0]]['role'] == 'Int':
+                    skip = True
+                else:
+                    oports.append([str(ptf_indices[x]) for x in list(po[ifname].keys())])
+        else:
+            if ifname in sub_interfaces:
+                oports.append([str(ptf_indices[ifname.split('.')[0]])])
+            elif ifname in ports:
+                if 'role' in ports[ifname] and ports[ifname]['role'] == 'Int':
+                    skip = True
+                else:
+                    oports.append([str(ptf_indices[ifname])])
+            else:
+                logger.info("Route point to non front panel port {}: nexthop {}, ifname {}".format(
+                    prefix, nh, ifname_list))
+                skip = True
+
+    # skip direct attached subnet
+    if nh == '0.0.0.0' or nh == '::' or nh == "":
+        skip = True
+
+    return None if skip else oports
+
+
+def get_fib_snapshot_routes(duthost, asic_index, asic_cfg_facts, asic_mg_facts, route_key='ROUTE*'):
+    """Get routes of an asic resolved to PTF ports, reusing the previous snapshot of the asic.
+
+    The routes are dumped to a compact file on the DUT. If its checksum and the config used to resolve the routes are
+    not changed since the previous snapshot, the previous result is returned without fetching the dump. Otherwise only
+    the routes added or changed since the previous snapshot are resolved again.
+
+    Args:
+        duthost (SonicHost): Object for interacting with DUT.
+        asic_index (int): Index of the asic.
+        asic_cfg_facts (dict): Running config facts of the asic.
+        asic_mg_facts (dict): Minigraph facts of the asic.
+        route_key (str): Pattern of keys of routes in APPL_DB.
+
+    Returns:
+        dict: Map of prefix to PTF ports, or None if the route is skipped. Don't modify it, it is cached.
+    """
+    timestamp = datetime.now().strftime('%Y-%m-%d-%H:%M:%S')
+    asic = duthost.asic_instance(asic_index)
+    po = asic_cfg_facts.get('PORTCHANNEL_MEMBER', {})
+    ports = asic_cfg_facts.get('PORT', {})
+    sub_interfaces = asic_cfg_facts.get('VLAN_SUB_INTERFACE', {})
+    ptf_indices = asic_mg_facts['minigraph_ptf_indices']
+    fingerprint = hashlib.md5(json.dumps([po, ports, sub_interfaces, ptf_indices], sort_keys=True, default=str)
+                              .encode()).hexdigest()
+
+    dump_file = "/tmp/fib.{}.{}.txt".format(asic_index, timestamp)
+    res = asic.shell('{}redis-dump -d 0 -k {} | python3 -c "{}" > {} && md5sum {}'.format(
+        asic.ns_arg, route_key, FIB_DUMP_SCRIPT, dump_file, dump_file))
+    checksum = res['stdout'].split()[0]
+
+    snapshot_key = (duthost.hostname, asic_index, route_key)
+    previous = _fib_snapshots.get(snapshot_key)
+    if previous and previous[0].checksum == checksum and previous[1] == fingerprint:
+        logger.info("Routes of {} asic {} are not changed, reuse resolved routes of {} prefixes".format(
+            duthost.hostname, asic_index, len(previous[2])))
+        duthost.file(path=dump_file, state="absent")
+        return previous[2]
+
+    duthost.fetch(src=dump_file, dest="/tmp/fib")
+    duthost.file(path=dump_file, state="absent")
+    snapshot = FibSnapshot.load(checksum, "/tmp/fib/{}{}".format(duthost.hostname, dump_file))
+
+    if previous and previous[1] == fingerprint:
+        added, removed, changed = snapshot.diff(previous[0])
+        resolved = dict((prefix, oports) for prefix, oports in previous[2].items() if prefix not in removed)
+        to_resolve = added | changed
+        logger.info("Routes of {} asic {} changed: {} added, {} removed, {} changed".format(
+            duthost.hostname, asic_index, len(added), len(removed), len(changed)))
+    else:
+        resolved = {}
+        to_resolve = snapshot.routes
+
+    for prefix in to_resolve:
+        nh, ifname_list = snapshot.routes[prefix]
+        resolved[prefix] = _resolve_route_ports(prefix, nh, ifname_list, po, ports, sub_interfaces, ptf_indices)
+
+    _fib_snapshots[snapshot_key] = (snapshot, fingerprint, resolved)
+    return resolved
+
+
 def get_fib_info(duthost, dut_cfg_facts, duts_mg_facts, testname=None):
     """Get parsed FIB information from redis DB.
 
@@ -187,7 +333,6 @@ def get_fib_info(duthost, dut_cfg_facts, duts_mg_facts, testname=None):
                 ...
             }
     """
-    timestamp = datetime.now().strftime('%Y-%m-%d-%H:%M:%S')
     fib_info = {}
     route_key = 'ROUTE*'
     if 'test_ecmp_group_member_flap' in testname:
@@ -197,63 +342,13 @@ def get_fib_info(duthost, dut_cfg_facts, duts_mg_facts, testname=None):
 
         asic_index, asic_cfg_facts = asic_cfg_facts_tuple
 
-        asic = duthost.asic_instance(asic_index)
-
-        asic.shell("{} redis-dump -d 0 -k {} -y > /tmp/fib.{}.txt".format(asic.ns_arg, route_key, timestamp))
-        duthost.fetch(src="/tmp/fib.{}.txt".format(timestamp), dest="/tmp/fib")
-
-        po = asic_cfg_facts.get('PORTCHANNEL_MEMBER', {})
-        ports = asic_cfg_facts.get('PORT', {})
-        sub_interfaces = asic_cfg_facts.get('VLAN_SUB_INTERFACE', {})
-
-        with open("/tmp/fib/{}/tmp/fib.{}.txt".format(duthost.hostname, timestamp)) as fp:
-            fib = json.load(fp)
-            for k, v in list(fib.items()):
-                skip = False
-
-                prefix = k.split(':', 1)[1]
-                ifnames = v['value']['ifname'].split(',')
-                nh = v['value']['nexthop']
-
-                oports = []
-                for ifname in ifnames:
-                    if ifname in po:
-                        # ignore the prefix, if the prefix nexthop is not a frontend port
-                        if len(list(po[ifname].keys())) > 0:
-                            if 'role' in ports[list(po[ifname].keys())[0]] and \
-                                    ports[list(po[ifname].keys())[0]]['role'] == 'Int':
-                                skip = True
-                            else:
-                                oports.append(
-                                    [str(duts_mg_facts[list_index][1]['minigraph_ptf_indices'][x])
-                                     for x in list(po[ifname].keys())]
-                                )
-                    else:
-                        if ifname in sub_interfaces:
-                            oports.append(
-                                [str(duts_mg_facts[list_index][1]['minigraph_ptf_indices'][ifname.split('.')[0]])]
-                            )
-                        elif ifname in ports:
-                            if 'role' in ports[ifname] and ports[ifname]['role'] == 'Int':
-                                skip = True
-                            else:
-                                oports.append([str(duts_mg_facts[list_index][1]['minigraph_ptf_indices'][ifname])])
-                        else:
-                            logger.info("Route point to non front panel port {}:{}".format(k, v))
-                            skip = True
-
-                # skip direct attached subnet
-                if nh == '0.0.0.0' or nh == '::' or nh == "":
-                    skip = True
-
-                if not skip:
-                    if prefix in fib_info:
-                        fib_info[prefix] += oports
-                    else:
-                        fib_info[prefix] = oports
-                # For single_asic device, add empty list for directly connected subnets
-                elif skip and not duthost.is_multi_asic:
-                    fib_info[prefix] = []
+        routes = get_fib_snapshot_routes(duthost, asic_index, asic_cfg_facts, duts_mg_facts[list_index][1], route_key)
+        for prefix, oports in routes.items():
+            if oports is not None:
+                fib_info.setdefault(prefix, []).extend(oports)
+            # For single_asic device, add empty list for directly connected subnets
+            elif not duthost.is_multi_asic:
+                fib_info[prefix] = []
 
     return fib_info
 
@@ -0,0 +1,307 @@
+"""
+Event-driven waiting for conditions backed by redis DBs of DUTs.
+
+wait_until sleeps 'interval' seconds between checks of a condition. For conditions depending on redis DBs, like
+STATE_DB or APPL_DB entries, wait_until_event and wait_until_all check the conditions again as soon as a matching key
+changes, based on keyspace notifications of redis. Notifications are read by a background thread from a long-running
+'redis-cli --csv psubscribe' over a single ssh channel per DUT and DB, see KeyspaceEventStream.
+
+The 'interval' is still the maximum time between checks. If no event stream is available, or keyspace notifications
+are disabled in redis, waiting falls back to polling every 'interval' seconds.
+
+Example:
+    with open_dut_event_streams(duthosts, 'STATE_DB', ['PORT_TABLE|*']) as streams:
+        pytest_assert(wait_until_all(120, 10, [partial(check_ports_up, duthost) for duthost in duthosts],
+                                     event_streams=streams))
+"""
+import contextlib
+import csv
+import logging
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+from tests.common.devices.ssh_shell import get_ssh_credentials
+from tests.common.utilities import _paramiko_ssh
+
+logger = logging.getLogger(__name__)
+
+REDIS_DB_IDS = {
+    'APPL_DB': 0,
+    'ASIC_DB': 1,
+    'COUNTERS_DB': 2,
+    'LOGLEVEL_DB': 3,
+    'CONFIG_DB': 4,
+    'FLEX_COUNTER_DB': 5,
+    'STATE_DB': 6,
+}
+SUBSCRIBE_TIMEOUT = 10
+# Time to wait for more events after the first one, to check conditions once for a burst of changes
+SETTLE_TIME = 0.1
+
+# Notified on events of any stream, so one waiter can wait for events of many streams
+_events = threading.Condition()
+_event_count = 0
+
+
+def _notify_event():
+    global _event_count
+    with _events:
+        _event_count += 1
+        _events.notify_all()
+
+
+class KeyspaceEventStream(object):
+    """
+    @summary: Stream of keyspace notifications of a redis DB.
+
+    A background thread reads output of 'redis-cli --csv psubscribe' and wakes up the waiters when a key matching
+    the patterns changes. The command is run locally (see local), for example against a local redis-server in unit
+    tests, or over a single ssh channel to the DUT (see on_dut).
+    """
+
+    def __init__(self, name, db, patterns, open_source):
+        """
+        @param name: Name of the stream used in logs.
+        @param db: Name or id of the redis DB.
+        @param patterns: List of key patterns, like 'PORT_TABLE|*'.
+        @param open_source: Function running the psubscribe command with its arguments, returns tuple of (iterator of
+            output lines, function closing the command).
+        """
+        self.name = name
+        self.db = REDIS_DB_IDS.get(db, db)
+        self.patterns = list(patterns)
+        self.event_count = 0
+        self.last_key = None
+        self._open_source = open_source
+        self._close_source = None
+        self._subscribed = threading.Event()
+        self._thread = None
+        self._alive = False
+
+    @property
+    def psubscribe_args(self):
+        return ['-n', str(self.db), '--csv', 'psubscribe'] + \
+            ['__keyspace@{}__:{}'.format(self.db, pattern) for pattern in self.patterns]
+
+    @classmethod
+    def local(cls, db, patterns, port=6379, host='127.0.0.1', redis_cli='redis-cli'):
+        """
+        @summary: Stream of a redis-server reachable from the test server, like a local stand-in redis-server.
+        """
+        def _open_source(args):
+            proc = subprocess.Popen([redis_cli, '-h', host, '-p', str(port)] + args, stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, universal_newlines=True, bufsize=1)
+            return iter(proc.stdout.readline, ''), proc.kill
+
+        return cls('{}:{}'.format(host, port), db, patterns, _open_source)
+
+    @classmethod
+    def on_dut(cls, duthost, db, patterns, asic_index=None):
+        """
+        @summary: Stream of a redis DB of a DUT, the psubscribe command is run in the database container over ssh.
+
+        @param duthost: Object of SonicHost or MultiAsicSonicHost.
+        @param asic_index: Index of the asic of the DB for multi-asic DUT.
+        """
+        sonichost = getattr(duthost, 'sonichost', duthost)
+        container = 'database'
+        if asic_index is not None:
+            container = duthost.asic_instance(asic_index).get_docker_name('database')
+
+        def _open_source(args):
+            username, passwords = get_ssh_credentials(sonichost)
+            ssh, _ = _paramiko_ssh(sonichost.mgmt_ip, username, passwords)
+            channel = ssh.get_transport().open_session()
+            # With a pty, redis-cli is hung up when the channel is closed
+            channel.get_pty()
+            channel.exec_command('sudo docker exec {} redis-cli {}'.format(
+                container, ' '.join("'{}'".format(arg) for arg in args)))
+
+            def _close():
+                channel.close()
+                ssh.close()
+
+            return iter(channel.makefile('r').readline, ''), _close
+
+        return cls('{}:{}'.format(sonichost.hostname, container), db, patterns, _open_source)
+
+    @property
+    def alive(self):
+        return self._alive
+
+    def start(self, timeout=SUBSCRIBE_TIMEOUT):
+        """
+        @summary: Run the psubscribe command and wait until all the patterns are subscribed.
+
+        @return: True if the stream is started, otherwise the stream is closed and waiters fall back to polling.
+        """
+        try:
+            lines, self._close_source = self._open_source(self.psubscribe_args)
+        except Exception as e:
+            logger.warning('Failed to start keyspace event stream {}: {}'.format(self.name, repr(e)))
+            return False
+
+        self._alive = True
+        self._thread = threading.Thread(target=self._read, args=(lines, ), name='keyspace-{}'.format(self.name))
+        self._thread.daemon = True
+        self._thread.start()
+        if not self._subscribed.wait(timeout):
+            logger.warning('Keyspace event stream {} is not subscribed in {} seconds'.format(self.name, timeout))
+            self.close()
+            return False
+        logger.info('Keyspace event stream {} subscribed to DB {} {}'.format(self.name, self.db, self.patterns))
+        return True
+
+    def _read(self, lines):
+        subscribed = 0
+        try:
+            for line in lines:
+                row = next(csv.reader([line.strip()]), None)
+                if not row:
+                    continue
+                if row[0] == 'psubscribe':
+                    subscribed += 1
+                    if subscribed == len(self.patterns):
+                        self._subscribed.set()
+                elif row[0] == 'pmessage' and len(row) >= 4:
+                    self.event_count += 1
+                    self.last_key = row[2].split(':', 1)[-1]
+                    _notify_event()
+        except Exception as e:
+            if self._alive:
+                logger.warning('Keyspace event stream {} stopped: {}'.format(self.name, repr(e)))
+        finally:
+            self._alive = False
+            # Wake up waiters to fall back to polling
+            _notify_event()
+
+    def close(self):
+        self._alive = False
+        if self._close_source:
+            try:
+                self._close_source()
+            except Exception as e:
+                logger.debug('Failed to close keyspace event stream {}: {}'.format(self.name, repr(e)))
+            self._close_source = None
+        if self._thread:
+            self._thread.join(5)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@contextlib.contextmanager
+def open_dut_event_streams(duthosts, db, patterns):
+    """
+    @summary: Start keyspace event streams of a DB on DUTs concurrently, and close them on exit.
+
+    @param duthosts: List of DUTs, like duthosts or duthosts.frontend_nodes. For multi-asic DUTs, a stream is
+        started for the DB of each asic.
+    @param db: Name or id of the redis DB.
+    @param patterns: List of key patterns.
+    @return: List of started streams. Streams failed to start are not included.
+    """
+    streams = []
+    for duthost in duthosts:
+        asic_indexes = [asic.asic_index for asic in duthost.asics] if duthost.is_multi_asic else [None]
+        streams.extend(KeyspaceEventStream.on_dut(duthost, db, patterns, asic_index) for asic_index in asic_indexes)
+    threads = [threading.Thread(target=stream.start) for stream in streams]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    started = [stream for stream in streams if stream.alive]
+    try:
+        yield started
+    finally:
+        for stream in streams:
+            stream.close()
+
+
+def _check(condition):
+    try:
+        return bool(condition())
+    except Exception as e:
+        details = traceback.format_exception(*sys.exc_info())
+        logger.error("Exception caught while checking {}:{}, error:{}".format(
+            getattr(condition, '__name__', condition), "".join(details), e))
+        return False
+
+
+def wait_until_all(timeout, interval, conditions, event_streams=None, delay=0):
+    """
+    @summary: Wait until all the conditions are True or timeout. The conditions not True yet are checked again as soon
+        as an event arrives on any of the event streams, or every 'interval' seconds.
+
+    @param timeout: Maximum time to wait
+    @param interval: Maximum time between checks, it is the poll interval if no event stream is alive
+    @param conditions: List of functions that return False or True, use functools.partial for arguments.
+    @param event_streams: List of started KeyspaceEventStream.
+    @param delay: Delay time
+    @return: True if all the conditions are True before timeout. If a condition function raises an exception, log the
+        error and keep waiting.
+    """
+    event_streams = event_streams or []
+    if delay > 0:
+        time.sleep(delay)
+
+    start_time = time.time()
+    pending = list(conditions)
+    checks = 0
+    while True:
+        with _events:
+            event_count = _event_count
+        pending = [condition for condition in pending if not _check(condition)]
+        checks += 1
+        elapsed_time = time.time() - start_time
+        if not pending:
+            logger.debug("All {} conditions are True after {:.1f} seconds and {} checks".format(
+                len(conditions), elapsed_time, checks))
+            return True
+        if elapsed_time >= timeout:
+            logger.debug("{} of {} conditions are still False after {} seconds, exit with False".format(
+                len(pending), len(conditions), timeout))
+            return False
+
+        wait_time = min(interval, timeout - elapsed_time)
+        if any(stream.alive for stream in event_streams):
+            with _events:
+                if _event_count == event_count:
+                    _events.wait(wait_time)
+                woken_by_event = _event_count != event_count
+            if woken_by_event:
+                time.sleep(SETTLE_TIME)
+        else:
+            time.sleep(wait_time)
+
+
+def wait_until_event(timeout, interval, delay, condition, *args, **kwargs):
+    """
+    @summary: Same as wait_until, but the condition is checked again as soon as an event arrives on the event streams.
+    @param timeout: Maximum time to wait
+    @param interval: Maximum time between checks, it is the poll interval if no event stream is alive
+    @param delay: Delay time
+    @param condition: A function that returns False or True
+    @param event_streams: Keyword argument, list of started KeyspaceEventStream.
+    @param *args: Extra args required by the 'condition' function.
+    @param **kwargs: Extra args required by the 'condition' function.
+    @return: If the condition function returns True before timeout, return True. If the condition function raises an
+        exception, log the error and keep waiting.
+    """
+    event_streams = kwargs.pop('event_streams', None)
+    logger.debug("Wait until %s is True, timeout is %s seconds, checking interval is %s, delay is %s seconds, "
+                 "event streams: %s" % (condition.__name__, timeout, interval, delay,
+                                        [stream.name for stream in event_streams or []]))
+
+    def _condition():
+        return condition(*args, **kwargs)
+    _condition.__name__ = condition.__name__
+
+    return wait_until_all(timeout, interval, [_condition], event_streams=event_streams, delay=delay)
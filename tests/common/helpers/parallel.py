@@ -1,3 +1,4 @@
+import copy
 import datetime
 import logging
 import math
@@ -7,11 +8,10 @@ import signal
 import tempfile
 import time
 import traceback
-from multiprocessing import Process, Manager, Pipe, TimeoutError
+from multiprocessing import Process, Pipe, TimeoutError
+from multiprocessing.connection import wait
 from multiprocessing.pool import ThreadPool
 
-from psutil import wait_procs
-
 from tests.common.helpers.assertions import pytest_assert as pt_assert
 
 logger = logging.getLogger(__name__)
@@ -24,24 +24,46 @@ class SonicProcess(Process):
 
     This exception (including backtrace) can be logged in test log
     to provide better info of why a particular Process failed.
+
+    If the keyword arguments of the target have 'results', the process sends the results back to the parent process
+    through the pipe when the target finishes, together with the exception.
     """
     def __init__(self, *args, **kwargs):
         Process.__init__(self, *args, **kwargs)
         self._pconn, self._cconn = Pipe(duplex=False)  # unidirectional: child_conn can send, parent_conn can recv
         self._exception = None
+        self._results = None
         self._exception_read = False  # Flag to track read status
+        self.start_time = None
+        self.end_time = None
+
+    def start(self):
+        self.start_time = time.time()
+        Process.start(self)
+        # Close the child-side pipe in the parent, so the parent gets EOF if the child exits without sending
+        self._cconn.close()
 
     def run(self):
+        results = self._kwargs.get('results')
         try:
             Process.run(self)
-            self._cconn.send(None)
+            self._send(results, None)
         except Exception as e:
             tb = traceback.format_exc()
-            self._cconn.send((e, tb))
+            self._send(results, (e, tb))
             raise e
         finally:
             self._cconn.close()  # Close the child-side pipe
 
+    def _send(self, results, exception):
+        results = dict(results) if results is not None else None
+        try:
+            self._cconn.send((results, exception))
+        except Exception as e:
+            # Results or exception can't be pickled
+            tb = exception[1] if exception else traceback.format_exc()
+            self._cconn.send((None, (RuntimeError(repr(exception[0] if exception else e)), tb)))
+
     # for wait_procs
     def wait(self, timeout):
         return self.join(timeout=timeout)
@@ -51,171 +73,179 @@ class SonicProcess(Process):
         return self.is_alive()
 
     @property
-    def exception(self):
-        """Read exception data once and close parent-side pipe."""
+    def connection(self):
+        """Parent-side pipe, it is ready to read when the target finished or the process exited."""
+        return self._pconn
+
+    def _read(self):
+        """Read results and exception data once and close parent-side pipe."""
         if not self._exception_read:
             try:
                 if self._pconn.poll():
-                    self._exception = self._pconn.recv()
+                    self._results, self._exception = self._pconn.recv()
             except (EOFError, OSError):
                 pass
             finally:
                 self._pconn.close()
                 self._exception_read = True
+                self.end_time = time.time()
+
+    @property
+    def exception(self):
+        self._read()
         return self._exception
 
+    @property
+    def results(self):
+        """Results sent by the process, None if the process didn't finish the target."""
+        self._read()
+        return self._results
 
-def parallel_run(
-    target, args, kwargs, nodes_list, timeout=None, concurrent_tasks=24, init_result=None
+    @property
+    def elapsed(self):
+        if self.start_time is None:
+            return 0
+        return (self.end_time or time.time()) - self.start_time
+
+
+def parallel_run_iter(
+    target, args, kwargs, nodes_list, timeout=None, concurrent_tasks=24, init_result=None, results=None
 ):
-    """Run target function on nodes in parallel
+    """Run target function on nodes in parallel, yield results of each node as soon as it finishes
+
+    Arguments are the same as parallel_run. The target function is run in a forked process for each node, at most
+    'concurrent_tasks' processes are run at the same time. Each process sends the results of its node back through a
+    pipe when the target function returns.
 
     Args:
-        target (function): The target function to be executed in parallel.
-        args (list of tuple): List of arguments for the target function.
-        kwargs (dict): Keyword arguments for the target function. It will be extended with two keys: 'node' and
-            'results'. The 'node' key will hold an item of the nodes list. The 'result' key will hold an instance of
-            multiprocessing.Manager().dict(). It is a proxy of the shared dict that will be used by each process for
-            returning execution results.
-        nodes (list of nodes): List of nodes to be used by the target function
-        timeout (int or float, optional): Total time allowed for the spawned multiple processes to run. Defaults to
-            None. When timeout is specified, this function will wait at most 'timeout' seconds for the processes to
-            run. When time is up, this function will try to terminate or even kill all the processes.
+        results (dict, optional): Dict updated with results of all the nodes, including the nodes failed or killed.
 
     Raises:
-        flag.: In case any of the spawned process cannot be terminated, fail the test.
+        flag.: In case any of the spawned process failed or cannot be terminated, fail the test after all the nodes
+            are done.
 
-    Returns:
-        dict: An instance of multiprocessing.Manager().dict(). It is a proxy to the shared dict that is used by all the
-            spawned processes.
+    Yields:
+        tuple: (node, results of the node, seconds taken by the node). Results of the node is the dict of results
+            set by the target function, or None if the process didn't finish the target function.
     """
     nodes = [node for node in nodes_list]
-
-    # Callback API for wait_procs
-    def on_terminate(worker):
-        logger.info("process {} terminated with exit code {}".format(
-            worker.name, worker.returncode)
-        )
-
-    def force_terminate(workers, init_result):
-        # Some processes cannot be terminated. Try to kill them and raise flag.
-        running_processes = [worker for worker in workers if worker.is_alive()]
-        if len(running_processes) > 0:
-            logger.info(
-                'Found processes still running: {}. Try to kill them.'.format(str(running_processes))
-            )
-            for p in running_processes:
-                # If sanity check process is killed, it still has init results.
-                # set its failed to True.
-                if init_result:
-                    init_result['failed'] = True
-                    results[list(results.keys())[0]] = init_result
-                else:
-                    results[p.name] = {'failed': True}
-                try:
-                    os.kill(p.pid, signal.SIGKILL)
-                except OSError as err:
-                    logger.error("Unable to kill {}:{}, error:{}".format(
-                        p.pid, p.name, err
-                    ))
-
-                    pt_assert(
-                        False,
-                        """Processes running target "{}" could not be terminated.
-                        Unable to kill {}:{}, error:{}""".format(target.__name__, p.pid, p.name, err)
-                    )
-
-    workers = []
-    results = Manager().dict()
-    start_time = datetime.datetime.now()
-    tasks_done = 0
+    results = results if results is not None else {}
+    start_time = time.time()
     total_tasks = len(nodes)
-    tasks_running = 0
+    tasks_done = 0
+    running = {}
+    node_timing = {}
+    failed_processes = {}
     total_timeout = timeout * math.ceil(
         len(nodes)/float(concurrent_tasks)
     ) if timeout else None
-    failed_processes = {}
 
-    while tasks_done < total_tasks:
-        # If execution time of processes exceeds timeout, need to force
-        # terminate them all.
-        if total_timeout is not None:
-            if (datetime.datetime.now() - start_time).seconds > total_timeout:
-                logger.error('Process execution time exceeds {} seconds.'.format(
-                    str(total_timeout)
-                ))
-                break
-
-        while len(nodes) and tasks_running < concurrent_tasks:
-            node = nodes.pop(0)
-            # For sanity check process, initial results in case of timeout.
-            if init_result:
-                init_result["host"] = node.hostname
-                results[node.hostname] = init_result
-            kwargs['node'] = node
-            kwargs['results'] = results
-            process_name = "{}--{}".format(target.__name__, node)
-            worker = SonicProcess(
-                        name=process_name, target=target, args=args,
-                        kwargs=kwargs
-                    )
-            worker.start()
-            tasks_running += 1
-            logger.debug('Started process {} running target "{}"'.format(
-                worker.pid, process_name
-            ))
-            workers.append(worker)
-
-        gone, alive = wait_procs(workers, timeout=timeout, callback=on_terminate)
-        workers = alive
-
-        logger.debug("task completed {}, running {}".format(
-            len(gone), len(alive)
-        ))
-
-        # Sometimes the child processes finished run but still alive, causing exception hidden.
-        # It mainly caused by child processes hang on send() if parent doesn't read from the pipe.
-        # Therefore, explicitly check the processes exception to prevent any error miss.
-        logger.info("Force read exception regardless of whether the process exited normally.")
-        for worker in gone + alive:
-            worker_exception = worker.exception  # Force-read to prevent pipe hangs
-            if worker_exception is not None:
-                logger.info(f"Process {worker.name} has exception, is_alive={worker.is_running()}, record the error.")
-                failed_processes[worker.name] = {
-                    'exit_code': worker.exitcode,
-                    'exception': worker_exception
-                }
-
-        if len(gone) == 0:
-            logger.debug("all processes have timedout")
-            tasks_running -= len(workers)
-            tasks_done += len(workers)
-            force_terminate(workers, init_result)
-            del workers[:]
+    def get_init_result(node):
+        node_init_result = copy.deepcopy(init_result)
+        node_init_result["host"] = node.hostname
+        return node_init_result
+
+    def set_killed(worker, node):
+        # If sanity check process is killed, it still has init results.
+        # set its failed to True.
+        if init_result:
+            node_init_result = get_init_result(node)
+            node_init_result['failed'] = True
+            results[node.hostname] = node_init_result
         else:
-            tasks_running -= len(gone)
-            tasks_done += len(gone)
-
-    # In case of timeout force terminate spawned processes
-    for worker in workers:
+            results[worker.name] = {'failed': True}
+
+    def kill(worker, node):
+        logger.error('Process {} is alive after {:.1f} seconds, force terminate it.'.format(
+            worker.name, worker.elapsed))
+        set_killed(worker, node)
+        worker.terminate()
+        worker.join(5)
         if worker.is_alive():
-            logger.error('Process {} is alive, force terminate it.'.format(
-                worker.name
-            ))
-            worker.terminate()
-            # If sanity check process is killed, it still has init results.
-            # set its failed to True.
-            if init_result:
-                init_result['failed'] = True
-                results[list(results.keys())[0]] = init_result
-            else:
-                results[worker.name] = {'failed': True}
-
-    end_time = datetime.datetime.now()
-    delta_time = end_time - start_time
+            try:
+                os.kill(worker.pid, signal.SIGKILL)
+            except OSError as err:
+                logger.error("Unable to kill {}:{}, error:{}".format(worker.pid, worker.name, err))
+                pt_assert(
+                    False,
+                    """Processes running target "{}" could not be terminated.
+                    Unable to kill {}:{}, error:{}""".format(target.__name__, worker.pid, worker.name, err)
+                )
+            worker.join(5)
+
+    try:
+        while nodes or running:
+            # If execution time of processes exceeds timeout, need to force
+            # terminate them all.
+            if total_timeout is not None and time.time() - start_time > total_timeout:
+                logger.error('Process execution time exceeds {} seconds.'.format(str(total_timeout)))
+                for worker, node in list(running.values()):
+                    kill(worker, node)
+                    node_timing[worker.name] = worker.elapsed
+                    yield node, None, worker.elapsed
+                running.clear()
+                break
 
-    # force terminate any workers still running
-    force_terminate(workers, init_result)
+            while nodes and len(running) < concurrent_tasks:
+                node = nodes.pop(0)
+                node_results = {}
+                # For sanity check process, initial results in case of timeout.
+                if init_result:
+                    node_results[node.hostname] = get_init_result(node)
+                    results[node.hostname] = node_results[node.hostname]
+                worker_kwargs = dict(kwargs, node=node, results=node_results)
+                process_name = "{}--{}".format(target.__name__, node)
+                worker = SonicProcess(name=process_name, target=target, args=args, kwargs=worker_kwargs)
+                worker.start()
+                running[worker.connection] = (worker, node)
+                logger.debug('Started process {} running target "{}"'.format(worker.pid, process_name))
+
+            # Wait for results or exit of any process, but not longer than the timeout of the earliest started one
+            wait_timeout = None
+            if timeout:
+                earliest = min(worker.start_time for worker, _ in running.values())
+                wait_timeout = max(0, earliest + timeout - time.time())
+            if total_timeout is not None:
+                total_left = max(0, start_time + total_timeout - time.time())
+                wait_timeout = total_left if wait_timeout is None else min(wait_timeout, total_left)
+            ready = wait(list(running.keys()) + [worker.sentinel for worker, _ in running.values()], wait_timeout)
+
+            for conn, (worker, node) in list(running.items()):
+                if conn not in ready and worker.sentinel not in ready:
+                    if timeout and time.time() - worker.start_time >= timeout:
+                        del running[conn]
+                        tasks_done += 1
+                        kill(worker, node)
+                        node_timing[worker.name] = worker.elapsed
+                        yield node, None, worker.elapsed
+                    continue
+
+                del running[conn]
+                tasks_done += 1
+                node_results = worker.results
+                worker.join(5)
+                if worker.is_alive():
+                    kill(worker, node)
+                else:
+                    logger.info("process {} terminated with exit code {}".format(worker.name, worker.exitcode))
+                if worker.exception is not None:
+                    logger.info("Process {} has exception, record the error.".format(worker.name))
+                    failed_processes[worker.name] = {
+                        'exit_code': worker.exitcode,
+                        'exception': worker.exception
+                    }
+                if node_results is not None:
+                    results.update(node_results)
+                elif worker.name not in failed_processes:
+                    set_killed(worker, node)
+                node_timing[worker.name] = worker.elapsed
+                logger.info('Process {} finished in {:.1f} seconds, {}/{} done, {} running'.format(
+                    worker.name, worker.elapsed, tasks_done, total_tasks, len(running)))
+                yield node, node_results, worker.elapsed
+    finally:
+        # The caller may stop iterating before all the nodes are done
+        for worker, node in list(running.values()):
+            kill(worker, node)
 
     # if we have failed processes, we should log the exception and exit code
     # of each Process and fail
@@ -239,12 +269,47 @@ def parallel_run(
             pt_assert(False, failure_message)
 
     logger.info(
-        'Completed running processes for target "{}" in {} seconds'.format(
-            target.__name__, str(delta_time)
+        'Completed running processes for target "{}" in {} seconds, slowest: {}'.format(
+            target.__name__, str(datetime.timedelta(seconds=time.time() - start_time)),
+            ", ".join("{} {:.1f}s".format(name, elapsed) for name, elapsed in
+                      sorted(node_timing.items(), key=lambda item: item[1], reverse=True)[:5])
         )
     )
 
-    return dict(results)
+
+def parallel_run(
+    target, args, kwargs, nodes_list, timeout=None, concurrent_tasks=24, init_result=None, on_result=None
+):
+    """Run target function on nodes in parallel
+
+    Args:
+        target (function): The target function to be executed in parallel.
+        args (list of tuple): List of arguments for the target function.
+        kwargs (dict): Keyword arguments for the target function. It will be extended with two keys: 'node' and
+            'results'. The 'node' key will hold an item of the nodes list. The 'result' key will hold a dict for
+            returning execution results. The dict is sent back to the parent process when the target function returns,
+            and merged to the returned results.
+        nodes (list of nodes): List of nodes to be used by the target function
+        timeout (int or float, optional): Total time allowed for the spawned multiple processes to run. Defaults to
+            None. When timeout is specified, this function will wait at most 'timeout' seconds for the processes to
+            run. When time is up, this function will try to terminate or even kill all the processes.
+        on_result (function, optional): Called with (node, results of the node, seconds taken by the node) as soon
+            as each node finishes, for processing results while other nodes are still running. Results of the node
+            is None if the process of the node didn't finish the target function. See also parallel_run_iter.
+
+    Raises:
+        flag.: In case any of the spawned process cannot be terminated, fail the test.
+
+    Returns:
+        dict: Results of all the nodes.
+    """
+    results = {}
+    for node, node_results, elapsed in parallel_run_iter(
+            target, args, kwargs, nodes_list, timeout=timeout, concurrent_tasks=concurrent_tasks,
+            init_result=init_result, results=results):
+        if on_result:
+            on_result(node, node_results, elapsed)
+    return results
 
 
 def reset_ansible_local_tmp(target):
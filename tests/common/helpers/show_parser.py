@@ -0,0 +1,213 @@
+"""Parser engine for the tabular and JSON output of SONiC show commands.
+
+Tabular output is parsed into a columnar ShowTable: one list per column and interned column headers. Row dicts are only
+built when rows are accessed, and rows can be looked up by the value of a key column, like interface name, through an
+index built once per column.
+"""
+import json
+import logging
+import operator
+import re
+import sys
+
+logger = logging.getLogger(__name__)
+
+SEP_LINE_PATTERN = re.compile(r"^( *-+ *)+$")
+
+# Show commands supporting JSON output whose JSON keys are the same as the column headers of the tabular output, in
+# the format of {<key column>: {<column>: <value>}}. Item is (command pattern, JSON option, name of the key column).
+# Only add a command after comparing its JSON output with the tabular output captured on a DUT: the JSON output of
+# counters commands may have different values than the tabular output, like 'N/A' instead of '0'.
+JSON_SHOW_COMMANDS = []
+
+
+class ShowTable(object):
+    """Columnar table parsed from output of a show command.
+
+    The table can be used as a list of row dicts, keys of each row dict are the column headers in lowercase. Row dicts
+    are built on access, use column() or get() for not building dicts of all the rows.
+    """
+
+    def __init__(self, headers=None, columns=None):
+        self.headers = [sys.intern(header) for header in headers or []]
+        self.columns = columns if columns is not None else [[] for _ in self.headers]
+        self._column_index = dict((header, idx) for idx, header in enumerate(self.headers))
+        self._key_indexes = {}
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.row(idx)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.row(i) for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("ShowTable index out of range")
+        return self.row(idx)
+
+    def __repr__(self):
+        return "<ShowTable columns={} rows={}>".format(self.headers, len(self))
+
+    def row(self, idx):
+        """Build the row dict of the row at index idx."""
+        return dict(zip(self.headers, [column[idx] for column in self.columns]))
+
+    def column(self, header):
+        """Get the list of values of a column."""
+        return self.columns[self._column_index[header]]
+
+    def index(self, key):
+        """Get dict mapping value of the key column to row index. The index is built once per key column."""
+        if key not in self._key_indexes:
+            self._key_indexes[key] = dict((value, idx) for idx, value in enumerate(self.column(key)))
+        return self._key_indexes[key]
+
+    def get(self, value, key, default=None):
+        """Get the row dict with value in the key column, like table.get('Ethernet0', 'iface')."""
+        idx = self.index(key).get(value)
+        return default if idx is None else self.row(idx)
+
+    def filter(self, **conditions):
+        """Get row dicts matching all the conditions of {<column>: <value>}, like table.filter(oper='up')."""
+        columns = [(self.column(header), value) for header, value in conditions.items()]
+        return [self.row(idx) for idx in range(len(self)) if all(column[idx] == value for column, value in columns)]
+
+    def to_list(self):
+        """Get all the rows as list of dicts."""
+        return [dict(zip(self.headers, values)) for values in zip(*self.columns)]
+
+
+def parse_column_positions(sep_line, sep_char='-'):
+    """Parse the position of each columns in the command output
+
+    Args:
+        sep_line: The output line separating actual data and column headers
+        sep_char: The character used in separation line. Defaults to '-'.
+
+    Returns:
+        Returns a list. Each item is a tuple with two elements. The first element is start position of a column.
+        The second element is the end position of the column.
+    """
+    prev = ' ',
+    positions = []
+    for pos, char in enumerate(sep_line + ' '):
+        if char == sep_char:
+            if char != prev:
+                left = pos
+        else:
+            if char != prev:
+                right = pos
+                positions.append((left, right))
+        prev = char
+    return positions
+
+
+def parse_show_table(output_lines, header_len=1):
+    """Parse tabular output of a show command to ShowTable.
+
+    Args:
+        output_lines: Lines of the output. The column headers are followed by a separation line with '-' under each
+            column header.
+        header_len: Number of lines of the column headers.
+
+    Returns:
+        ShowTable. It is empty if the output can't be parsed.
+    """
+    for idx, line in enumerate(output_lines):
+        if SEP_LINE_PATTERN.match(line):
+            header_lines = output_lines[idx - header_len:idx]
+            sep_line = line
+            content_lines = output_lines[idx + 1:]
+            break
+    else:
+        logger.error('Failed to find separation line in the show command output')
+        return ShowTable()
+
+    try:
+        positions = parse_column_positions(sep_line)
+    except Exception as e:
+        logger.error('Possibly bad command output, exception: {}'.format(repr(e)))
+        return ShowTable()
+
+    headers = []
+    for (left, right) in positions:
+        header = " ".join([header_line[left:right].strip().lower() for header_line in header_lines]).strip()
+        headers.append(header)
+
+    # When an empty line is encountered while parsing the tabulate content, it is highly possible that the tabulate
+    # content has been drained. The empty line and rest of the lines should not be parsed.
+    try:
+        content_lines = content_lines[:content_lines.index('')]
+    except ValueError:
+        pass
+
+    # Slice all the columns of a line in one call, then transpose the rows to columns
+    slices = operator.itemgetter(*[slice(left, right) for (left, right) in positions])
+    if len(positions) == 1:
+        rows = [(slices(line).strip(), ) for line in content_lines]
+    else:
+        rows = [[value.strip() for value in slices(line)] for line in content_lines]
+    columns = [list(column) for column in zip(*rows)] if rows else [[] for _ in headers]
+    return ShowTable(headers, columns)
+
+
+def parse_show_json(output, key_column):
+    """Parse JSON output of a show command in the format of {<key>: {<column>: <value>}} to ShowTable.
+
+    Lines before the JSON object, like 'Last cached time was ...', are ignored. Column headers are the JSON keys in
+    lowercase, so they are the same as headers of the tabular output of commands in JSON_SHOW_COMMANDS.
+
+    Args:
+        output: Output of the command.
+        key_column: Header of the column of the top level JSON keys.
+
+    Returns:
+        ShowTable.
+
+    Raises:
+        ValueError: The output is not JSON object in the supported format.
+    """
+    start = output.find('{')
+    if start < 0:
+        raise ValueError('No JSON object in the show command output')
+    data = json.loads(output[start:])
+    if not isinstance(data, dict) or not all(isinstance(row, dict) for row in data.values()):
+        raise ValueError('Unsupported JSON format of the show command output')
+
+    headers = [key_column]
+    columns = [list(data)]
+    # Columns of the JSON keys, rows missing a key have None in the column
+    json_columns = {}
+    for row_idx, row in enumerate(data.values()):
+        for json_key, value in row.items():
+            column = json_columns.get(json_key)
+            if column is None:
+                column = json_columns[json_key] = [None] * row_idx
+                headers.append(json_key.lower())
+                columns.append(column)
+            elif len(column) < row_idx:
+                column.extend([None] * (row_idx - len(column)))
+            column.append(value if isinstance(value, str) else json.dumps(value))
+    for column in columns:
+        column.extend([None] * (len(data) - len(column)))
+    return ShowTable(headers, columns)
+
+
+def get_json_show_command(show_cmd):
+    """Get the JSON variant of a show command and header of its key column.
+
+    Returns:
+        Tuple of (JSON command, key column header), or (None, None) if the command doesn't support JSON output.
+    """
+    for pattern, json_option, key_column in JSON_SHOW_COMMANDS:
+        if pattern.match(show_cmd):
+            return "{} {}".format(show_cmd.rstrip(), json_option), key_column
+    return None, None
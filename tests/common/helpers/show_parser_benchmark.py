@@ -0,0 +1,160 @@
+"""Micro-benchmark of the show command parser engine.
+
+Compares the previous row-dict parser of SonicHost.show_and_parse with the columnar parser and the JSON parser of
+show_parser, over outputs of 'show interfaces counters', 'show queue counters' and 'show pfc counters' of a linecard
+with 512 ports. The outputs are built from the format of outputs captured on DUTs. The JSON parser is checked against
+the tabular and JSON outputs of 'show interfaces counters trim' captured on a DUT, see
+docs/testplan/Packet_Trimming_Testplan.md.
+
+Usage:
+    python -m tests.common.helpers.show_parser_benchmark [--ports 512] [--rounds 20]
+"""
+import argparse
+import json
+import re
+import timeit
+
+from tests.common.helpers.show_parser import parse_column_positions, parse_show_json, parse_show_table
+
+INTERFACE_COUNTERS_HEADER = [
+    "        IFACE    STATE    RX_OK        RX_BPS    RX_UTIL    RX_ERR    RX_DRP    RX_OVR    TX_OK        TX_BPS"
+    "    TX_UTIL    TX_ERR    TX_DRP    TX_OVR",
+    "-------------  -------  -------  ------------  ---------  --------  --------  --------  -------  ------------"
+    "  ---------  --------  --------  --------",
+]
+INTERFACE_COUNTERS_ROW = \
+    "{:>13}  {:>7}  {:>7}  {:>12}  {:>9}  {:>8}  {:>8}  {:>8}  {:>7}  {:>12}  {:>9}  {:>8}  {:>8}  {:>8}"
+
+QUEUE_COUNTERS_HEADER = [
+    "         Port    TxQ    Counter/pkts    Counter/bytes    Drop/pkts    Drop/bytes",
+    "-------------  -----  --------------  ---------------  -----------  ------------",
+]
+QUEUE_COUNTERS_ROW = "{:>13}  {:>5}  {:>14}  {:>15}  {:>11}  {:>12}"
+
+PFC_COUNTERS_HEADER = [
+    "      Port Rx    PFC0    PFC1    PFC2    PFC3    PFC4    PFC5    PFC6    PFC7",
+    "-------------  ------  ------  ------  ------  ------  ------  ------  ------",
+]
+PFC_COUNTERS_ROW = "{:>13}  {:>6}  {:>6}  {:>6}  {:>6}  {:>6}  {:>6}  {:>6}  {:>6}"
+
+# Outputs of 'show interfaces counters trim' and 'show interfaces counters trim --json' captured on a DUT
+CAPTURED_TRIM_COUNTERS = [
+    "    IFACE    STATE    TRIM_PKTS    TRIM_TX_PKTS    TRIM_DRP_PKTS",
+    "---------  -------  -----------  --------------  ---------------",
+    "Ethernet0        U          200             200                0",
+    "Ethernet1        U          100             100                0",
+]
+CAPTURED_TRIM_COUNTERS_JSON = """{
+    "Ethernet0": {
+        "STATE": "U",
+        "TRIM_DRP_PKTS": "N/A",
+        "TRIM_PKTS": "100",
+        "TRIM_TX_PKTS": "100"
+    },
+    "Ethernet1": {
+        "STATE": "U",
+        "TRIM_DRP_PKTS": "N/A",
+        "TRIM_PKTS": "100",
+        "TRIM_TX_PKTS": "100"
+    }
+}"""
+
+
+def build_outputs(ports):
+    """Build output lines of the show commands, and JSON output of 'show interfaces counters trim --json'."""
+    interfaces = ["Ethernet{}".format(idx * 8) for idx in range(ports)]
+    captured_row = next(iter(json.loads(CAPTURED_TRIM_COUNTERS_JSON).values()))
+
+    counters = INTERFACE_COUNTERS_HEADER[:]
+    for idx, intf in enumerate(interfaces):
+        values = [intf, "U", "{:,}".format(idx * 1000), "1.23 KB/s", "0.00%", "0", "{:,}".format(idx), "0",
+                  "{:,}".format(idx * 999), "4.56 KB/s", "0.00%", "0", "0", "0"]
+        counters.append(INTERFACE_COUNTERS_ROW.format(*values))
+
+    queue_counters = QUEUE_COUNTERS_HEADER[:]
+    for idx, intf in enumerate(interfaces):
+        for queue in ["UC{}".format(q) for q in range(10)] + ["MC{}".format(q) for q in range(10, 20)]:
+            queue_counters.append(QUEUE_COUNTERS_ROW.format(intf, queue, idx, idx * 64, 0, 0))
+
+    pfc_counters = PFC_COUNTERS_HEADER[:]
+    for idx, intf in enumerate(interfaces):
+        pfc_counters.append(PFC_COUNTERS_ROW.format(intf, *([idx] * 8)))
+
+    return {
+        "show interfaces counters": counters,
+        "show queue counters": queue_counters,
+        "show pfc counters": pfc_counters,
+    }, json.dumps(dict((intf, dict(captured_row)) for intf in interfaces), indent=4)
+
+
+def parse_show_rows(output_lines, header_len=1):
+    """The previous parser of SonicHost.show_and_parse building a dict per row, used as the baseline."""
+    result = []
+    sep_line_pattern = re.compile(r"^( *-+ *)+$")
+    for idx, line in enumerate(output_lines):
+        if sep_line_pattern.match(line):
+            header_lines = output_lines[idx - header_len:idx]
+            sep_line = output_lines[idx]
+            content_lines = output_lines[idx + 1:]
+            break
+    else:
+        return result
+
+    positions = parse_column_positions(sep_line)
+    headers = []
+    for (left, right) in positions:
+        headers.append(" ".join([header_line[left:right].strip().lower() for header_line in header_lines]).strip())
+    for content_line in content_lines:
+        if len(content_line) == 0:
+            break
+        item = {}
+        for idx, (left, right) in enumerate(positions):
+            item[headers[idx]] = content_line[left:right].strip()
+        result.append(item)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the show command parser engine")
+    parser.add_argument("--ports", type=int, default=512, help="Number of ports in the outputs")
+    parser.add_argument("--rounds", type=int, default=20, help="Number of rounds of each measurement")
+    args = parser.parse_args()
+
+    outputs, counters_json = build_outputs(args.ports)
+    lookup_key = "Ethernet{}".format((args.ports - 1) * 8)
+    key_columns = {"show interfaces counters": "iface", "show queue counters": "port", "show pfc counters": "port rx"}
+
+    print("{:<36} {:>8} {:>14} {:>14} {:>18} {:>18}".format(
+        "command", "rows", "rows (ms)", "columnar (ms)", "rows+lookup (ms)", "columnar+get (ms)"))
+    for cmd, lines in outputs.items():
+        key = key_columns[cmd]
+        assert parse_show_rows(lines) == parse_show_table(lines).to_list()
+
+        def _rows_lookup():
+            return [row for row in parse_show_rows(lines) if row[key] == lookup_key]
+
+        def _columnar_get():
+            return parse_show_table(lines).get(lookup_key, key)
+
+        timings = [timeit.timeit(func, number=args.rounds) * 1000 / args.rounds for func in (
+            lambda: parse_show_rows(lines), lambda: parse_show_table(lines), _rows_lookup, _columnar_get)]
+        print("{:<36} {:>8} {:>14.3f} {:>14.3f} {:>18.3f} {:>18.3f}".format(cmd, len(lines) - 2, *timings))
+
+    # The JSON output has the same columns and keys as the tabular output, the values can differ
+    captured_table = parse_show_table(CAPTURED_TRIM_COUNTERS)
+    captured_json_table = parse_show_json(CAPTURED_TRIM_COUNTERS_JSON, "iface")
+    assert sorted(captured_json_table.headers) == sorted(captured_table.headers)
+    assert captured_json_table.column("iface") == captured_table.column("iface")
+    assert captured_table.get("Ethernet1", "iface") == {
+        "iface": "Ethernet1", "state": "U", "trim_pkts": "100", "trim_tx_pkts": "100", "trim_drp_pkts": "0"}
+
+    json_table = parse_show_json(counters_json, "iface")
+    assert len(json_table) == args.ports
+    timing = timeit.timeit(lambda: parse_show_json(counters_json, "iface").get(lookup_key, "iface"),
+                           number=args.rounds) * 1000 / args.rounds
+    print("{:<36} {:>8} {:>14} {:>14} {:>18} {:>18.3f}".format(
+        "show interfaces counters trim --json", len(json_table), "-", "-", "-", timing))
+
+
+if __name__ == "__main__":
+    main()
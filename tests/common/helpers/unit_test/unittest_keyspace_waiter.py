@@ -0,0 +1,140 @@
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from tests.common.helpers.keyspace_waiter import KeyspaceEventStream, wait_until_event
+
+# Stand-in of 'redis-cli -h <host> -p <port> ... --csv psubscribe <pattern> ...': sends its arguments to the stand-in
+# redis-server and prints the lines received from it, like the output of the real redis-cli
+REDIS_CLI = '''
+import socket
+import sys
+
+args = sys.argv[1:]
+host, port = args[args.index('-h') + 1], int(args[args.index('-p') + 1])
+conn = socket.create_connection((host, port))
+conn.sendall((' '.join(args[args.index('psubscribe') + 1:]) + '\\n').encode())
+for line in conn.makefile('r'):
+    sys.stdout.write(line)
+    sys.stdout.flush()
+'''
+
+
+class RedisServerStandIn(object):
+    """Stand-in of redis-server sending keyspace notifications to the connected stand-in redis-cli."""
+
+    def __init__(self, subscribe=True):
+        self.subscribe = subscribe
+        self.connections = []
+        self.connected = threading.Event()
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.port = self.server.getsockname()[1]
+        self.thread = threading.Thread(target=self._accept)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            patterns = conn.makefile('r').readline().split()
+            if self.subscribe:
+                for index, pattern in enumerate(patterns):
+                    conn.sendall('"psubscribe","{}",{}\n'.format(pattern, index + 1).encode())
+            self.connections.append((conn, patterns))
+            self.connected.set()
+
+    def publish(self, key, event='hset'):
+        for conn, patterns in self.connections:
+            conn.sendall('"pmessage","{}","{}:{}","{}"\n'.format(
+                patterns[0], patterns[0].split(':', 1)[0], key, event).encode())
+
+    def close(self):
+        self.server.close()
+        for conn, _ in self.connections:
+            conn.close()
+
+
+class TestKeyspaceWaiter(unittest.TestCase):
+    """Test cases for waiting on keyspace notifications of a redis-server stand-in."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.redis_cli = os.path.join(self.tmpdir, 'redis-cli')
+        with open(self.redis_cli, 'w') as f:
+            f.write('#!{}\n{}'.format(sys.executable, REDIS_CLI))
+        os.chmod(self.redis_cli, 0o755)
+        self.keys = {}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def set_key_later(self, delay, key, server=None):
+        def _set_key():
+            time.sleep(delay)
+            self.keys[key] = 'up'
+            if server:
+                server.publish(key)
+        thread = threading.Thread(target=_set_key)
+        thread.daemon = True
+        thread.start()
+
+    def check_key(self, key):
+        return self.keys.get(key) == 'up'
+
+    # Test case: The waiter wakes up on the keyspace notification, well before the poll interval
+    def test_wake_up_on_event(self):
+        server = RedisServerStandIn()
+        stream = KeyspaceEventStream.local('STATE_DB', ['PORT_TABLE|*'], port=server.port, redis_cli=self.redis_cli)
+        try:
+            self.assertTrue(stream.start())
+            self.assertEqual(stream.psubscribe_args[:4], ['-n', '6', '--csv', 'psubscribe'])
+
+            self.set_key_later(0.5, 'PORT_TABLE|Ethernet0', server)
+            start_time = time.time()
+            self.assertTrue(wait_until_event(30, 10, 0, self.check_key, 'PORT_TABLE|Ethernet0', event_streams=[stream]))
+            self.assertLess(time.time() - start_time, 3)
+            self.assertEqual(stream.event_count, 1)
+            self.assertEqual(stream.last_key, 'PORT_TABLE|Ethernet0')
+        finally:
+            stream.close()
+            server.close()
+
+    # Test case: A stream failing to start falls back to polling every interval
+    def test_fall_back_to_polling_when_command_fails(self):
+        stream = KeyspaceEventStream.local('STATE_DB', ['PORT_TABLE|*'],
+                                           redis_cli=os.path.join(self.tmpdir, 'missing-redis-cli'))
+        self.assertFalse(stream.start())
+        self.assertFalse(stream.alive)
+
+        self.set_key_later(0.5, 'PORT_TABLE|Ethernet0')
+        start_time = time.time()
+        self.assertTrue(wait_until_event(10, 2, 0, self.check_key, 'PORT_TABLE|Ethernet0', event_streams=[stream]))
+        # Condition is checked at 0s and 2s
+        self.assertGreaterEqual(time.time() - start_time, 1.5)
+
+    # Test case: A stream not subscribed in time is closed, waiting falls back to polling
+    def test_fall_back_to_polling_when_not_subscribed(self):
+        server = RedisServerStandIn(subscribe=False)
+        stream = KeyspaceEventStream.local('STATE_DB', ['PORT_TABLE|*'], port=server.port, redis_cli=self.redis_cli)
+        try:
+            self.assertFalse(stream.start(timeout=1))
+            self.assertFalse(stream.alive)
+            self.assertFalse(wait_until_event(1, 0.2, 0, self.check_key, 'PORT_TABLE|Ethernet0',
+                                              event_streams=[stream]))
+        finally:
+            stream.close()
+            server.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import time
+import unittest
+
+import pytest
+
+from tests.common.helpers.parallel import parallel_run, parallel_run_iter
+
+INIT_RESULT = {"failed": False, "check_items": []}
+
+
+class Node(object):
+
+    def __init__(self, hostname):
+        self.hostname = hostname
+
+    def __str__(self):
+        return self.hostname
+
+
+def check_node(delay, node=None, results=None):
+    """Target of the workers, updates the initial results of the node like sanity checks."""
+    time.sleep(delay)
+    results[node.hostname]["check_items"].append("{} checked".format(node.hostname))
+
+
+def check_node_slow_or_fail(slow_host, failed_host, node=None, results=None):
+    if node.hostname == slow_host:
+        time.sleep(60)
+    if node.hostname == failed_host:
+        raise ValueError("check of {} failed".format(node.hostname))
+    results[node.hostname] = {"host": node.hostname, "failed": False}
+
+
+class TestParallelRun(unittest.TestCase):
+    """Test cases for running a target function on nodes in parallel processes."""
+
+    # Test case: Results set by the workers are merged into the initial results of each node
+    def test_merge_init_result(self):
+        nodes = [Node("dut{}".format(idx)) for idx in range(4)]
+
+        results = parallel_run(check_node, (0.1, ), {}, nodes, timeout=30, concurrent_tasks=2, init_result=INIT_RESULT)
+
+        self.assertEqual(results, {
+            node.hostname: {"failed": False, "check_items": ["{} checked".format(node.hostname)], "host": node.hostname}
+            for node in nodes})
+        # The initial results are copied for each node, not changed by the workers
+        self.assertEqual(INIT_RESULT, {"failed": False, "check_items": []})
+
+    # Test case: A worker not done in time is killed, its node has the initial results marked as failed
+    def test_worker_timeout(self):
+        nodes = [Node("dut0"), Node("dut1")]
+        finished = {}
+
+        def _on_result(node, node_results, elapsed):
+            finished[node.hostname] = node_results
+
+        start_time = time.time()
+        results = parallel_run(check_node_slow_or_fail, ("dut1", None), {}, nodes, timeout=2,
+                               init_result=INIT_RESULT, on_result=_on_result)
+
+        self.assertLess(time.time() - start_time, 20)
+        self.assertEqual(results["dut0"], {"host": "dut0", "failed": False})
+        self.assertEqual(results["dut1"], {"host": "dut1", "failed": True, "check_items": []})
+        self.assertIsNotNone(finished["dut0"])
+        self.assertIsNone(finished["dut1"])
+
+    # Test case: The exception of a worker is raised to the caller after the other nodes are done
+    def test_worker_exception(self):
+        nodes = [Node("dut0"), Node("dut1"), Node("dut2")]
+        results = {}
+
+        with self.assertRaises(pytest.fail.Exception) as context:
+            for _ in parallel_run_iter(check_node_slow_or_fail, (None, "dut1"), {}, nodes, timeout=30,
+                                       results=results):
+                pass
+
+        self.assertIn("check_node_slow_or_fail--dut1", str(context.exception))
+        self.assertIn("ValueError", str(context.exception))
+        self.assertIn("check of dut1 failed", str(context.exception))
+        self.assertEqual(results, {"dut0": {"host": "dut0", "failed": False},
+                                   "dut2": {"host": "dut2", "failed": False}})
+
+
+if __name__ == "__main__":
+    unittest.main()
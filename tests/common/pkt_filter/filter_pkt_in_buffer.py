@@ -3,16 +3,27 @@ from collections import OrderedDict
 import sys
 import time
 import json
-import copy
 
 import ptf.mask as mask
 import ptf.packet as packet
+from scapy import fields as scapy_fields
 
 if sys.version_info.major > 2:
     NATIVE_TYPE = (int, float, bool, list, dict, tuple, set, str, bytes, type(None))
 else:
     NATIVE_TYPE = (int, float, long, bool, list, dict, tuple, set, str, bytes, unicode, type(None))     # noqa: F821
 
+# Bit fields have size in bits, other fixed size fields have size in bytes
+BIT_FIELD_TYPES = tuple(getattr(scapy_fields, name) for name in ('_BitField', 'BitField')
+                        if hasattr(scapy_fields, name))
+# Wrapper of fields only for display, like IP src and dst in newer scapy
+EMPH_FIELD_TYPE = getattr(scapy_fields, 'Emph', None)
+# Fields selecting the next layer or the header length, packets with equal values have the same layout
+STRUCTURE_FIELDS = ('type', 'version', 'ihl', 'proto', 'nh', 'sport', 'dport')
+NEXT_LAYER_FIELDS = ('type', 'proto', 'nh')
+DEFAULT_TIMEOUT = 3
+DEFAULT_POLL_INTERVAL = 0.5
+
 
 def _parse_layer(layer):
     """
@@ -69,11 +80,150 @@ def convert_pkt_to_dict(pkt):
     return packet_dict
 
 
+def _field_bit_span(layer, layer_offset, field_name):
+    """
+    Get bit offset and bit width of a field in packet
+
+    Args:
+        layer: Layer of packet
+        layer_offset: Byte offset of the layer in packet
+        field_name: Name of field
+
+    Returns:
+        Tuple of bit offset and bit width, None if any field before it has variable size
+    """
+    bit_offset = layer_offset * 8
+    for field in layer.fields_desc:
+        if EMPH_FIELD_TYPE and isinstance(field, EMPH_FIELD_TYPE):
+            field = field.fld
+        if isinstance(field, BIT_FIELD_TYPES):
+            bits = field.size
+        elif isinstance(field, scapy_fields.Field) and type(field).i2len is scapy_fields.Field.i2len:
+            bits = field.sz * 8
+        else:
+            return None
+        if bits <= 0:
+            return None
+        if field.name == field_name:
+            return bit_offset, bits
+        bit_offset += bits
+    return None
+
+
+class FieldOffsetMatcher(object):
+    """
+    Match fields of packets on raw bytes
+
+    Fields are resolved to byte ranges and masks once from the expected packet. Received packets with the same layout
+    are matched by comparing the byte ranges, without building scapy packets. The layout is checked by comparing the
+    fields selecting the next layer, like Ether type and IP proto, of the layers up to the deepest matched layer.
+    """
+    def __init__(self, pkt, match_fields):
+        """
+        Initialize matcher
+
+        Args:
+            pkt: Expected packet
+            match_fields: List of packet fields that should be matched
+        """
+        self.resolved = True
+        self.never_match = False
+        self.fields = []
+        self.structure = []
+        self.min_length = 0
+
+        exp_bytes = bytes(pkt)
+        layers = []
+        while True:
+            layer = pkt.getlayer(len(layers))
+            if not layer:
+                break
+            layers.append(layer)
+        names = [layer.name for layer in layers]
+
+        deepest = -1
+        for layer_name, field_name in match_fields:
+            if layer_name not in names:
+                # Field missing in expected packet never matches
+                self.never_match = True
+                return
+            # Packet dictionary keeps the last layer with the same name
+            index = len(names) - 1 - names[::-1].index(layer_name)
+            layer = layers[index]
+            if field_name not in [field.name for field in layer.fields_desc] or \
+                    getattr(layer, field_name) is None:
+                self.never_match = True
+                return
+            if not isinstance(getattr(layer, field_name), NATIVE_TYPE):
+                self.resolved = False
+                return
+            span = _field_bit_span(layer, len(exp_bytes) - len(layer), field_name)
+            if span is None:
+                self.resolved = False
+                return
+            self.fields.append(self.__make_check(exp_bytes, *span))
+            deepest = max(deepest, index)
+
+        for index in range(deepest + 1):
+            layer = layers[index]
+            structure_fields = STRUCTURE_FIELDS if index < deepest else NEXT_LAYER_FIELDS
+            for field in layer.fields_desc:
+                if field.name not in structure_fields:
+                    continue
+                span = _field_bit_span(layer, len(exp_bytes) - len(layer), field.name)
+                if span is None:
+                    self.resolved = False
+                    return
+                self.structure.append(self.__make_check(exp_bytes, *span))
+
+        self.min_length = max([end for _, end, _, _ in self.fields + self.structure] or [0])
+
+    @staticmethod
+    def __make_check(exp_bytes, bit_offset, bits):
+        """
+        Make check of a field: byte range, bit mask (None if byte aligned) and expected value
+        """
+        start = bit_offset // 8
+        end = (bit_offset + bits + 7) // 8
+        if bit_offset % 8 == 0 and bits % 8 == 0:
+            return start, end, None, exp_bytes[start:end]
+        shift = end * 8 - bit_offset - bits
+        field_mask = ((1 << bits) - 1) << shift
+        return start, end, field_mask, int.from_bytes(exp_bytes[start:end], 'big') & field_mask
+
+    @staticmethod
+    def __check(data, checks):
+        for start, end, field_mask, value in checks:
+            if field_mask is None:
+                if data[start:end] != value:
+                    return False
+            elif int.from_bytes(data[start:end], 'big') & field_mask != value:
+                return False
+        return True
+
+    def match(self, data):
+        """
+        Match raw packet
+
+        Args:
+            data: Raw bytes of received packet
+
+        Returns:
+            True or False if decided on raw bytes, None if packet layout is different and it should be parsed
+        """
+        if self.never_match:
+            return False
+        if not self.resolved or len(data) < self.min_length or not self.__check(data, self.structure):
+            return None
+        return self.__check(data, self.fields)
+
+
 class FilterPktBuffer(object):
     """
     FilterPktBuffer class for finding of packets in the buffer of PTF
     """
-    def __init__(self, ptfadapter, exp_pkt, dst_port_numbers, match_fields=None, ignore_fields=None):
+    def __init__(self, ptfadapter, exp_pkt, dst_port_numbers, match_fields=None, ignore_fields=None,
+                 timeout=DEFAULT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL):
         """
         Initialize an object for finding packets in the buffer
 
@@ -83,6 +233,9 @@ class FilterPktBuffer(object):
             dst_port_numbers: Destination port numbers
             match_fields: List of packet fields that should be matched
             ignore_fields: List of packet fields that should be ignored
+            timeout: Maximum time in seconds to wait for expected packets
+            poll_interval: Interval in seconds of checking the buffer. Waiting stops once expected packets are found
+                and no more packets arrived in the interval
         """
         self.received_pkt = None
         self.received_pkt_diff = []
@@ -98,9 +251,14 @@ class FilterPktBuffer(object):
         if ignore_fields is None:
             ignore_fields = []
         self.ignore_fields = ignore_fields
+        self.timeout = timeout
+        self.poll_interval = poll_interval
 
         self.masked_exp_pkt = mask.Mask(self.pkt)
         self.pkt_dict = convert_pkt_to_dict(self.pkt)
+        self.matcher = FieldOffsetMatcher(self.pkt, self.match_fields)
+        # Results of packets matched by comparing packet dictionaries, keyed by raw bytes of packet
+        self.parsed_pkt_results = {}
 
         self.__ignore_fields()
 
@@ -121,7 +279,7 @@ class FilterPktBuffer(object):
         Returns:
             Packet dictionary without ignored fields
         """
-        pkt_dict = copy.deepcopy(pkt_dict)
+        pkt_dict = OrderedDict((layer, dict(fields)) for layer, fields in pkt_dict.items())
 
         for field, value in self.ignore_fields:
             if pkt_dict.get(field):
@@ -129,6 +287,26 @@ class FilterPktBuffer(object):
 
         return pkt_dict
 
+    def __match_pkt_dict(self, raw_pkt):
+        """
+        Match fields of received packet by comparing packet dictionaries
+
+        Args:
+            raw_pkt: Raw bytes of received packet
+
+        Returns:
+            Bool value
+        """
+        packet_dict = convert_pkt_to_dict(packet.Ether(raw_pkt))
+
+        for field, value in self.match_fields:
+            try:
+                if packet_dict[field][value] != self.pkt_dict[field][value]:
+                    return False
+            except KeyError:
+                return False
+        return True
+
     def __find_pkt_in_buffer(self, dst_port_number):
         """
         Find expected packet in buffer by using matched fields
@@ -136,27 +314,24 @@ class FilterPktBuffer(object):
         Returns:
             Received packet
         """
-        time.sleep(3)
         common_buffer = self.ptfadapter.dataplane.packet_queues
         packet_buffer = common_buffer[(0, dst_port_number)][:]
         matched_index = 0
-        received_pkt = None
+        received_raw_pkt = None
 
         for pkt in packet_buffer:
-            packet_dict = convert_pkt_to_dict(packet.Ether(pkt[0]))
-
-            for field, value in self.match_fields:
-                try:
-                    if packet_dict[field][value] != self.pkt_dict[field][value]:
-                        break
-                except KeyError:
-                    break
-            else:
+            matched = self.matcher.match(pkt[0])
+            if matched is None:
+                matched = self.parsed_pkt_results.get(pkt[0])
+                if matched is None:
+                    matched = self.__match_pkt_dict(pkt[0])
+                    self.parsed_pkt_results[pkt[0]] = matched
+            if matched:
                 matched_index += 1
-                received_pkt = packet.Ether(pkt[0])
+                received_raw_pkt = pkt[0]
 
-        if received_pkt:
-            return ({dst_port_number: matched_index}, received_pkt)
+        if received_raw_pkt is not None:
+            return ({dst_port_number: matched_index}, packet.Ether(received_raw_pkt))
 
         return (None, None)
 
@@ -211,9 +386,21 @@ class FilterPktBuffer(object):
         Returns:
             Bool value or difference between received packet and expected packet
         """
-        for dst_port in self.dst_port_numbers:
-            matched_index, received_pkt = self.__find_pkt_in_buffer(dst_port)
+        # Poll the buffer until expected packets are found and no more packets arrive, or timeout
+        common_buffer = self.ptfadapter.dataplane.packet_queues
+        deadline = time.time() + self.timeout
+        last_buffer_size = None
+        while True:
+            time.sleep(max(min(self.poll_interval, deadline - time.time()), 0))
+            buffer_size = sum(len(common_buffer.get((0, dst_port), [])) for dst_port in self.dst_port_numbers)
+            timed_out = time.time() >= deadline
+            if buffer_size == last_buffer_size or timed_out:
+                results = [self.__find_pkt_in_buffer(dst_port) for dst_port in self.dst_port_numbers]
+                if timed_out or any(received_pkt for _, received_pkt in results):
+                    break
+            last_buffer_size = buffer_size
 
+        for matched_index, received_pkt in results:
             if received_pkt:
                 self.received_pkt = received_pkt
                 self.matched_index.update(matched_index)
@@ -8,12 +8,14 @@ import logging
 import os
 import re
 import subprocess
+import time
 import yaml
 import glob
 import pytest
 
 from tests.common.testbed import TestbedInfo
-from .issue import check_issues
+from .issue import check_issues, IssueStatusResolver, DEFAULT_ISSUE_STATUS_CACHE_FILE, \
+    DEFAULT_ISSUE_STATUS_TTL, DEFAULT_MAX_WORKERS
 from tests.common.utilities import get_duts_from_host_pattern
 
 logger = logging.getLogger(__name__)
@@ -30,6 +32,12 @@ MARK_CONDITIONS_CONSTANTS = {
                      't2', 't2_2lc_36p-masic', 't2_2lc_min_ports-masic',
                      'lt2-p32o64', 'lt2-o128', 'ft2-64']
 }
+ISSUE_URL_PATTERN = re.compile('https?://[^ )]+')
+
+# Code objects of condition strings compiled for eval(), keyed by the condition string
+_compiled_conditions = {}
+# Condition strings with issue URLs replaced by issue state, keyed by the raw condition string
+_resolved_conditions = {}
 
 
 def pytest_addoption(parser):
@@ -65,6 +73,29 @@ def pytest_addoption(parser):
         help="Dynamically update the skip reason based on the conditions, "
              "by default it will not use the static reason specified in the mark conditions file")
 
+    parser.addoption(
+        '--issue-status-cache-file',
+        action='store',
+        dest='issue_status_cache_file',
+        default=DEFAULT_ISSUE_STATUS_CACHE_FILE,
+        help="Location of the issue status cache file shared by test runs. Empty string to disable it.")
+
+    parser.addoption(
+        '--issue-status-ttl',
+        action='store',
+        dest='issue_status_ttl',
+        type=int,
+        default=DEFAULT_ISSUE_STATUS_TTL,
+        help="Time to live in seconds of issue status in the cache file.")
+
+    parser.addoption(
+        '--issue-status-workers',
+        action='store',
+        dest='issue_status_workers',
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Maximum number of issues checked concurrently.")
+
 
 def load_conditions(session):
     """Load the content from mark conditions file
@@ -423,45 +454,93 @@ def load_basic_facts(dut_name, session):
     return results
 
 
+class ConditionsIndex(object):
+    """Index of the conditions list for finding the entries matching a test case name.
+
+    Prefix entries are stored in a character trie, so looking up a test case name only walks the characters of the
+    name instead of checking every entry. Regex entries are compiled once. Matches are returned in the order of the
+    conditions list, which is significant for entries with 'use_longest'.
+    """
+    ENTRIES = None      # Key of the list of entry positions in a trie node, can't collide with single characters
+
+    def __init__(self, conditions):
+        self.conditions = conditions
+        self.trie = {}
+        self.regex_entries = []
+        self.use_longest = set()
+
+        for position, condition in enumerate(conditions):
+            # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
+            condition_entry = list(condition.keys())[0]
+            condition_items = condition[condition_entry]
+            if "regex" in condition_items.keys():
+                assert isinstance(condition_items["regex"], bool), \
+                    "The value of 'regex' in the mark conditions yaml should be bool type."
+                if condition_items["regex"] is True:
+                    self.regex_entries.append((position, re.compile(condition_entry)))
+                continue
+
+            if "use_longest" in condition_items.keys():
+                assert isinstance(condition_items["use_longest"], bool), \
+                    "The value of 'use_longest' in the mark conditions yaml should be bool type."
+                if condition_items["use_longest"] is True:
+                    self.use_longest.add(position)
+
+            node = self.trie
+            for char in condition_entry:
+                node = node.setdefault(char, {})
+            node.setdefault(self.ENTRIES, []).append(position)
+
+    def __len__(self):
+        return len(self.conditions)
+
+    def find(self, nodeid):
+        """Find the conditions matching the test case name.
+
+        Args:
+            nodeid (str): Full test case name
+
+        Returns:
+            list: Matching conditions in the order of the conditions list. Matches before the last matching entry
+                with 'use_longest: True' are dropped.
+        """
+        positions = list(self.trie.get(self.ENTRIES, []))
+        node = self.trie
+        for char in nodeid:
+            node = node.get(char)
+            if node is None:
+                break
+            positions.extend(node.get(self.ENTRIES, []))
+
+        positions.extend(position for position, pattern in self.regex_entries if pattern.search(nodeid))
+        positions.sort()
+
+        all_matches = []
+        for position in positions:
+            if position in self.use_longest:
+                all_matches = []
+            all_matches.append(self.conditions[position])
+        return all_matches
+
+
 def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, basic_facts):
     """Find all matches of the given test case name in the conditions list.
 
     Args:
         nodeid (str): Full test case name
-        conditions (list): List of conditions
+        conditions (list or ConditionsIndex): List of conditions, or index of the list built by ConditionsIndex to
+            avoid building it for each test case
 
     Returns:
         list: All match test case name or None if not found
     """
-    all_matches = []
     max_length = -1
     conditional_marks = {}
     matches = []
 
-    for condition in conditions:
-        # condition is a dict which has only one item, so we use condition.keys()[0] to get its key.
-        condition_entry = list(condition.keys())[0]
-        condition_items = condition[condition_entry]
-        if "regex" in condition_items.keys():
-            assert isinstance(condition_items["regex"], bool), \
-                "The value of 'regex' in the mark conditions yaml should be bool type."
-            if condition_items["regex"] is True:
-                match = re.search(condition_entry, nodeid)
-            else:
-                match = None
-
-        elif "use_longest" in condition_items.keys():
-            assert isinstance(condition_items["use_longest"], bool), \
-                "The value of 'use_longest' in the mark conditions yaml should be bool type."
-            if nodeid.startswith(condition_entry) and condition_items["use_longest"] is True:
-                all_matches = []
-
-            match = nodeid.startswith(condition_entry)
-        else:
-            match = nodeid.startswith(condition_entry)
-
-        if match:
-            all_matches.append(condition)
+    if not isinstance(conditions, ConditionsIndex):
+        conditions = ConditionsIndex(conditions)
+    all_matches = conditions.find(nodeid)
 
     for match in all_matches:
         case_starting_substring = list(match.keys())[0]
@@ -502,6 +581,46 @@ def find_all_matches(nodeid, conditions, session, dynamic_update_skip_reason, ba
     return matches
 
 
+def find_issue_urls(conditions):
+    """Find all issue URLs in the condition strings of the conditions list.
+
+    Args:
+        conditions (list): List of conditions
+
+    Returns:
+        set: Issue URLs.
+    """
+    issues = set()
+    for condition in conditions:
+        for mark_details in list(condition.values())[0].values():
+            if not isinstance(mark_details, dict):
+                continue
+            mark_conditions = mark_details.get('conditions')
+            if isinstance(mark_conditions, str):
+                mark_conditions = [mark_conditions]
+            for condition_str in mark_conditions or []:
+                if isinstance(condition_str, str):
+                    issues.update(ISSUE_URL_PATTERN.findall(condition_str))
+    return issues
+
+
+def resolve_issue_status(session, conditions):
+    """Check state of all the issues in the conditions list at once and cache the result for update_issue_status.
+
+    Args:
+        session (obj): Pytest session object.
+        conditions (list): List of conditions
+    """
+    issues = find_issue_urls(conditions)
+    if not issues:
+        return
+    resolver = IssueStatusResolver(cache_file=session.config.option.issue_status_cache_file,
+                                   ttl=session.config.option.issue_status_ttl,
+                                   max_workers=session.config.option.issue_status_workers,
+                                   proxies=session.config.cache.get('PROXIES', {}))
+    session.config.cache.set('ISSUE_STATUS', resolver.resolve(issues))
+
+
 def update_issue_status(condition_str, session):
     """Replace issue URL with 'True' or 'False' based on its active state.
 
@@ -517,10 +636,15 @@ def update_issue_status(condition_str, session):
     Returns:
         str: New condition string with issue URLs already replaced with 'True' or 'False'.
     """
-    issues = re.findall('https?://[^ )]+', condition_str)
+    if condition_str in _resolved_conditions:
+        return _resolved_conditions[condition_str]
+
+    issues = ISSUE_URL_PATTERN.findall(condition_str)
     if not issues:
         logger.debug('No issue specified in condition')
+        _resolved_conditions[condition_str] = condition_str
         return condition_str
+    raw_condition_str = condition_str
 
     issue_status_cache = session.config.cache.get('ISSUE_STATUS', {})
     proxies = session.config.cache.get('PROXIES', {})
@@ -539,9 +663,26 @@ def update_issue_status(condition_str, session):
             replace_str = 'True'
 
         condition_str = condition_str.replace(issue_url, replace_str)
+    _resolved_conditions[raw_condition_str] = condition_str
     return condition_str
 
 
+def compile_condition(condition_str):
+    """Compile a condition string for eval(), the code object is cached to be reused by other test cases.
+
+    Args:
+        condition_str (str): Condition string with issue URLs already replaced.
+
+    Returns:
+        code: Code object of the condition string.
+    """
+    code = _compiled_conditions.get(condition_str)
+    if code is None:
+        code = compile(condition_str, '<condition>', 'eval')
+        _compiled_conditions[condition_str] = code
+    return code
+
+
 def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basic_facts, session):
     """Evaluate a condition string based on supplied basic facts.
 
@@ -563,7 +704,7 @@ def evaluate_condition(dynamic_update_skip_reason, mark_details, condition, basi
 
     condition_str = update_issue_status(condition, session)
     try:
-        condition_result = bool(eval(condition_str, basic_facts))
+        condition_result = bool(eval(compile_condition(condition_str), basic_facts))
         if condition_result and dynamic_update_skip_reason:
             mark_details['reason'].append(condition)
         return condition_result
@@ -620,6 +761,7 @@ def pytest_collection(session):
 
     # Always clear cached conditions of previous run.
     session.config.cache.set('TESTS_MARK_CONDITIONS', None)
+    _resolved_conditions.clear()
 
     if session.config.option.ignore_conditional_mark:
         logger.info('Ignore conditional mark')
@@ -632,6 +774,8 @@ def pytest_collection(session):
         # Only load basic facts if conditions are defined.
         get_basic_facts(session)
 
+        resolve_issue_status(session, conditions)
+
 
 def pytest_collection_modifyitems(session, config, items):
     """Hook for adding marks to test cases based on conditions defind in a centralized file.
@@ -656,10 +800,17 @@ def pytest_collection_modifyitems(session, config, items):
         json.dumps(basic_facts, indent=2)))
     dynamic_update_skip_reason = session.config.option.dynamic_update_skip_reason
     basic_facts['constants'] = MARK_CONDITIONS_CONSTANTS
+
+    start_time = time.time()
+    conditions_index = ConditionsIndex(conditions)
+    index_time = time.time() - start_time
+    matched_items = 0
     for item in items:
-        all_matches = find_all_matches(item.nodeid, conditions, session, dynamic_update_skip_reason, basic_facts)
+        all_matches = find_all_matches(item.nodeid, conditions_index, session, dynamic_update_skip_reason,
+                                       basic_facts)
 
         if all_matches:
+            matched_items += 1
             logger.debug('Found match "{}" for test case "{}"'.format(all_matches, item.nodeid))
 
             for match in all_matches:
@@ -702,3 +853,8 @@ def pytest_collection_modifyitems(session, config, items):
 
                         logger.debug('Adding mark {} to {}'.format(mark, item.nodeid))
                         item.add_marker(mark)
+
+    logger.info('Conditional mark took {:.3f}s for {} test items, {} items matched. {} condition entries indexed in '
+                '{:.3f}s, {} regex entries. {} condition strings compiled, {} resolved'.format(
+                    time.time() - start_time, len(items), matched_items, len(conditions_index), index_time,
+                    len(conditions_index.regex_entries), len(_compiled_conditions), len(_resolved_conditions)))
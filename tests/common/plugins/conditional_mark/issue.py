@@ -1,10 +1,12 @@
 """For checking issue state based on supplied issue URL.
 """
+import json
 import logging
-import multiprocessing
 import os
 import re
+import time
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlencode
 
 import requests
@@ -12,6 +14,10 @@ import six
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_ISSUE_STATUS_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'sonic-mgmt', 'issue_status.json')
+DEFAULT_ISSUE_STATUS_TTL = 4 * 3600
+DEFAULT_MAX_WORKERS = 16
+
 
 class IssueCheckerBase(six.with_metaclass(ABCMeta, object)):
     """Base class for issue checker
@@ -19,6 +25,8 @@ class IssueCheckerBase(six.with_metaclass(ABCMeta, object)):
 
     def __init__(self, url):
         self.url = url
+        # Set to True by is_active if the issue state is really fetched, instead of assuming the issue is active
+        self.resolved = False
 
     @abstractmethod
     def is_active(self):
@@ -36,7 +44,12 @@ class GitHubIssueChecker(IssueCheckerBase):
 
     def __init__(self, url, proxies):
         super(GitHubIssueChecker, self).__init__(url)
-        self.api_url = url.replace('github.com', 'api.github.com/repos')
+        # The API URL can be pointed to a local stub server, for example in tests
+        api_base_url = os.getenv("SONIC_AUTOMATION_GITHUB_API_URL")
+        if api_base_url:
+            self.api_url = re.sub(r'^https?://[^/]*github\.com', api_base_url.rstrip('/'), url)
+        else:
+            self.api_url = url.replace('github.com', 'api.github.com/repos')
         self.proxies = proxies
 
     def is_active(self):
@@ -82,6 +95,7 @@ class GitHubIssueChecker(IssueCheckerBase):
                 return True
 
         # Check issue state
+        self.resolved = True
         if issue_data.get('state') == 'closed':
             logger.debug(f"Issue {direct_url} is closed.")
             labels = issue_data.get('labels', [])
@@ -115,35 +129,110 @@ def issue_checker_factory(url, proxies):
     return None
 
 
-def check_issues(issues, proxies=None):
+def _run_checkers(issues, proxies, max_workers):
+    """Check state of the issues concurrently with a bounded thread pool.
+
+    Returns:
+        list: Tuples of (checker, is_active) of the checked issues.
+    """
+    checkers = [c for c in [issue_checker_factory(issue, proxies) for issue in sorted(set(issues))] if c is not None]
+    if not checkers:
+        logger.error('No checker created for issues: {}'.format(issues))
+        return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(checkers)))) as executor:
+        return list(zip(checkers, executor.map(lambda checker: checker.is_active(), checkers)))
+
+
+def check_issues(issues, proxies=None, max_workers=DEFAULT_MAX_WORKERS):
     """Check state of the specified issues.
 
-    Because issue state checking may involve sending HTTP request. This function uses parallel run to speed up
+    Because issue state checking may involve sending HTTP request. This function uses a thread pool to speed up
     issue status checking.
 
     Args:
         issues (list of str): List of issue URLs.
+        max_workers (int): Maximum number of issues checked concurrently.
 
     Returns:
         dict: Issue state check result. Key is issue URL, value is either True or False based on issue state.
     """
-    checkers = [c for c in [issue_checker_factory(issue, proxies) for issue in issues] if c is not None]
-    if not checkers:
-        logger.error('No checker created for issues: {}'.format(issues))
-        return {}
+    return {checker.url: active for checker, active in _run_checkers(issues, proxies, max_workers)}
+
 
-    check_results = multiprocessing.Manager().dict()
-    check_procs = []
+class IssueStatusResolver(object):
+    """Resolve issue states with a persistent cache shared by test runs.
 
-    def _check_issue(checker, results):
-        results[checker.url] = checker.is_active()
+    The issue states are cached in a json file like {url: {"active": bool, "timestamp": float}}. The file can be
+    shared by test runs of different checkouts on the same server. Cached states older than TTL are checked again.
+    Only the states really fetched are cached, issues assumed active because of access failure are checked again by
+    the next run.
+    """
 
-    for checker in checkers:
-        check_procs.append(multiprocessing.Process(target=_check_issue, args=(checker, check_results,)))
+    def __init__(self, cache_file=DEFAULT_ISSUE_STATUS_CACHE_FILE, ttl=DEFAULT_ISSUE_STATUS_TTL,
+                 max_workers=DEFAULT_MAX_WORKERS, proxies=None):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.proxies = proxies
 
-    for proc in check_procs:
-        proc.start()
-    for proc in check_procs:
-        proc.join(timeout=60)
+    def _load(self):
+        if not self.cache_file or not os.path.isfile(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file) as f:
+                cached = json.load(f)
+            return cached if isinstance(cached, dict) else {}
+        except (IOError, ValueError) as e:
+            logger.warning('Load issue status cache {} failed: {}'.format(self.cache_file, repr(e)))
+            return {}
+
+    def _save(self, new_states):
+        if not self.cache_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)), exist_ok=True)
+            # Merge with the states saved by other test runs meanwhile, and replace the file atomically
+            cached = self._load()
+            cached.update(new_states)
+            tmp_file = '{}.{}.tmp'.format(self.cache_file, os.getpid())
+            with open(tmp_file, 'w') as f:
+                json.dump(cached, f, indent=2)
+            os.replace(tmp_file, self.cache_file)
+        except (IOError, OSError) as e:
+            logger.warning('Save issue status cache {} failed: {}'.format(self.cache_file, repr(e)))
+
+    def resolve(self, issues):
+        """Get state of the issues, check the issues not cached or expired concurrently.
+
+        Args:
+            issues (list of str): List of issue URLs.
 
-    return dict(check_results)
+        Returns:
+            dict: Key is issue URL, value is either True or False based on issue state.
+        """
+        now = time.time()
+        cached = self._load()
+        results = {}
+        unknown_issues = []
+        for issue in set(issues):
+            entry = cached.get(issue)
+            if isinstance(entry, dict) and now - entry.get('timestamp', 0) <= self.ttl:
+                results[issue] = entry.get('active', True)
+            else:
+                unknown_issues.append(issue)
+        cached_count = len(results)
+
+        if unknown_issues:
+            start_time = time.time()
+            new_states = {}
+            for checker, active in _run_checkers(unknown_issues, self.proxies, self.max_workers):
+                results[checker.url] = active
+                if checker.resolved:
+                    new_states[checker.url] = {'active': active, 'timestamp': now}
+            self._save(new_states)
+            logger.info('Checked {} issues in {:.2f}s, {} resolved'.format(
+                len(unknown_issues), time.time() - start_time, len(new_states)))
+
+        logger.info('Issue status: {} issues, {} from cache {}'.format(len(results), cached_count, self.cache_file))
+        return results
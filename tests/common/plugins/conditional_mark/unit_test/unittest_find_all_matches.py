@@ -1,7 +1,8 @@
 import logging
+import re
 import unittest
 from unittest.mock import MagicMock
-from tests.common.plugins.conditional_mark import find_all_matches, load_conditions
+from tests.common.plugins.conditional_mark import find_all_matches, load_conditions, ConditionsIndex
 
 logger = logging.getLogger(__name__)
 
@@ -9,6 +10,27 @@ DYNAMIC_UPDATE_SKIP_REASON = False
 CUSTOM_BASIC_FACTS = {"asic_type": "vs", "topo_type": "t0"}
 
 
+# Conditions for index tests, the regex entry with 'regex: False' never matches
+INDEX_TEST_CONDITIONS = [
+    {"bgp/test_bgp_fact.py": {"skip": {"reason": "Skip bgp/test_bgp_fact.py",
+                                       "conditions": ["asic_type in ['vs']"]}}},
+    {"bgp/test_bgp_fact.py::test_bgp_facts": {"use_longest": True,
+                                              "xfail": {"reason": "Xfail bgp/test_bgp_fact.py::test_bgp_facts",
+                                                        "conditions": ["asic_type in ['vs']"]}}},
+    {"bgp/.*::test_bgp_facts\\[\\d+\\]": {"regex": True,
+                                          "skip": {"reason": "Skip regex test_bgp_facts",
+                                                   "conditions": ["asic_type in ['vs']"]}}},
+    {"bgp/test_bgp_fact.py::test": {"skip": {"reason": "Skip bgp/test_bgp_fact.py::test",
+                                             "conditions": ["asic_type in ['vs']"]}}},
+    {".*_fact.py": {"regex": False, "skip": {"reason": "Skip regex disabled",
+                                             "conditions": ["asic_type in ['vs']"]}}},
+    {"bgp": {"skip": {"reason": "Skip bgp", "conditions": ["asic_type in ['vs']"]}}},
+    {"bgp/test_bgp_fact.py::test_bgp_facts[1]": {"use_longest": True,
+                                                 "skip": {"reason": "Skip bgp/test_bgp_fact.py::test_bgp_facts[1]",
+                                                          "conditions": ["asic_type in ['vs']"]}}},
+]
+
+
 def load_test_conditions():
     session_mock = MagicMock()
     session_mock.config.option.mark_conditions_files = \
@@ -16,6 +38,23 @@ def load_test_conditions():
     return load_conditions(session_mock), session_mock
 
 
+def linear_scan_matches(nodeid, conditions):
+    """Reference lookup checking every entry of the conditions list, to verify ConditionsIndex."""
+    all_matches = []
+    for condition in conditions:
+        condition_entry = list(condition.keys())[0]
+        condition_items = condition[condition_entry]
+        if "regex" in condition_items:
+            match = condition_items["regex"] and re.search(condition_entry, nodeid)
+        else:
+            match = nodeid.startswith(condition_entry)
+            if match and condition_items.get("use_longest"):
+                all_matches = []
+        if match:
+            all_matches.append(condition)
+    return all_matches
+
+
 class TestFindAllMatches(unittest.TestCase):
     """Test cases for find_all_matches function."""
 
@@ -292,6 +331,48 @@ class TestFindAllMatches(unittest.TestCase):
         self.assertEqual(len(marks_found), 1)
         self.assertIn('xfail', marks_found)
 
+    # Test case: Lookup with conditions index gets the same matches as a linear scan of the conditions list
+    def test_conditions_index(self):
+        conditions, _ = load_test_conditions()
+        conditions = conditions + INDEX_TEST_CONDITIONS
+        conditions_index = ConditionsIndex(conditions)
+
+        for nodeid in ["test_conditional_mark.py", "test_conditional_mark.py::test_mark",
+                       "test_conditional_mark.py::test_mark_1", "test_conditional_mark.py::test_mark_9_1",
+                       "test_conditional_mark.py::test_mark_9_2", "test_no_matches.py",
+                       "bgp/test_bgp_fact.py::test_bgp_facts[0]", "bgp/test_bgp_fact.py::test_bgp_facts[1]",
+                       "bgp/test_bgp_fact.py::test_other", "bgp/test_bgp_gr.py", "abc_fact.py", ""]:
+            self.assertEqual(conditions_index.find(nodeid), linear_scan_matches(nodeid, conditions), nodeid)
+
+    # Test case: Lookup with conditions index gets prefix, regex and longest matches in the order of the list
+    def test_conditions_index_matches(self):
+        conditions_index = ConditionsIndex(INDEX_TEST_CONDITIONS)
+
+        def find_entries(nodeid):
+            return [list(match.keys())[0] for match in conditions_index.find(nodeid)]
+
+        self.assertEqual(find_entries("bgp/test_bgp_fact.py::test_bgp_facts[0]"),
+                         ["bgp/test_bgp_fact.py::test_bgp_facts", "bgp/.*::test_bgp_facts\\[\\d+\\]",
+                          "bgp/test_bgp_fact.py::test", "bgp"])
+        self.assertEqual(find_entries("bgp/test_bgp_fact.py::test_bgp_facts[1]"),
+                         ["bgp/test_bgp_fact.py::test_bgp_facts[1]"])
+        self.assertEqual(find_entries("bgp/test_bgp_fact.py::test_other"),
+                         ["bgp/test_bgp_fact.py", "bgp/test_bgp_fact.py::test", "bgp"])
+        self.assertEqual(find_entries("bgp/test_bgp_gr.py"), ["bgp"])
+        self.assertEqual(find_entries("abc_fact.py"), [])
+
+    # Test case: Marks of the longest entry win over marks of shorter and regex entries
+    def test_conditions_index_longest_mark(self):
+        _, session_mock = load_test_conditions()
+        nodeid = "bgp/test_bgp_fact.py::test_other"
+
+        matches = find_all_matches(nodeid, ConditionsIndex(INDEX_TEST_CONDITIONS), session_mock,
+                                   DYNAMIC_UPDATE_SKIP_REASON, CUSTOM_BASIC_FACTS)
+
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(list(matches[0].keys()), ["bgp/test_bgp_fact.py::test"])
+        self.assertEqual(matches[0]["bgp/test_bgp_fact.py::test"]["skip"]["reason"], "Skip bgp/test_bgp_fact.py::test")
+
 
 if __name__ == "__main__":
     unittest.main()
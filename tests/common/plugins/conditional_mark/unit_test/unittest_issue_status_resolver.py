@@ -0,0 +1,159 @@
+import collections
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from tests.common.plugins.conditional_mark.issue import IssueStatusResolver
+
+ISSUE_URL = "https://github.com/sonic-net/sonic-mgmt/issues/{}"
+
+
+class GitHubApiStub(object):
+    """Stub of the GitHub issues API, serves the state of the issues and records the requests."""
+
+    def __init__(self, states, delay=0, error_issues=()):
+        self.states = states
+        self.delay = delay
+        self.error_issues = error_issues
+        self.requests = collections.Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    @property
+    def api_url(self):
+        return "http://127.0.0.1:{}/repos".format(self.server.server_address[1])
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                issue_id = int(self.path.rstrip("/").split("/")[-1])
+                with stub.lock:
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                    stub.requests[issue_id] += 1
+                if issue_id in stub.error_issues:
+                    status, body = 500, {"message": "Server Error"}
+                else:
+                    status, body = 200, {"number": issue_id, "state": stub.states[issue_id], "labels": []}
+                text = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(text)))
+                self.end_headers()
+                self.wfile.write(text)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestIssueStatusResolver(unittest.TestCase):
+    """Test cases for resolving issue states against a stub GitHub API with a persistent cache."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.tmpdir, "issue_status.json")
+        self.stub = None
+
+    def tearDown(self):
+        if self.stub:
+            self.stub.close()
+        shutil.rmtree(self.tmpdir)
+
+    def start_stub(self, states, **kwargs):
+        self.stub = GitHubApiStub(states, **kwargs)
+        patcher = mock.patch.dict(os.environ, {"SONIC_AUTOMATION_GITHUB_API_URL": self.stub.api_url})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop("SONIC_AUTOMATION_PROXY_GITHUB_ISSUES_URL", None)
+
+    def load_cache(self):
+        with open(self.cache_file) as f:
+            return json.load(f)
+
+    # Test case: Issue states are fetched from the stub API, and read from the cache by the next run
+    def test_cache_hit(self):
+        self.start_stub({1: "open", 2: "closed"})
+        issues = [ISSUE_URL.format(1), ISSUE_URL.format(2)]
+
+        expected = {ISSUE_URL.format(1): True, ISSUE_URL.format(2): False}
+        self.assertEqual(IssueStatusResolver(cache_file=self.cache_file).resolve(issues), expected)
+        self.assertEqual(self.stub.requests, {1: 1, 2: 1})
+        self.assertEqual({url: entry["active"] for url, entry in self.load_cache().items()}, expected)
+
+        self.assertEqual(IssueStatusResolver(cache_file=self.cache_file).resolve(issues), expected)
+        self.assertEqual(self.stub.requests, {1: 1, 2: 1})
+
+    # Test case: Cached states older than TTL are fetched again, the fresh ones are not
+    def test_ttl_expiry(self):
+        self.start_stub({1: "closed", 2: "open"})
+        now = time.time()
+        with open(self.cache_file, "w") as f:
+            json.dump({ISSUE_URL.format(1): {"active": True, "timestamp": now - 7200},
+                       ISSUE_URL.format(2): {"active": False, "timestamp": now - 60}}, f)
+
+        results = IssueStatusResolver(cache_file=self.cache_file, ttl=3600).resolve(
+            [ISSUE_URL.format(1), ISSUE_URL.format(2)])
+
+        self.assertEqual(results, {ISSUE_URL.format(1): False, ISSUE_URL.format(2): False})
+        self.assertEqual(self.stub.requests, {1: 1})
+        cached = self.load_cache()
+        self.assertFalse(cached[ISSUE_URL.format(1)]["active"])
+        self.assertGreaterEqual(cached[ISSUE_URL.format(1)]["timestamp"], now)
+
+    # Test case: Issues are checked concurrently by at most max_workers workers
+    def test_parallel_workers(self):
+        self.start_stub({i: "open" for i in range(8)}, delay=0.3)
+        issues = [ISSUE_URL.format(i) for i in range(8)]
+
+        start_time = time.time()
+        results = IssueStatusResolver(cache_file=self.cache_file, max_workers=4).resolve(issues)
+
+        self.assertEqual(results, {issue: True for issue in issues})
+        self.assertEqual(self.stub.requests, {i: 1 for i in range(8)})
+        self.assertEqual(self.stub.max_in_flight, 4)
+        # Two rounds of 4 requests, instead of 8 sequential requests
+        self.assertLess(time.time() - start_time, 8 * 0.3)
+
+    # Test case: An issue failed to fetch is assumed active and not cached, it is checked again by the next run
+    def test_api_error_fallback(self):
+        self.start_stub({1: "closed", 2: "closed"}, error_issues=(2, ))
+        issues = [ISSUE_URL.format(1), ISSUE_URL.format(2)]
+
+        results = IssueStatusResolver(cache_file=self.cache_file).resolve(issues)
+
+        self.assertEqual(results, {ISSUE_URL.format(1): False, ISSUE_URL.format(2): True})
+        self.assertEqual(list(self.load_cache()), [ISSUE_URL.format(1)])
+
+        self.stub.error_issues = ()
+        results = IssueStatusResolver(cache_file=self.cache_file).resolve(issues)
+
+        self.assertEqual(results, {ISSUE_URL.format(1): False, ISSUE_URL.format(2): False})
+        self.assertEqual(self.stub.requests, {1: 1, 2: 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -20,6 +20,12 @@ def pytest_addoption(parser):
                      help="params that may needed in log_analyzer_bug_handler when err detected, "
                           "log_analyzer_bug_handler is called in _post_err_msg_handler, "
                           "vendor can implement their own logic in log_analyzer_bug_handler.")
+    parser.addoption("--loganalyzer_on_dut", action="store_true", default=False,
+                     help="analyze extracted logs on the DUT and download only compressed matching lines "
+                          "and summary instead of the whole extracted logs")
+    parser.addoption("--loganalyzer_dump_size", action="store", type=int, default=1024 * 1024,
+                     help="maximum number of bytes from the end of each downloaded log file to print at debug "
+                          "level, 0 disables printing, negative value prints the whole file")
     parser.addoption("--force_load_err_list", action="store_true", default=False,
                      help="Load the user defined err msgs which is not included in the common ignore file,"
                           "even when disable_loganalyzer is true")
@@ -102,6 +108,10 @@ def loganalyzer(duthosts, request, log_rotate_modular_chassis):
             "rep_setup" in request.node.__dict__ and request.node.rep_setup.skipped:
         return
     logging.info("Starting to analyse on all DUTs")
+    for analyzer in analyzers.values():
+        if not analyzer.analyze_on_dut:
+            # Compile regular expressions once in the main process, the forked workers reuse them
+            analyzer.compile_regex_sets()
     la_results = parallel_run(
         analyze_logs,
         [analyzers, markers],
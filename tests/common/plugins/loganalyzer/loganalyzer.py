@@ -1,15 +1,19 @@
+import gzip
+import hashlib
 import json
 import logging
 import os
 import re
 import time
 import pprint
+import shlex
 import shutil
 
 from . import system_msg_handler
 from .bug_handler_helper import get_bughandler_instance, BugHandler
 
 from .system_msg_handler import AnsibleLogAnalyzer as ansible_loganalyzer
+from .system_msg_handler import get_regex_set, RegexHits
 from os.path import join, split
 
 ANSIBLE_LOGANALYZER_MODULE = system_msg_handler.__file__.replace(r".pyc", ".py")
@@ -17,6 +21,10 @@ COMMON_MATCH = join(split(__file__)[0], "loganalyzer_common_match.txt")
 COMMON_IGNORE = join(split(__file__)[0], "loganalyzer_common_ignore.txt")
 COMMON_EXPECT = join(split(__file__)[0], "loganalyzer_common_expect.txt")
 SYSLOG_TMP_FOLDER = "/tmp/syslog"
+# Regular expressions parsed from the regexp files during the session, keyed by file content hash
+_parsed_regexp_files = {}
+LOG_OFFSET_FILE = "loganalyzer_offsets.json"
+LOG_REGEX_FILE = "loganalyzer_regex.json"
 
 
 class DisableLogrotateCronContext:
@@ -81,6 +89,8 @@ class LogAnalyzer:
         ansible_host.loganalyzer = self
         self.dut_run_dir = dut_run_dir
         self.extracted_syslog = os.path.join(self.dut_run_dir, "syslog")
+        # Log offsets recorded on DUT when start marker is placed, used for incremental log extraction
+        self.log_offset_file = os.path.join(self.dut_run_dir, LOG_OFFSET_FILE)
         self.marker_prefix = marker_prefix.replace(' ', '_')
         # use existing syslog msg as marker to search in logs instead of writing a new one
         self.start_marker = start_marker
@@ -93,6 +103,8 @@ class LogAnalyzer:
         self._markers = []
         self.fail = True
         self.store_la_logs = False
+        self.analyze_on_dut = False
+        self.log_dump_size = -1
 
         self.additional_files = list(additional_files.keys())
         self.additional_start_str = list(additional_files.values())
@@ -101,6 +113,8 @@ class LogAnalyzer:
             # override the fail and store_la_logs if they are set in the request config options
             self.fail = not (self.request.config.getoption("--ignore_la_failure"))
             self.store_la_logs = self.request.config.getoption("--store_la_logs")
+            self.analyze_on_dut = self.request.config.getoption("--loganalyzer_on_dut")
+            self.log_dump_size = self.request.config.getoption("--loganalyzer_dump_size")
 
         self._la_logs_dir = "/tmp/loganalyzer/{}".format(self.ansible_host.hostname)
         self.bughandler = bughandler
@@ -233,9 +247,9 @@ class LogAnalyzer:
                   Loaded regular expressions are used by "analyze" method
                   to match expected text in the downloaded log file.
         """
-        self.match_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_MATCH])[1]
-        self.ignore_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_IGNORE])[1]
-        self.expect_regex = self.ansible_loganalyzer.create_msg_regex([COMMON_EXPECT])[1]
+        self.match_regex = self.parse_regexp_file(COMMON_MATCH)
+        self.ignore_regex = self.parse_regexp_file(COMMON_IGNORE)
+        self.expect_regex = self.parse_regexp_file(COMMON_EXPECT)
         logging.debug('Loaded common config.')
 
         if self.request:
@@ -246,8 +260,22 @@ class LogAnalyzer:
     def parse_regexp_file(self, src):
         """
         @summary: Get regular expressions defined in src file.
+                  The file is parsed once per session for the same content.
         """
-        return self.ansible_loganalyzer.create_msg_regex([src])[1]
+        with open(src, "rb") as fp:
+            key = hashlib.md5(fp.read()).hexdigest()
+        if key not in _parsed_regexp_files:
+            _parsed_regexp_files[key] = self.ansible_loganalyzer.create_msg_regex([src])[1]
+        # Callers extend the returned list with test specific regular expressions
+        return list(_parsed_regexp_files[key])
+
+    def compile_regex_sets(self):
+        """
+        @summary: Get compiled match, ignore and expect regular expression sets.
+                  The sets are cached by content, so calling this before forking analysis workers
+                  lets the workers reuse the compiled sets.
+        """
+        return get_regex_set(self.match_regex), get_regex_set(self.ignore_regex), get_regex_set(self.expect_regex)
 
     def run_cmd(self, callback, *args, **kwargs):
         """
@@ -328,8 +356,8 @@ class LogAnalyzer:
         Adds the marker to the log files
         """
         start_marker = ".".join((self.marker_prefix, time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())))
-        cmd = "python {run_dir}/loganalyzer.py --action init --run_id {start_marker}"\
-            .format(run_dir=self.dut_run_dir, start_marker=start_marker)
+        cmd = "python {run_dir}/loganalyzer.py --action init --run_id {start_marker} --offset_file {offset_file}"\
+            .format(run_dir=self.dut_run_dir, start_marker=start_marker, offset_file=self.log_offset_file)
         if log_files:
             cmd += " --logs {}".format(','.join(log_files))
 
@@ -375,7 +403,7 @@ class LogAnalyzer:
 
             # On DUT extract syslog files from /var/log/ and create one file by location - /tmp/syslog
             self.ansible_host.extract_log(directory='/var/log', file_prefix='syslog', start_string=start_string,
-                                          target_filename=self.extracted_syslog)
+                                          target_filename=self.extracted_syslog, offset_file=self.log_offset_file)
             for idx, path in enumerate(self.additional_files):
                 file_dir, file_name = split(path)
                 extracted_file_name = os.path.join(self.dut_run_dir, file_name)
@@ -384,38 +412,13 @@ class LogAnalyzer:
                 else:
                     start_str = start_string
                 self.ansible_host.extract_log(directory=file_dir, file_prefix=file_name, start_string=start_str,
-                                              target_filename=extracted_file_name)
+                                              target_filename=extracted_file_name, offset_file=self.log_offset_file)
 
-        # Download extracted logs from the DUT to the temporal folder defined in SYSLOG_TMP_FOLDER
-        self.save_extracted_log(dest=tmp_folder)
-        file_list = [tmp_folder]
-
-        for path in self.additional_files:
-            file_dir, file_name = split(path)
-            extracted_file_name = os.path.join(self.dut_run_dir, file_name)
-            tmp_folder = ".".join((extracted_file_name, timestamp))
-            self.save_extracted_file(dest=tmp_folder, src=extracted_file_name)
-            file_list.append(tmp_folder)
-
-        match_messages_regex = re.compile('|'.join(self.match_regex)) if len(self.match_regex) else None
-        ignore_messages_regex = re.compile('|'.join(self.ignore_regex)) if len(self.ignore_regex) else None
-        expect_messages_regex = re.compile('|'.join(self.expect_regex)) if len(self.expect_regex) else None
-
-        logging.debug("Analyze files {}".format(file_list))
-        logging.debug('    match_regex="{}"'.format(match_messages_regex.pattern if match_messages_regex else ''))
-        logging.debug('    ignore_regex="{}"'.format(ignore_messages_regex.pattern if ignore_messages_regex else ''))
-        logging.debug('    expect_regex="{}"'.format(expect_messages_regex.pattern if expect_messages_regex else ''))
-        analyzer_parse_result = self.ansible_loganalyzer.analyze_file_list(
-            file_list, match_messages_regex, ignore_messages_regex, expect_messages_regex,
-            maximum_log_length=maximum_log_length)
-        # Print file content and remove the file
-        for folder in file_list:
-            with open(folder) as fo:
-                logging.debug("{} file content:\n\n{}".format(folder, fo.read()))
-            os.remove(folder)
-
-        expected_lines_total = []
-        unused_regex_messages = []
+        if self.analyze_on_dut:
+            analyzer_parse_result, unused_regex_messages = self._analyze_on_dut(marker, maximum_log_length)
+        else:
+            analyzer_parse_result, unused_regex_messages = self._analyze_fetched_logs(tmp_folder, timestamp,
+                                                                                      maximum_log_length)
 
         for key, value in list(analyzer_parse_result.items()):
             matching_lines, expecting_lines = value
@@ -425,15 +428,7 @@ class LogAnalyzer:
                                                     "expected_match": len(expecting_lines)}
             analyzer_summary["match_messages"][key] = matching_lines
             analyzer_summary["expect_messages"][key] = expecting_lines
-            expected_lines_total.extend(expecting_lines)
 
-        # Find unused regex matches
-        for regex in self.expect_regex:
-            for line in expected_lines_total:
-                if re.search(regex, line):
-                    break
-            else:
-                unused_regex_messages.append(regex)
         analyzer_summary["total"]["expected_missing_match"] = len(unused_regex_messages)
         analyzer_summary["unused_expected_regexp"] = unused_regex_messages
         logging.debug("Analyzer summary: {}".format(pprint.pformat(analyzer_summary)))
@@ -454,6 +449,108 @@ class LogAnalyzer:
             logging.warning("Skip bug handler execution because it is not a valid BugHandler")
         return analyzer_summary
 
+    def _analyze_fetched_logs(self, tmp_folder, timestamp, maximum_log_length=None):
+        """
+        @summary: Download extracted logs from the DUT and analyze them locally.
+
+        @return: Tuple of dictionary of file name to [matching lines, expected lines]
+                 and list of unused expected regular expressions.
+        """
+        # Download extracted logs from the DUT to the temporal folder defined in SYSLOG_TMP_FOLDER
+        self.save_extracted_log(dest=tmp_folder)
+        file_list = [tmp_folder]
+
+        for path in self.additional_files:
+            file_dir, file_name = split(path)
+            extracted_file_name = os.path.join(self.dut_run_dir, file_name)
+            tmp_folder = ".".join((extracted_file_name, timestamp))
+            self.save_extracted_file(dest=tmp_folder, src=extracted_file_name)
+            file_list.append(tmp_folder)
+
+        match_set, ignore_set, expect_set = self.compile_regex_sets()
+        match_messages_regex = match_set.regex
+        ignore_messages_regex = ignore_set.regex
+        expect_messages_regex = expect_set.regex
+
+        logging.debug("Analyze files {}".format(file_list))
+        logging.debug('    match_regex="{}"'.format(match_messages_regex.pattern if match_messages_regex else ''))
+        logging.debug('    ignore_regex="{}"'.format(ignore_messages_regex.pattern if ignore_messages_regex else ''))
+        logging.debug('    expect_regex="{}"'.format(expect_messages_regex.pattern if expect_messages_regex else ''))
+        # The expected regexes found are recorded while the lines are matched
+        expect_hits = RegexHits(expect_set)
+        analyzer_parse_result = self.ansible_loganalyzer.analyze_file_list(
+            file_list, match_messages_regex, ignore_messages_regex, expect_messages_regex,
+            maximum_log_length=maximum_log_length, expect_hits=expect_hits)
+        # Print file content and remove the file
+        for folder in file_list:
+            self._dump_log_file(folder)
+            os.remove(folder)
+
+        return analyzer_parse_result, expect_hits.unmatched()
+
+    def _analyze_on_dut(self, marker, maximum_log_length=None):
+        """
+        @summary: Analyze extracted logs on the DUT with the loganalyzer script and download only
+                  the compressed matching lines and summary.
+
+        @return: Tuple of dictionary of file name to [matching lines, expected lines]
+                 and list of unused expected regular expressions.
+        """
+        regex_file = os.path.join(self.dut_run_dir, LOG_REGEX_FILE)
+        self.ansible_host.copy(content=json.dumps({"match": self.match_regex,
+                                                   "ignore": self.ignore_regex,
+                                                   "expect": self.expect_regex}),
+                               dest=regex_file)
+
+        file_list = [self.extracted_syslog]
+        for path in self.additional_files:
+            file_list.append(os.path.join(self.dut_run_dir, split(path)[1]))
+
+        cmd = "python {run_dir}/loganalyzer.py --action analyze_extracted --streaming --run_id {marker} "\
+              "--logs {logs} --regex_file {regex_file} --out_dir {run_dir}"\
+            .format(run_dir=self.dut_run_dir, marker=marker, logs=','.join(file_list), regex_file=regex_file)
+        if self.start_marker:
+            cmd += " --start_marker {}".format(shlex.quote(self.start_marker))
+        if maximum_log_length:
+            cmd += " --maximum_log_length {}".format(maximum_log_length)
+
+        logging.debug("Analyze files {} on DUT".format(file_list))
+        self.ansible_host.command(cmd)
+
+        timestamp = time.strftime("%Y-%m-%d-%H:%M:%S", time.gmtime())
+        result_file = ".".join((SYSLOG_TMP_FOLDER, self.ansible_host.hostname, timestamp, "json.gz"))
+        self.ansible_host.fetch(dest=result_file, flat="yes",
+                                src=os.path.join(self.dut_run_dir, system_msg_handler.extracted_result_file))
+        with gzip.open(result_file, "rt") as fp:
+            result = json.load(fp)
+        os.remove(result_file)
+
+        logging.debug("Analysis stats on DUT: {}, peak memory {} KB".format(result["stats"], result["peak_memory_kb"]))
+        analyzer_parse_result = {}
+        for key, value in list(result["files"].items()):
+            analyzer_parse_result[key] = [value["match"], value["expect"]]
+
+        return analyzer_parse_result, result["unused_expected_regexp"]
+
+    def _dump_log_file(self, path):
+        """
+        @summary: Print content of the downloaded log file at debug level, limited to the last
+                  log_dump_size bytes. Zero log_dump_size disables the dump, negative one dumps the whole file.
+        """
+        if self.log_dump_size == 0:
+            return
+
+        size = os.path.getsize(path)
+        with open(path, "rb") as fo:
+            if 0 < self.log_dump_size < size:
+                fo.seek(size - self.log_dump_size)
+                # Skip the partial line
+                fo.readline()
+                logging.debug("{} file content (last {} of {} bytes):\n\n{}".format(
+                    path, self.log_dump_size, size, fo.read().decode("utf-8", "replace")))
+            else:
+                logging.debug("{} file content:\n\n{}".format(path, fo.read().decode("utf-8", "replace")))
+
     def save_extracted_log(self, dest):
         """
         @summary: Download extracted syslog log file to the ansible host.
@@ -355,21 +355,34 @@ def zone_getter_factory(argname):
     return _zone_getter
 
 
+def get_inv_files_mtime(inv_files):
+    """Get modification time of inventory files, None for files that can't be accessed."""
+    if isinstance(inv_files, str):
+        inv_files = [inv_files]
+    mtimes = []
+    for inv_file in inv_files or []:
+        try:
+            mtimes.append(os.path.getmtime(inv_file))
+        except OSError:
+            mtimes.append(None)
+    return mtimes
+
+
 def _check_inv_files_after_read(facts, function, func_args, func_kargs):
-    """Check if inventory file matches after read host variable from cached files."""
+    """Check if inventory file matches and is not modified after read host variable from cached files."""
     if facts is not FactsCache.NOTEXIST:
         inv_files = _get_parameter(function, func_args, func_kargs, "inv_files")
-        if inv_files == facts["inv_files"]:
+        if inv_files == facts["inv_files"] and get_inv_files_mtime(inv_files) == facts.get("inv_files_mtime"):
             return facts["vars"]
-    # no facts cached or facts not in the same inventory, return `NOTEXIST`
+    # no facts cached or facts not in the same inventory or inventory modified, return `NOTEXIST`
     # to force calling the decorated function to get facts
     return FactsCache.NOTEXIST
 
 
 def _mark_inv_files_before_write(facts, function, func_args, func_kargs):
-    """Add inventory to the facts before write to cached file."""
+    """Add inventory and its modification time to the facts before write to cached file."""
     inv_files = _get_parameter(function, func_args, func_kargs, "inv_files")
-    return {"inv_files": inv_files, "vars": facts}
+    return {"inv_files": inv_files, "inv_files_mtime": get_inv_files_mtime(inv_files), "vars": facts}
 
 
 @cached(
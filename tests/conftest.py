@@ -34,6 +34,7 @@ from tests.common.devices.k8s import K8sMasterCluster
 from tests.common.devices.duthosts import DutHosts
 from tests.common.devices.vmhost import VMHost
 from tests.common.devices.base import NeighborDevice
+from tests.common.devices.response_cache import reset_response_caches
 from tests.common.devices.cisco import CiscoHost
 from tests.common.fixtures.duthost_utils import backup_and_restore_config_db_session        # noqa: F401
 from tests.common.fixtures.ptfhost_utils import ptf_portmap_file                            # noqa: F401
@@ -118,6 +119,10 @@ pytest_plugins = ('tests.common.plugins.ptfadapter',
 def pytest_addoption(parser):
     parser.addoption("--testbed", action="store", default=None, help="testbed name")
     parser.addoption("--testbed_file", action="store", default=None, help="testbed file name")
+    parser.addoption("--ssh_fast_path", action="store_true", default=False,
+                     help="Run shell and command modules on DUTs over a persistent ssh connection instead of ansible")
+    parser.addoption("--dut_response_cache", action="store_true", default=False,
+                     help="Cache results of read-only show commands on DUTs until a command changing the DUT")
 
     # test_vrf options
     parser.addoption("--vrf_capacity", action="store", default=None, type=int, help="vrf capacity of dut (4-1000)")
@@ -531,16 +536,28 @@ def fixture_duthosts(enhance_inventory, ansible_adhoc, tbinfo, request):
     @param tbinfo: fixture provides information about testbed.
     @param request: pytest request object
     """
+    ssh_fast_path = request.config.getoption("ssh_fast_path")
     try:
         host = DutHosts(ansible_adhoc, tbinfo, request, get_specified_duts(request),
                         target_hostname=get_target_hostname(request), is_parallel_leader=is_parallel_leader(request))
-        return host
+        for node in host.nodes:
+            if ssh_fast_path:
+                node.sonichost.enable_ssh_fast_path()
+            if request.config.getoption("dut_response_cache"):
+                node.sonichost.enable_response_cache()
     except BaseException as e:
         logger.error("Failed to initialize duthosts.")
         request.config.cache.set("duthosts_fixture_failed", True)
         pt_assert(False, "!!!!!!!!!!!!!!!! duthosts fixture failed !!!!!!!!!!!!!!!!"
                   "Exception: {}".format(repr(e)))
 
+    yield host
+
+    if ssh_fast_path:
+        for node in host.nodes:
+            logger.info("Module call latency of {}: {}".format(node.hostname, node.sonichost.get_call_latency()))
+            node.sonichost.disable_ssh_fast_path()
+
 
 @pytest.fixture(scope="session")
 def duthost(duthosts, request):
@@ -1171,6 +1188,9 @@ def pytest_runtest_makereport(item, call):
             log_custom_msg(item)
         item.user_properties.append(('end', str(datetime.fromtimestamp(call.stop))))
 
+    # Responses cached in one phase are not reused in the next one, log stats of the phase and reset the caches
+    reset_response_caches("{} {}".format(item.nodeid, call.when))
+
     # Filter out unnecessary logs captured on "stdout" and "stderr"
     item._report_sections = list([report for report in item._report_sections if report[1] not in ("stdout", "stderr")])
 